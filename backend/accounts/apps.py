@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'accounts'
\ No newline at end of file
+    name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from .authentication import revoke_inactive_user_tokens
+
+        post_save.connect(revoke_inactive_user_tokens, sender=get_user_model(), dispatch_uid='revoke_inactive_user_tokens')
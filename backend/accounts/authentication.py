@@ -0,0 +1,153 @@
+"""
+Token authentication with an in-process cache, expiry and rotation.
+
+Token lookups are cached per worker in a bounded LRU with a short TTL, so
+most authenticated requests don't touch ``authtoken_token`` at all. Logout
+and rotation write a revocation key per token into the shared cache
+(``TOKEN_REVOCATION_CACHE``), which every request checks first, so a revoked
+token stops working in every worker on its next request rather than when
+its LRU entry happens to expire. Deactivating a user revokes their tokens
+the same way.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from travel_booking import metrics
+from travel_booking.db.sharding import shard_aliases
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps at most ``maxsize`` entries for ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = LRUCache(
+    maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+)
+
+
+def _revoked_key(key):
+    return f'auth:revoked:{key}'
+
+
+def is_revoked(key):
+    return caches[settings.TOKEN_REVOCATION_CACHE].get(_revoked_key(key)) is not None
+
+
+def token_expired(created):
+    return created + settings.TOKEN_EXPIRY <= timezone.now()
+
+
+def revoke_tokens(user):
+    """Delete the user's token and invalidate cached lookups in every worker"""
+    keys = list(Token.objects.filter(user=user).values_list('key', flat=True))
+    Token.objects.filter(key__in=keys).delete()
+    # Remembered until the token would have expired anyway
+    caches[settings.TOKEN_REVOCATION_CACHE].set_many(
+        {_revoked_key(key): time.time_ns() for key in keys},
+        timeout=settings.TOKEN_EXPIRY.total_seconds(),
+    )
+    for key in keys:
+        token_cache.delete(key)
+
+
+def revoke_inactive_user_tokens(sender, instance, using, **kwargs):
+    """post_save handler: cached lookups would otherwise keep an inactive user signed in until they expire"""
+    # Stub users on shards are inactive by design and hold no tokens
+    if not instance.is_active and using not in shard_aliases():
+        revoke_tokens(instance)
+
+
+def rotate_token(user):
+    revoke_tokens(user)
+    return Token.objects.create(user=user)
+
+
+def issue_token(user):
+    """
+    Token for a fresh login: the existing one while it is young, otherwise
+    a new key, so long-lived sessions rotate their credentials.
+    """
+    token = Token.objects.filter(user=user).first()
+    if token is None:
+        return Token.objects.create(user=user)
+    if token.created + settings.TOKEN_ROTATE_AFTER <= timezone.now():
+        return rotate_token(user)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        # Checked before the database so a revocation racing this lookup
+        # either hides the token row or is seen on the next request
+        if is_revoked(key):
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        entry = token_cache.get(key)
+        metrics.CACHE_REQUESTS.inc(cache='token', result='miss' if entry is None else 'hit')
+        if entry is not None:
+            db, field_names, values, created = entry
+            if token_expired(created):
+                token_cache.delete(key)
+                raise exceptions.AuthenticationFailed('Token has expired.')
+            # A fresh instance per request, so views can't mutate the cached one
+            return get_user_model().from_db(db, field_names, values), key
+
+        try:
+            token = self.get_model().objects.select_related('user').get(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if token_expired(token.created):
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        user = token.user
+        field_names = [field.attname for field in user._meta.concrete_fields]
+        values = [getattr(user, name) for name in field_names]
+        token_cache.set(key, (user._state.db, field_names, values, token.created))
+        return token.user, token.key
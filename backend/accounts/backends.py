@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import filter_email
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with ``email`` and ``password``, matching the email ignoring case"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        UserModel = get_user_model()
+        try:
+            user = filter_email(UserModel._default_manager.all(), email).get()
+        except (UserModel.DoesNotExist, UserModel.MultipleObjectsReturned):
+            # Hash anyway so unknown emails take as long as wrong passwords
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import ThrottleBucket
+
+
+class Command(BaseCommand):
+    help = "Delete rate limit buckets that have refilled completely. Safe to run at any time, e.g. from cron."
+
+    def handle(self, *args, **options):
+        deleted = ThrottleBucket.clear_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired throttle bucket(s)"))
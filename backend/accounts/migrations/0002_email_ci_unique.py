@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-19 03:00
+
+import logging
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.functions.text
+
+logger = logging.getLogger('accounts.migrations')
+
+
+def _clear_duplicate_emails(User, alias):
+    users = User.objects.using(alias).exclude(email='').annotate(
+        email_lower=django.db.models.functions.text.Lower('email')
+    )
+    duplicated = users.values('email_lower').annotate(
+        accounts=models.Count('pk')
+    ).filter(accounts__gt=1).values_list('email_lower', flat=True)
+    for email in list(duplicated):
+        accounts = list(users.filter(email_lower=email).order_by(
+            models.F('last_login').desc(nulls_last=True), 'pk'
+        ))
+        keeper, others = accounts[0], accounts[1:]
+        for user in others:
+            logger.info(
+                "Cleared %s %s (%s)'s email %s, which differs only in case from %s's",
+                User._meta.label, user.pk, user.username, user.email, keeper.username,
+            )
+        User.objects.using(alias).filter(pk__in=[user.pk for user in others]).update(email='')
+
+
+def clear_duplicate_emails(apps, schema_editor):
+    # Existing accounts whose emails differ only in case would fail the
+    # unique index. The most recently used account of each group keeps the
+    # address; the others get a blank email, which the index exempts, and
+    # are logged to accounts.migrations so they can be followed up.
+    alias = schema_editor.connection.alias
+    _clear_duplicate_emails(apps.get_model('accounts', 'CustomUser'), alias)
+    if settings.AUTH_USER_MODEL == 'auth.User':
+        _clear_duplicate_emails(apps.get_model('auth', 'User'), alias)
+
+
+def _auth_user_constraint():
+    return models.UniqueConstraint(
+        django.db.models.functions.text.Lower('email'),
+        condition=models.Q(('email', ''), _negated=True),
+        name='auth_user_email_ci_unique',
+    )
+
+
+def add_auth_user_constraint(apps, schema_editor):
+    # The API authenticates against the configured user model, which is not
+    # owned by this app, so its index is created here instead of in its Meta
+    if settings.AUTH_USER_MODEL == 'auth.User':
+        schema_editor.add_constraint(apps.get_model('auth', 'User'), _auth_user_constraint())
+
+
+def remove_auth_user_constraint(apps, schema_editor):
+    if settings.AUTH_USER_MODEL == 'auth.User':
+        schema_editor.remove_constraint(apps.get_model('auth', 'User'), _auth_user_constraint())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='custom_user_email_ci_unique'),
+        ),
+        migrations.RunPython(add_auth_user_constraint, remove_auth_user_constraint),
+    ]
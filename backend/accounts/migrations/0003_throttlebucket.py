@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tat', models.FloatField()),
+            ],
+            options={
+                'db_table': 'throttle_bucket',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='throttlebucket',
+            index=models.Index(fields=['tat'], name='throttle_bucket_tat_idx'),
+        ),
+    ]
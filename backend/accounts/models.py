@@ -1,5 +1,22 @@
+import time
+
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Lower
+
+EMAIL_UNIQUE_CONDITION = ~Q(email='')
+
+
+def filter_email(queryset, email):
+    """
+    Users in ``queryset`` whose email matches ignoring case. Filters on
+    LOWER(email) so the lookup is served by the unique expression index.
+    """
+    return queryset.annotate(email_lower=Lower('email')).filter(
+        EMAIL_UNIQUE_CONDITION, email_lower=(email or '').strip().lower()
+    )
+
 
 class CustomUser(AbstractUser):
     """Extended User model with additional profile fields"""
@@ -31,3 +48,54 @@ class CustomUser(AbstractUser):
 
     class Meta:
         db_table = 'custom_user'
+        constraints = [
+            # Case-insensitive unique email; blank emails are allowed repeatedly
+            models.UniqueConstraint(Lower('email'), condition=EMAIL_UNIQUE_CONDITION, name='custom_user_email_ci_unique'),
+        ]
+
+
+class ThrottleBucket(models.Model):
+    """
+    Rate limit state for one client and scope, shared by every worker.
+
+    Stored as GCRA's theoretical arrival time (``tat``, epoch seconds): a
+    token bucket of ``num_requests`` tokens refilled over ``duration``
+    seconds, kept in a single number so each check is one primary-key update.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tat = models.FloatField()
+
+    class Meta:
+        db_table = 'throttle_bucket'
+        indexes = [models.Index(fields=['tat'], name='throttle_bucket_tat_idx')]
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def consume(cls, key, num_requests, duration, now=None):
+        """
+        Take one token from ``key``'s bucket. Returns ``(allowed, wait)``, with
+        ``wait`` the seconds until the next token when not allowed.
+        """
+        now = time.time() if now is None else now
+        interval = duration / num_requests
+        # A request is allowed while the bucket is not more than full
+        limit = now + duration - interval
+
+        if cls.objects.filter(key=key, tat__lte=limit).update(tat=Greatest(F('tat'), now) + interval):
+            return True, None
+
+        bucket, created = cls.objects.get_or_create(key=key, defaults={'tat': now + interval})
+        if created:
+            return True, None
+        # Lost a race with another worker refilling an expired bucket
+        if bucket.tat <= limit:
+            return cls.consume(key, num_requests, duration, now)
+        return False, bucket.tat - limit
+
+    @classmethod
+    def clear_expired(cls, now=None):
+        """Delete buckets that have refilled completely and so hold no state"""
+        now = time.time() if now is None else now
+        return cls.objects.filter(tat__lt=now).delete()[0]
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from bookings.models import Booking
+from .models import filter_email
 from travel_options.models import TravelOption
 
 User = get_user_model()
@@ -18,6 +19,11 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'email', 'first_name', 'last_name', 'password', 'password_confirm')
 
+    def validate_email(self, value):
+        if value and filter_email(User.objects.all(), value).exists():
+            raise serializers.ValidationError("A user with this email already exists.")
+        return value
+
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError({"password": "Passwords do not match."})
@@ -34,12 +40,10 @@ class UserLoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, attrs):
-        email = attrs.get('email')
-        password = attrs.get('password')
-        user = User.objects.filter(email=email).first()
-        if user is None:
-            raise serializers.ValidationError("User with this email does not exist.")
-        user = authenticate(username=user.username, password=password)
+        # EmailBackend finds the user and checks the password in one query
+        user = authenticate(
+            self.context.get('request'), email=attrs.get('email'), password=attrs.get('password')
+        )
         if not user:
             raise serializers.ValidationError("Invalid credentials.")
         attrs['user'] = user
@@ -57,6 +61,11 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'email', 'first_name', 'last_name')
 
+    def validate_email(self, value):
+        if value and filter_email(User.objects.all(), value).exclude(pk=self.instance.pk).exists():
+            raise serializers.ValidationError("A user with this email already exists.")
+        return value
+
 
 # --------------------------
 # Booking Serializers
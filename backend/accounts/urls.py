@@ -9,6 +9,7 @@ urlpatterns = [
     path('login/', views.LoginAPIView.as_view(), name='api_login'),
     path('logout/', views.LogoutAPIView.as_view(), name='api_logout'),
     path('profile/', views.ProfileAPIView.as_view(), name='api_profile'),
+    path('token/rotate/', views.TokenRotateAPIView.as_view(), name='api_token_rotate'),
     
     # Template views
     path('register-form/', views.RegisterView.as_view(), name='register'),
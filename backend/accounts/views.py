@@ -1,14 +1,15 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.views.generic import CreateView, UpdateView
 from django.urls import reverse_lazy
+from .authentication import issue_token, revoke_tokens, rotate_token
 from .models import CustomUser
+from .throttling import LoginEmailThrottle, LoginIPThrottle
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
@@ -27,7 +28,7 @@ class RegisterAPIView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
+        token = issue_token(user)
         return Response({
             'user': UserProfileSerializer(user).data,
             'token': token.key
@@ -35,12 +36,13 @@ class RegisterAPIView(generics.CreateAPIView):
 
 class LoginAPIView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
 
     def post(self, request):
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            token, created = Token.objects.get_or_create(user=user)
+            token = issue_token(user)
             login(request, user)
             return Response({
                 'user': UserProfileSerializer(user).data,
@@ -50,13 +52,18 @@ class LoginAPIView(APIView):
 
 class LogoutAPIView(APIView):
     def post(self, request):
-        try:
-            request.user.auth_token.delete()
-        except:
-            pass
+        if request.user.is_authenticated:
+            revoke_tokens(request.user)
         logout(request)
         return Response({'message': 'Successfully logged out'})
 
+class TokenRotateAPIView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        token = rotate_token(request.user)
+        return Response({'token': token.key})
+
 class ProfileAPIView(generics.RetrieveUpdateAPIView):
     serializer_class = UserUpdateSerializer
     permission_classes = (permissions.IsAuthenticated,)
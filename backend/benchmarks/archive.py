@@ -0,0 +1,102 @@
+"""
+Hot-table query latency before and after archive_history moves old rows out.
+
+    python -m benchmarks.archive --scale 200000
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+
+def seed(num_bookings):
+    """Nine in ten bookings belong to trips that departed two years ago"""
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from bookings.models import Booking
+    from travel_options.models import TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    users = get_user_model().objects.bulk_create([
+        get_user_model()(username=f"bench{i}", email=f"bench{i}@example.com") for i in range(100)
+    ])
+
+    num_options = max(num_bookings // 20, 10)
+    options = []
+    for i in range(num_options):
+        old = i % 10 != 0
+        departure = now + timedelta(days=rng.randint(1, 60) - (730 if old else 0))
+        options.append(TravelOption(
+            travel_id=f"A{i}", type='FLIGHT', source='Denver', destination='Seattle',
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+            price=Decimal('120.00'), total_seats=300, available_seats=300,
+            operator_name='Bench Air', is_active=not old,
+        ))
+    TravelOption.objects.bulk_create(options, batch_size=5000)
+    options = list(TravelOption.objects.values_list('pk', 'is_active'))
+
+    batch = []
+    for i in range(num_bookings):
+        option_id, active = rng.choice(options)
+        batch.append(Booking(
+            booking_id=f"BKARCH{i}", user=rng.choice(users), travel_option_id=option_id,
+            number_of_seats=1, total_price=Decimal('120.00'),
+            status='CONFIRMED' if active else rng.choice(['COMPLETED', 'CANCELLED']),
+            contact_email='bench@example.com', contact_phone='1234567890',
+        ))
+        if len(batch) == 10000:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    Booking.objects.bulk_create(batch)
+    return users[0]
+
+
+def measure(user, repeat):
+    from django.utils import timezone
+    from bookings.models import Booking
+    from travel_options.models import TravelOption
+
+    def booking_list():
+        list(Booking.objects.filter(user=user).order_by('-booking_date')[:20])
+        Booking.objects.filter(user=user).count()
+
+    def search():
+        list(TravelOption.objects.filter(
+            source='Denver', departure_datetime__gt=timezone.now()
+        ).order_by('departure_datetime')[:20])
+
+    return {
+        'booking_list': summarize(time_calls(booking_list, repeat)),
+        'search': summarize(time_calls(search, repeat)),
+    }
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    results = {}
+    with benchmark_database():
+        user = seed(args.scale)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for case, summary in measure(user, args.repeat).items():
+            results[f"{case}_before"] = summary
+
+        call_command('archive_history', '--days', '365', '--batch-size', '2000', stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for case, summary in measure(user, args.repeat).items():
+            results[f"{case}_after"] = summary
+
+    report('archive', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Concurrent-request throughput of the search and list endpoints under WSGI
+sync workers versus ASGI on the same box.
+
+WSGI workers are simulated with ``--workers`` threads driving Django's sync
+request handler, each blocked for the whole request as a gunicorn sync worker
+is. ASGI runs ``--concurrency`` requests at a time on one event loop through
+the async handler, with ORM work on ``ASYNC_DB_THREADS`` pool threads.
+
+    python -m benchmarks.asgi --scale 5000 --repeat 400 --workers 4 --concurrency 32
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+SEARCHES = [
+    {'source': 'New York'},
+    {'source': 'Boston', 'destination': 'Chicago'},
+    {'destination': 'Denver', 'type': 'TRAIN'},
+    {'max_price': '150.00'},
+]
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--workers', type=int, default=4, help='WSGI sync workers')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight under ASGI')
+    args = parser.parse_args()
+    setup_django()
+
+    from django.conf import settings
+    from django.test import AsyncClient, Client, override_settings
+    from benchmarks.fare_search import seed
+
+    requests = [
+        ('post', '/api/travel-options/search/', json.dumps(SEARCHES[i % len(SEARCHES)]))
+        if i % 2 else ('get', '/api/travel-options/?page=2', None)
+        for i in range(args.repeat)
+    ]
+
+    def send(client, method, path, body):
+        if method == 'post':
+            return client.post(path, data=body, content_type='application/json')
+        return client.get(path)
+
+    def wsgi():
+        def worker(chunk):
+            client = Client()
+            for request in chunk:
+                assert send(client, *request).status_code == 200
+        chunks = [requests[i::args.workers] for i in range(args.workers)]
+        with ThreadPoolExecutor(args.workers) as pool:
+            list(pool.map(worker, chunks))
+
+    async def asgi():
+        client = AsyncClient()
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def one(request):
+            async with slots:
+                response = await send(client, *request)
+                assert response.status_code == 200
+
+        await asyncio.gather(*(one(request) for request in requests))
+
+    results = {}
+    # No throttling: every request comes from the same test client address
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+    with benchmark_database(), override_settings(REST_FRAMEWORK=rest_framework):
+        seed(args.scale, duplicated_rows=False)
+        for case, run in (('wsgi_sync_workers', wsgi), ('asgi', lambda: asyncio.run(asgi()))):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            results[case] = {
+                'requests': args.repeat,
+                'seconds': round(elapsed, 3),
+                'requests_per_sec': round(args.repeat / elapsed, 1),
+            }
+
+    report('asgi', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
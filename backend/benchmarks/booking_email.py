@@ -0,0 +1,126 @@
+"""
+Request-side latency of confirming a booking when the confirmation email is
+sent inline versus queued in the outbox, against a local SMTP stand-in with
+a fixed per-reply delay, plus the outbox worker's drain throughput.
+
+    python -m benchmarks.booking_email --repeat 200 --smtp-latency-ms 20
+"""
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize
+
+
+class SMTPStandIn(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib, answering every command after a delay"""
+
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                self.server.delivered += 1
+                self.reply('250 Queued')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+def start_smtp(latency):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPStandIn)
+    server.daemon_threads = True
+    server.latency = latency
+    server.delivered = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def seed(num_bookings):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from bookings.models import Booking
+    from travel_options.models import TravelOption
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com')
+    departure = timezone.now() + timedelta(days=10)
+    option = TravelOption.objects.create(
+        travel_id='MAIL1', type='BUS', source='Austin', destination='Dallas',
+        departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+        price=Decimal('25.00'), total_seats=num_bookings, available_seats=num_bookings, operator_name='Bench Bus',
+    )
+    return [
+        Booking.objects.create(
+            user=user, travel_option=option, number_of_seats=1,
+            contact_email='bench@example.com', contact_phone='1234567890',
+        )
+        for _ in range(num_bookings)
+    ]
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--smtp-latency-ms', type=float, default=20)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.mail import send_mail
+    from django.test.utils import override_settings
+    from bookings.emails import render_booking_email
+    from bookings.outbox import OutboxWorker
+
+    server = start_smtp(args.smtp_latency_ms / 1000)
+    smtp_settings = override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+        EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+    )
+
+    def inline(booking):
+        booking.confirm_booking()
+        subject, body = render_booking_email(booking, 'BOOKING_CONFIRMED')
+        send_mail(subject, body, None, [booking.contact_email])
+
+    def outbox(booking):
+        booking.confirm_booking()
+
+    results = {}
+    # Inside benchmark_database, which switches to the locmem backend
+    with benchmark_database(), smtp_settings:
+        bookings = seed(args.repeat * 2)
+        for case, confirm, batch in (('inline_smtp', inline, bookings[:args.repeat]),
+                                     ('outbox', outbox, bookings[args.repeat:])):
+            timings = []
+            for booking in batch:
+                start = time.perf_counter()
+                confirm(booking)
+                timings.append(time.perf_counter() - start)
+            results[case] = summarize(timings)
+
+        start = time.perf_counter()
+        worker = OutboxWorker(batch_size=100).drain()
+        seconds = time.perf_counter() - start
+        results['outbox_drain'] = {'emails': worker.sent, 'seconds': seconds, 'emails_per_sec': worker.sent / seconds}
+
+    server.shutdown()
+    report('booking_email', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
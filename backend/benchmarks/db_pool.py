@@ -0,0 +1,53 @@
+"""
+Connection-acquire latency on PostgreSQL: a new connection per request
+(CONN_MAX_AGE=0, including the TLS handshake when the server requires it)
+versus checkout from the pooled backend. Each call opens or checks out a
+connection, runs ``SELECT 1`` and closes it, as one request would.
+
+Needs a PostgreSQL DATABASE_URL and psycopg_pool; a local server works:
+
+    DATABASE_URL=postgres://postgres@localhost/travel python -m benchmarks.db_pool --repeat 500
+"""
+import sys
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        sys.exit('benchmarks.db_pool needs a PostgreSQL database')
+    from django.db.backends.postgresql.base import DatabaseWrapper as PlainWrapper
+    from travel_booking.db.postgresql_pool.base import DatabaseWrapper as PooledWrapper
+
+    results = {}
+    with benchmark_database():
+        settings_dict = {**connection.settings_dict, 'CONN_MAX_AGE': 0}
+        pooled_options = {**settings_dict['OPTIONS'], 'pool': {'min_size': 1, 'max_size': 4}}
+        cases = (
+            ('connect_per_request', PlainWrapper(settings_dict, alias='bench_plain')),
+            ('pooled_checkout', PooledWrapper({**settings_dict, 'OPTIONS': pooled_options}, alias='bench_pool')),
+        )
+        try:
+            for case, db in cases:
+                def request():
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                    db.close()
+
+                request()  # Warm up, and open the pool
+                results[case] = summarize(time_calls(request, args.repeat))
+            stats = cases[1][1].pool.get_stats()
+            results['pooled_checkout']['connections_opened'] = stats.get('connections_num', 0)
+        finally:
+            PooledWrapper.close_pools()
+
+    report('db_pool', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare search cost of fare classes against the old approach of one
+TravelOption row per class.
+
+    python -m benchmarks.fare_search --scale 20000
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+CITIES = ['New York', 'Boston', 'Chicago', 'Denver', 'Seattle', 'Miami', 'Austin', 'Atlanta']
+CLASSES = [('ECONOMY', Decimal('1.0')), ('BUSINESS', Decimal('2.5')), ('SLEEPER', Decimal('1.6'))]
+
+
+def seed(scale, duplicated_rows):
+    from django.utils import timezone
+    from travel_options.models import FareClass, TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    options, fares = [], []
+    for i in range(scale):
+        source, destination = rng.sample(CITIES, 2)
+        departure = now + timedelta(days=rng.randint(1, 60), minutes=rng.randint(0, 1440))
+        base = Decimal(rng.randint(40, 400))
+        common = dict(
+            type='TRAIN', source=source, destination=destination,
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=5),
+            operator_name='Bench Rail',
+        )
+        if duplicated_rows:
+            for code, factor in CLASSES:
+                options.append(TravelOption(
+                    travel_id=f"D{i}{code[0]}", price=base * factor,
+                    total_seats=100, available_seats=rng.randint(0, 100), **common
+                ))
+        else:
+            option = TravelOption(
+                travel_id=f"F{i}", price=base, total_seats=300, available_seats=0, **common
+            )
+            options.append(option)
+            for code, factor in CLASSES:
+                seats = rng.randint(0, 100)
+                option.available_seats += seats
+                fares.append(FareClass(
+                    travel_option=option, code=code, price=base * factor,
+                    total_seats=100, available_seats=seats
+                ))
+
+    TravelOption.objects.bulk_create(options, batch_size=2000)
+    FareClass.objects.bulk_create(fares, batch_size=2000)
+
+
+def duplicated_rows_search(departure_date):
+    from django.db.models import Min
+    from travel_options.models import TravelOption
+
+    # Cheapest class per departure by grouping the duplicated rows
+    return list(
+        TravelOption.objects.filter(
+            source='New York', destination='Boston', is_active=True,
+            departure_datetime__date=departure_date, available_seats__gte=1,
+        ).values('operator_name', 'departure_datetime').annotate(cheapest_price=Min('price'))
+    )
+
+
+def fare_class_search(departure_date):
+    from django.db.models import Case, Count, F, Min, Q, When
+    from travel_options.models import TravelOption
+
+    return list(
+        TravelOption.objects.filter(
+            source='New York', destination='Boston', is_active=True,
+            departure_datetime__date=departure_date,
+        ).annotate(
+            fare_class_count=Count('fare_classes'),
+            cheapest_price=Case(
+                When(fare_class_count=0, then=F('price')),
+                default=Min('fare_classes__price', filter=Q(fare_classes__available_seats__gte=1)),
+            ),
+        ).values('id', 'cheapest_price')
+    )
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    from django.utils import timezone
+    from travel_options.models import TravelOption
+
+    departure_date = (timezone.now() + timedelta(days=10)).date()
+    results = {}
+    with benchmark_database():
+        for name, duplicated, search in [
+            ('duplicated_rows', True, duplicated_rows_search),
+            ('fare_classes', False, fare_class_search),
+        ]:
+            seed(args.scale, duplicated)
+            summary = summarize(time_calls(lambda: search(departure_date), args.repeat))
+            summary['travel_option_rows'] = TravelOption.objects.count()
+            results[name] = summary
+            TravelOption.objects.all().delete()
+
+    report('fare_search', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
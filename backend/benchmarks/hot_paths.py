@@ -0,0 +1,219 @@
+"""
+Latency, throughput and query counts of the hot API paths: the travel option
+list, search and detail, login, and booking create, confirm and cancel.
+
+Each case sends ``--repeat`` requests through the full middleware stack from
+``--workers`` threads, each with its own test client and database
+connection. Bookings are made by ``--users`` users on options departing in
+two days or more, then confirmed, then cancelled. On SQLite, whose test
+database can't take concurrent writes, the write cases send one request at
+a time; latencies are timed from when a request gets its turn.
+
+Save a run with ``--json`` and compare later runs against it with
+``--baseline``; the exit status is 1 when a case's p95 latency is more than
+``--tolerance`` percent above the baseline's or it runs more queries.
+
+    python -m benchmarks.hot_paths --scale 20000 --repeat 400 --workers 4 --json > baseline.json
+    python -m benchmarks.hot_paths --scale 20000 --repeat 400 --workers 4 --baseline baseline.json
+"""
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+from benchmarks.asgi import SEARCHES
+from benchmarks.login import FAST_HASHERS
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize
+
+PASSWORD = 'benchpass123'
+WRITE_CASES = {'login', 'booking_create', 'booking_confirm', 'booking_cancel'}
+
+
+def seed_users(count):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        [User(username=f'bench{i}', email=f'bench{i}@example.com', password=password) for i in range(count)]
+    )
+    tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+    return {token.user_id: token.key for token in tokens}
+
+
+def build_requests(case, repeat, option_ids, bookable_ids, tokens):
+    """``(method, path, body, headers, expected status)`` for each request of ``case``"""
+    from bookings.models import Booking
+
+    rng = random.Random(case)
+    user_ids = list(tokens)
+
+    def auth(user_id):
+        return {'HTTP_AUTHORIZATION': f'Token {tokens[user_id]}'}
+
+    if case == 'list':
+        return [('get', f'/api/travel-options/?page={rng.randint(1, 10)}', None, {}, 200) for _ in range(repeat)]
+    if case == 'search':
+        return [
+            ('post', '/api/travel-options/search/', json.dumps(SEARCHES[i % len(SEARCHES)]), {}, 200)
+            for i in range(repeat)
+        ]
+    if case == 'detail':
+        return [('get', f'/api/travel-options/{rng.choice(option_ids)}/', None, {}, 200) for _ in range(repeat)]
+    if case == 'login':
+        return [
+            ('post', '/api/accounts/login/', json.dumps({
+                'email': f'bench{rng.randrange(len(user_ids))}@example.com', 'password': PASSWORD,
+            }), {}, 200)
+            for _ in range(repeat)
+        ]
+    if case == 'booking_create':
+        requests = []
+        for _ in range(repeat):
+            user_id = rng.choice(user_ids)
+            body = json.dumps({
+                'travel_option_id': rng.choice(bookable_ids), 'number_of_seats': rng.randint(1, 3),
+                'contact_email': 'bench@example.com', 'contact_phone': '1234567890',
+            })
+            requests.append(('post', '/api/bookings/create/', body, auth(user_id), 201))
+        return requests
+
+    status, action = {'booking_confirm': ('PENDING', 'confirm'), 'booking_cancel': ('CONFIRMED', 'cancel')}[case]
+    bookings = Booking.objects.filter(status=status).values_list('pk', 'user_id')[:repeat]
+    return [('post', f'/api/bookings/{pk}/{action}/', None, auth(user_id), 200) for pk, user_id in bookings]
+
+
+def query_count(response):
+    """Queries the request ran, from its Server-Timing header (pool threads included)"""
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def run_case(requests, workers, lock):
+    """Send ``requests`` from ``workers`` threads; returns timings, query counts, failures and wall time"""
+    from django.db import connection
+    from django.test import Client
+
+    timings, query_counts, failures = [], [], []
+
+    def worker(chunk):
+        client = Client()
+        try:
+            for method, path, body, headers, expected in chunk:
+                with lock:
+                    start = time.perf_counter()
+                    if method == 'get':
+                        response = client.get(path, **headers)
+                    else:
+                        response = client.post(path, data=body or '', content_type='application/json', **headers)
+                    timings.append(time.perf_counter() - start)
+                query_counts.append(query_count(response))
+                if response.status_code != expected:
+                    failures.append(response.status_code)
+        finally:
+            connection.close()
+
+    chunks = [requests[i::workers] for i in range(workers)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(worker, chunks))
+    return timings, query_counts, failures, time.perf_counter() - start
+
+
+def compare(results, baseline, tolerance):
+    """Print each case's change against ``baseline``; returns the cases that regressed"""
+    regressed = []
+    print(f"== compared with baseline (tolerance {tolerance:g}%)", file=sys.stderr)
+    for case, summary in results.items():
+        before = baseline.get(case)
+        if before is None:
+            print(f"  {case}: not in baseline", file=sys.stderr)
+            continue
+        p95_change = (summary['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        throughput_change = (
+            (summary['requests_per_sec'] - before['requests_per_sec']) / before['requests_per_sec'] * 100
+        )
+        flag = ''
+        # Query counts barely vary between runs, so any real increase is a regression
+        if p95_change > tolerance or summary['queries_mean'] > before['queries_mean'] + 0.5:
+            regressed.append(case)
+            flag = '  REGRESSED'
+        print(
+            f"  {case}: p95 {before['p95_ms']:.2f} -> {summary['p95_ms']:.2f} ms ({p95_change:+.1f}%), "
+            f"throughput {throughput_change:+.1f}%, queries {before['queries_mean']:.1f} -> "
+            f"{summary['queries_mean']:.1f}{flag}",
+            file=sys.stderr,
+        )
+    return regressed
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--workers', type=int, default=4, help='Threads sending requests at the same time')
+    parser.add_argument('--users', type=int, default=100, help='Users making bookings and logging in')
+    parser.add_argument('--cases', default='list,search,detail,login,booking_create,booking_confirm,booking_cancel',
+                        help='Comma-separated cases to run, in order')
+    parser.add_argument('--baseline', help='JSON output of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='Allowed p95 increase over the baseline, in %%')
+    args = parser.parse_args()
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+    from django.utils import timezone
+    from benchmarks.fare_search import seed
+    from travel_options.models import TravelOption
+
+    results = {}
+    # No throttling: every request comes from the same test client address
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+    # Every request is timed for its query count, without the per-request log lines;
+    # slow queries aren't logged (or explained) from the throwaway database
+    logging.getLogger('travel_booking.timing').disabled = True
+    with benchmark_database(), override_settings(
+        REST_FRAMEWORK=rest_framework, PASSWORD_HASHERS=FAST_HASHERS,
+        SERVER_TIMING_SAMPLE_RATE=1.0, SLOW_QUERY_THRESHOLD_MS=0,
+    ):
+        seed(args.scale, duplicated_rows=False)
+        tokens = seed_users(args.users)
+        option_ids = list(TravelOption.objects.values_list('pk', flat=True))
+        bookable_ids = list(TravelOption.objects.filter(
+            departure_datetime__gte=timezone.now() + timedelta(days=2)
+        ).values_list('pk', flat=True))
+        write_lock = threading.Lock() if connection.vendor == 'sqlite' else None
+
+        for case in args.cases.split(','):
+            requests = build_requests(case, args.repeat, option_ids, bookable_ids, tokens)
+            if not requests:
+                print(f"{case}: nothing to send, skipped", file=sys.stderr)
+                continue
+            lock = write_lock if case in WRITE_CASES and write_lock else nullcontext()
+            timings, query_counts, failures, elapsed = run_case(requests, args.workers, lock)
+            results[case] = {
+                **summarize(timings),
+                'requests_per_sec': round(len(timings) / elapsed, 1),
+                'queries_mean': sum(query_counts) / len(query_counts),
+                'queries_max': max(query_counts),
+                'failures': len(failures),
+            }
+
+    report('hot_paths', results, args.json)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
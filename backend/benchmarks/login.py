@@ -0,0 +1,63 @@
+"""
+Login cost with many users: the previous lookup (exact email filter, then a
+second authenticate() by username) versus EmailBackend's single lookup on
+the LOWER(email) unique index, and the full login endpoint through the middleware stack. A fast password
+hasher is used so the timings show the lookups rather than PBKDF2.
+
+    python -m benchmarks.login --scale 100000 --repeat 500
+"""
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    import random
+
+    from django.contrib.auth import authenticate, get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import CaptureQueriesContext
+
+    User = get_user_model()
+    results = {}
+    with benchmark_database(), override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+        password = make_password('benchpass123')
+        User.objects.bulk_create(
+            [User(username=f'user{i}', email=f'User{i}@Example.com', password=password) for i in range(args.scale)],
+            batch_size=2000,
+        )
+        emails = [f'user{random.randrange(args.scale)}@example.com' for _ in range(args.repeat)]
+        client = Client()
+
+        def legacy():
+            # Case-sensitive, so use the stored spelling
+            user = User.objects.filter(email=next(stored)).first()
+            assert authenticate(username=user.username, password='benchpass123') is not None
+
+        def email_backend():
+            assert authenticate(email=next(lookups), password='benchpass123') is not None
+
+        def login_view():
+            response = client.post(
+                '/api/accounts/login/', {'email': next(lookups), 'password': 'benchpass123'},
+                content_type='application/json',
+            )
+            assert response.status_code == 200, response.status_code
+
+        for case, func in (('legacy_lookup', legacy), ('email_backend', email_backend), ('login_view', login_view)):
+            stored = iter(email.replace('user', 'User').replace('example', 'Example') for email in emails)
+            lookups = iter(emails)
+            with CaptureQueriesContext(connection) as queries:
+                timings = time_calls(func, args.repeat)
+            results[case] = {**summarize(timings), 'queries_per_call': len(queries) / args.repeat}
+
+    report('login', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Throughput of the price alert matcher: seed ``--scale`` alert subscriptions
+over a few thousand routes, then match ``--changes`` repriced travel options
+against them.
+
+    python -m benchmarks.price_alerts --scale 1000000 --changes 100000
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+CITIES = [f"City {i}" for i in range(50)]
+
+
+def seed(num_alerts, num_options):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from travel_options.models import PriceAlert, TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com')
+
+    def route():
+        return rng.sample(CITIES, 2)
+
+    batch = []
+    for i in range(num_options):
+        source, destination = route()
+        departure = now + timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1440))
+        batch.append(TravelOption(
+            travel_id=f"A{i}", type=rng.choice(['BUS', 'TRAIN', 'FLIGHT']), source=source, destination=destination,
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+            price=Decimal(rng.randint(20, 200)), total_seats=100, available_seats=100, operator_name='Bench',
+        ))
+        if len(batch) == 10000:
+            TravelOption.objects.bulk_create(batch)
+            batch = []
+    TravelOption.objects.bulk_create(batch)
+
+    batch = []
+    for i in range(num_alerts):
+        source, destination = route()
+        start = now + timedelta(days=rng.randint(1, 120))
+        batch.append(PriceAlert(
+            user=user, source=source.lower(), destination=destination.lower(),
+            type=rng.choice(['', '', 'BUS', 'TRAIN', 'FLIGHT']),
+            departure_from=start, departure_to=start + timedelta(days=rng.randint(1, 14)),
+            max_price=Decimal(rng.randint(10, 120)),
+        ))
+        if len(batch) == 10000:
+            PriceAlert.objects.bulk_create(batch)
+            batch = []
+    PriceAlert.objects.bulk_create(batch)
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--changes', type=int, default=10000, help='Changed travel options to match')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    setup_django()
+
+    from travel_options.alerts import PriceAlertMatcher
+    from travel_options.models import TravelOption
+
+    results = {}
+    with benchmark_database():
+        seed(args.scale, args.changes)
+        option_ids = list(TravelOption.objects.values_list('pk', flat=True))
+        for case in ('first_match', 'rematch'):
+            start = time.perf_counter()
+            matcher = PriceAlertMatcher(chunk_size=args.chunk_size).match(option_ids)
+            seconds = time.perf_counter() - start
+            results[case] = {
+                'alerts': args.scale, 'options': matcher.options, 'matched': matcher.matched,
+                'queued': matcher.queued, 'seconds': seconds, 'options_per_sec': matcher.options / seconds,
+            }
+
+    report('price_alerts', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Time the reconcile_seats command over a seeded booking table.
+
+    python -m benchmarks.reconcile --scale 1000000
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+
+def seed(num_bookings):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from bookings.models import Booking
+    from travel_options.models import TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com')
+
+    num_options = max(num_bookings // 50, 1)
+    TravelOption.objects.bulk_create([
+        TravelOption(
+            travel_id=f"R{i}", type='BUS', source='Austin', destination='Dallas',
+            departure_datetime=now + timedelta(days=1 + i % 90),
+            arrival_datetime=now + timedelta(days=1 + i % 90, hours=3),
+            price=Decimal('25.00'), total_seats=200, available_seats=200, operator_name='Bench Bus',
+        )
+        for i in range(num_options)
+    ], batch_size=5000)
+    option_ids = list(TravelOption.objects.values_list('pk', flat=True))
+
+    batch = []
+    for i in range(num_bookings):
+        batch.append(Booking(
+            booking_id=f"BKBENCH{i}", user=user, travel_option_id=rng.choice(option_ids),
+            number_of_seats=rng.randint(1, 3), total_price=Decimal('25.00'),
+            status=rng.choice(['CONFIRMED', 'CONFIRMED', 'CANCELLED', 'PENDING']),
+            contact_email='bench@example.com', contact_phone='1234567890',
+        ))
+        if len(batch) == 10000:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    Booking.objects.bulk_create(batch)
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    from django.core.management import call_command
+
+    with benchmark_database():
+        seed(args.scale)
+        results = {}
+        for case, command_args in [('report', []), ('repair', ['--repair']), ('clean_rerun', [])]:
+            start = time.perf_counter()
+            call_command('reconcile_seats', *command_args, stdout=StringIO())
+            results[case] = {'bookings': args.scale, 'seconds': time.perf_counter() - start}
+
+    report('reconcile', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
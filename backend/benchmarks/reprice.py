@@ -0,0 +1,73 @@
+"""
+Throughput of the dynamic pricing engine: a first pass where most prices
+move, a rerun where nothing changes (pure scan cost), and a pass after a
+tenth of the options sold more seats.
+
+    python -m benchmarks.reprice --scale 500000
+"""
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+
+def seed(num_options):
+    from django.utils import timezone
+    from travel_options.models import TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    batch = []
+    for i in range(num_options):
+        departure = now + timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1440))
+        batch.append(TravelOption(
+            travel_id=f"P{i}", type='BUS', source='Austin', destination='Dallas',
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+            price=Decimal(rng.randint(20, 200)), total_seats=100, available_seats=rng.randint(0, 100),
+            operator_name='Bench Bus',
+        ))
+        if len(batch) == 10000:
+            TravelOption.objects.bulk_create(batch)
+            batch = []
+    TravelOption.objects.bulk_create(batch)
+
+
+def sell_seats(fraction):
+    from django.db.models import F
+    from travel_options.models import TravelOption
+
+    step = int(1 / fraction)
+    TravelOption.objects.annotate(bucket=F('pk') % step).filter(bucket=0, available_seats__gte=10).update(
+        available_seats=F('available_seats') - 10
+    )
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    setup_django()
+
+    from travel_options.pricing import Repricer
+
+    results = {}
+    with benchmark_database():
+        seed(args.scale)
+        for case in ('first_pass', 'no_change', 'after_sales'):
+            if case == 'after_sales':
+                sell_seats(0.1)
+            start = time.perf_counter()
+            repricer = Repricer(chunk_size=args.chunk_size).run()
+            seconds = time.perf_counter() - start
+            results[case] = {
+                'options': repricer.scanned, 'changed': repricer.changed,
+                'seconds': seconds, 'options_per_sec': repricer.scanned / seconds,
+            }
+
+    report('reprice', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
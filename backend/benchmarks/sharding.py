@@ -0,0 +1,160 @@
+"""
+Booking throughput with travel options spread over 1, 2 and 4 shards.
+
+``--workers`` processes, like sync WSGI workers, each book and confirm seats
+through the API as fast as they can, on options spread over every route. Shards are SQLite files in
+a temporary directory, so each has its own write lock as each PostgreSQL
+shard has its own server; users and tokens stay on the benchmark database.
+SQLite fails rather than waits when two open transactions both start
+writing, so each shard takes one booking at a time, under a lock per shard.
+
+    python -m benchmarks.sharding --scale 400 --repeat 800 --workers 8
+"""
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from benchmarks.fare_search import CITIES
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+SHARD_COUNTS = (1, 2, 4)
+
+# Per-shard locks, inherited by the forked workers
+_locks = {}
+
+
+def add_shards(aliases, directory):
+    """Configure and migrate a SQLite database for each shard alias"""
+    from django.core.management import call_command
+    from django.db import connections
+
+    for alias in aliases:
+        databases = connections.configure_settings({'default': connections.settings['default'], alias: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(Path(directory) / f'{alias}.sqlite3'),
+            'OPTIONS': {'timeout': 60},
+        }})
+        connections.settings[alias] = databases[alias]
+        call_command('migrate', database=alias, verbosity=0)
+
+
+def seed(scale):
+    from django.utils import timezone
+    from travel_booking.db.sharding import shard_for_route
+    from travel_options.models import TravelOption
+
+    rng = random.Random(42)
+    now = timezone.now()
+    by_shard = {}
+    for i in range(scale):
+        source, destination = rng.sample(CITIES, 2)
+        departure = now + timedelta(days=rng.randint(2, 60))
+        option = TravelOption(
+            travel_id=f'S{i}', type='BUS', source=source, destination=destination,
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=4),
+            price=Decimal(rng.randint(20, 200)), total_seats=10000, available_seats=10000,
+            operator_name='Bench Coach',
+        )
+        by_shard.setdefault(shard_for_route(source, destination), []).append(option)
+
+    option_ids = []
+    for alias, options in by_shard.items():
+        TravelOption.objects.using(alias).bulk_create(options, batch_size=2000)
+        option_ids.extend(TravelOption.objects.using(alias).values_list('pk', flat=True))
+    return option_ids
+
+
+def book_all(token, user_id, option_ids):
+    """One worker's bookings; returns how many failed"""
+    from django.test import Client
+    from bookings.models import Booking
+    from travel_booking.db.sharding import shard_for_pk
+
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    failures = 0
+    for option_id in option_ids:
+        with _locks[shard_for_pk(option_id)]:
+            response = client.post(
+                '/api/bookings/create/',
+                data=json.dumps({
+                    'travel_option_id': option_id, 'number_of_seats': 1,
+                    'contact_email': 'bench@example.com', 'contact_phone': '1234567890',
+                }),
+                content_type='application/json',
+            )
+            if response.status_code != 201:
+                failures += 1
+                continue
+            booking_id = Booking.objects.using(shard_for_pk(option_id)).filter(
+                user_id=user_id, travel_option_id=option_id
+            ).values_list('pk', flat=True).latest('pk')
+            failures += client.post(f'/api/bookings/{booking_id}/confirm/').status_code != 200
+    return failures
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--workers', type=int, default=8, help='Processes booking at the same time')
+    args = parser.parse_args()
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connections
+    from django.test import override_settings
+    from rest_framework.authtoken.models import Token
+
+    results = {}
+    context = multiprocessing.get_context('fork')
+    # No throttling: every request comes from the same test client address
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+    with benchmark_database(), override_settings(REST_FRAMEWORK=rest_framework), \
+            tempfile.TemporaryDirectory() as directory:
+        users = [
+            get_user_model().objects.create_user(username=f'bench{number}', password='unused')
+            for number in range(args.workers)
+        ]
+        tokens = [Token.objects.create(user=user).key for user in users]
+
+        for count in SHARD_COUNTS:
+            aliases = [f'bench_{count}_{index}' for index in range(count)]
+            add_shards(aliases, directory)
+            with override_settings(DATABASE_SHARDS=aliases):
+                call_command('init_shards', stdout=StringIO())
+                option_ids = seed(args.scale)
+                per_worker = args.repeat // args.workers
+                work = [
+                    (token, user.pk, random.Random(number).sample(option_ids, min(per_worker, len(option_ids))))
+                    for number, (token, user) in enumerate(zip(tokens, users))
+                ]
+                _locks.clear()
+                _locks.update({alias: context.Lock() for alias in aliases})
+                # Workers must not share the shard connections opened while seeding
+                for alias in aliases:
+                    connections[alias].close()
+
+                with context.Pool(args.workers) as pool:
+                    start = time.perf_counter()
+                    failures = sum(pool.starmap(book_all, work))
+                    elapsed = time.perf_counter() - start
+
+            bookings = sum(len(option_ids) for _, _, option_ids in work)
+            results[f'{count}_shard{"s" if count > 1 else ""}'] = {
+                'bookings': bookings,
+                'failures': failures,
+                'seconds': round(elapsed, 3),
+                'bookings_per_sec': round(bookings / elapsed, 1),
+            }
+
+    report('sharding', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Per-request overhead of throttling: DRF's AnonRateThrottle (timestamp list
+in the per-process cache) versus the shared token-bucket throttle, with a
+hot client near its limit and with ``--scale`` tracked clients, plus the
+database queries each check makes.
+
+    python -m benchmarks.throttle --scale 100000 --repeat 2000
+"""
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    import random
+    import time
+
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.throttling import AnonRateThrottle
+    from accounts.models import ThrottleBucket
+    from accounts.throttling import SearchIPThrottle
+
+    # Generous limits so every timed check is allowed and does its full work
+    rate = f'{args.repeat * 2}/hour'
+    rates = {'anon': rate, 'search_ip': rate}
+    factory = APIRequestFactory()
+
+    def make_request(ip):
+        return Request(factory.post('/api/travel-options/search/', REMOTE_ADDR=ip))
+
+    results = {}
+    with benchmark_database(), override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+        now = time.time()
+        ThrottleBucket.objects.bulk_create(
+            [ThrottleBucket(key=f'throttle:search_ip:10.{i >> 16}.{i >> 8 & 255}.{i & 255}', tat=now)
+             for i in range(args.scale)],
+            batch_size=5000,
+        )
+        hot = make_request('192.168.0.1')
+        spread = [make_request(f'10.{i >> 16}.{i >> 8 & 255}.{i & 255}')
+                  for i in random.choices(range(args.scale), k=args.repeat)]
+
+        AnonRateThrottle.THROTTLE_RATES = rates
+        cases = (
+            ('drf_anon_hot_client', AnonRateThrottle, lambda: hot),
+            ('bucket_hot_client', SearchIPThrottle, lambda: hot),
+            ('bucket_spread_clients', SearchIPThrottle, lambda: next(requests)),
+        )
+        for case, throttle_class, next_request in cases:
+            cache.clear()
+            requests = iter(spread)
+
+            def check():
+                assert throttle_class().allow_request(next_request(), None)
+
+            with CaptureQueriesContext(connection) as queries:
+                timings = time_calls(check, args.repeat)
+            results[case] = {**summarize(timings), 'queries_per_check': len(queries) / args.repeat}
+
+    report('throttle', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
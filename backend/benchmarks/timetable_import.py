@@ -0,0 +1,78 @@
+"""
+Throughput of import_timetable on a generated CSV feed: a fresh load, a
+re-import of the same feed where every row is an update, and a ``--sync`` of
+the unchanged feed where every row is skipped.
+
+    python -m benchmarks.timetable_import --scale 1000000
+"""
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django
+
+CITIES = ['Austin', 'Dallas', 'Houston', 'San Antonio', 'El Paso', 'Lubbock']
+FIELDS = [
+    'travel_id', 'type', 'source', 'destination', 'departure_datetime', 'arrival_datetime',
+    'price', 'total_seats', 'available_seats', 'operator_name', 'amenities',
+]
+
+
+def write_feed(path, rows, invalid_ratio=0.01):
+    from django.utils import timezone
+
+    rng = random.Random(42)
+    now = timezone.now()
+    with open(path, 'w', newline='') as feed:
+        writer = csv.writer(feed)
+        writer.writerow(FIELDS)
+        for i in range(rows):
+            source, destination = rng.sample(CITIES, 2)
+            departure = now + timedelta(days=rng.randint(1, 180), minutes=rng.randint(0, 1440))
+            arrival = departure + timedelta(hours=rng.randint(2, 9))
+            if rng.random() < invalid_ratio:
+                arrival = departure - timedelta(hours=1)
+            writer.writerow([
+                f"T{i}", 'BUS', source, destination, departure.isoformat(), arrival.isoformat(),
+                f"{rng.randint(15, 120)}.00", 50, '', 'Bench Bus', 'wifi|power',
+            ])
+
+
+def run_import(path, chunk_size, *extra):
+    from django.core.management import call_command
+
+    start = time.perf_counter()
+    call_command(
+        'import_timetable', path, '--chunk-size', str(chunk_size), *extra,
+        stdout=StringIO(), stderr=StringIO(),
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = get_parser(__doc__)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    setup_django()
+
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    os.close(handle)
+    results = {}
+    try:
+        with benchmark_database():
+            write_feed(path, args.scale)
+            for case, extra in (('initial_load', ()), ('full_update', ()), ('sync_unchanged', ('--sync',))):
+                seconds = run_import(path, args.chunk_size, *extra)
+                results[case] = {'rows': args.scale, 'seconds': seconds, 'rows_per_sec': args.scale / seconds}
+    finally:
+        os.remove(path)
+
+    report('timetable_import', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Per-request cost of token authentication on the profile endpoint: DRF's
+TokenAuthentication versus CachedTokenAuthentication, with the database
+queries each request makes.
+
+    python -m benchmarks.token_auth --repeat 2000
+"""
+from benchmarks.utils import benchmark_database, get_parser, report, setup_django, summarize, time_calls
+
+
+def main():
+    args = get_parser(__doc__).parse_args()
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIRequestFactory
+    from accounts.authentication import CachedTokenAuthentication
+    from accounts.views import ProfileAPIView
+
+    results = {}
+    with benchmark_database():
+        user = get_user_model().objects.create_user(username='bench', email='bench@example.com')
+        token = Token.objects.create(user=user)
+        factory = APIRequestFactory()
+
+        for case, authentication in (('drf_token', TokenAuthentication), ('cached_token', CachedTokenAuthentication)):
+            view = ProfileAPIView.as_view(authentication_classes=[authentication])
+
+            def request():
+                response = view(factory.get('/api/accounts/profile/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+                assert response.status_code == 200, response.status_code
+
+            request()  # Warm up
+            with CaptureQueriesContext(connection) as queries:
+                timings = time_calls(request, args.repeat)
+            results[case] = {**summarize(timings), 'queries_per_request': len(queries) / args.repeat}
+
+    report('token_auth', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throwaway test database created from the
+configured ``DATABASES['default']``, so it never touches real data.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_booking.settings')
+    import django
+    django.setup()
+
+
+def get_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--scale', type=int, default=10000, help='Number of rows to seed')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed iterations per case')
+    parser.add_argument('--json', action='store_true', help='Print machine-readable results')
+    return parser
+
+
+@contextmanager
+def benchmark_database():
+    """Create the test database for the duration of the benchmark"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def time_calls(func, repeat):
+    """Run ``func`` ``repeat`` times and return per-call timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'calls': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': percentile(50) * 1000,
+        'p95_ms': percentile(95) * 1000,
+        'p99_ms': percentile(99) * 1000,
+    }
+
+
+def report(name, results, as_json=False):
+    """Print ``{case: summary}`` results as a table or a JSON document"""
+    if as_json:
+        print(json.dumps({'benchmark': name, 'results': results}, indent=2, default=str))
+        return
+
+    print(f"== {name}")
+    for case, summary in results.items():
+        line = ', '.join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in summary.items()
+        )
+        print(f"  {case}: {line}")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, PassengerDetail
+from .models import Booking, OutboxEmail, PassengerDetail, WaitlistEntry
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -46,4 +46,18 @@ class BookingAdmin(admin.ModelAdmin):
 class PassengerDetailAdmin(admin.ModelAdmin):
     list_display = ('booking', 'first_name', 'last_name', 'age', 'gender')
     list_filter = ('gender', 'booking__status')
-    search_fields = ('first_name', 'last_name', 'booking__booking_id', 'id_number')
\ No newline at end of file
+    search_fields = ('first_name', 'last_name', 'booking__booking_id', 'id_number')
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'travel_option', 'fare_class', 'number_of_seats', 'status', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('user__username', 'travel_option__travel_id', 'contact_email')
+    readonly_fields = ('booking', 'created_at', 'promoted_at')
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'event')
+    search_fields = ('to_email', 'subject', 'booking__booking_id')
+    readonly_fields = ('booking', 'created_at', 'sent_at', 'last_error')
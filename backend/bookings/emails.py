@@ -0,0 +1,41 @@
+"""Plain-text customer emails for booking events, rendered when queued"""
+
+SUBJECTS = {
+    'BOOKING_CONFIRMED': 'Booking {booking_id} confirmed',
+    'BOOKING_CANCELLED': 'Booking {booking_id} cancelled',
+}
+
+BODIES = {
+    'BOOKING_CONFIRMED': (
+        "Hi {name},\n\n"
+        "Your booking {booking_id} is confirmed.\n\n"
+        "{route}\n"
+        "Departure: {departure}\n"
+        "Seats: {seats}\n"
+        "Total: {total}\n\n"
+        "Have a good trip!\n"
+    ),
+    'BOOKING_CANCELLED': (
+        "Hi {name},\n\n"
+        "Your booking {booking_id} has been cancelled.\n\n"
+        "{route}\n"
+        "Departure: {departure}\n"
+        "{reason}"
+    ),
+}
+
+
+def render_booking_email(booking, event):
+    """``(subject, body)`` for a booking event"""
+    travel_option = booking.travel_option
+    context = {
+        'name': booking.user.first_name or booking.user.username,
+        'booking_id': booking.booking_id,
+        'route': f"{travel_option.get_type_display()} {travel_option.travel_id}: "
+                 f"{travel_option.source} to {travel_option.destination}",
+        'departure': travel_option.departure_datetime.strftime('%Y-%m-%d %H:%M %Z'),
+        'seats': booking.number_of_seats,
+        'total': f"{booking.total_price} {booking.currency}",
+        'reason': f"Reason: {booking.cancellation_reason}\n" if booking.cancellation_reason else '',
+    }
+    return SUBJECTS[event].format(**context), BODIES[event].format(**context)
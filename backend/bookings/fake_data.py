@@ -0,0 +1,242 @@
+"""
+Deterministic synthetic travel options, users, bookings and passengers at
+production-like volumes.
+
+Everything comes from one seeded ``random.Random``, so a seed and start
+date always give the same rows. Cities are drawn by population, so a few
+routes carry most of the traffic; the distance between them picks the
+travel type, duration and fare, and departures cluster around the morning
+and evening peaks. Rows are written with ``bulk_create`` (no ``save()`` or
+``full_clean()``), one transaction per chunk of travel options, and a
+chunk's bookings are generated before its options are written, so
+``available_seats`` of options and fare classes always equals capacity
+minus confirmed seats.
+"""
+import math
+import random
+from itertools import accumulate
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from travel_booking.db.sharding import add_shard_users, shard_aliases, shard_for_route
+from travel_options.models import FareClass, TravelOption
+
+from .models import Booking, PassengerDetail
+
+# (city, population in millions, latitude, longitude)
+CITIES = [
+    ('New York', 8.3, 40.71, -74.01), ('Los Angeles', 3.9, 34.05, -118.24), ('Chicago', 2.7, 41.88, -87.63),
+    ('Houston', 2.3, 29.76, -95.37), ('Phoenix', 1.6, 33.45, -112.07), ('Philadelphia', 1.6, 39.95, -75.17),
+    ('San Antonio', 1.5, 29.42, -98.49), ('San Diego', 1.4, 32.72, -117.16), ('Dallas', 1.3, 32.78, -96.80),
+    ('Austin', 1.0, 30.27, -97.74), ('San Francisco', 0.8, 37.77, -122.42), ('Seattle', 0.75, 47.61, -122.33),
+    ('Denver', 0.72, 39.74, -104.99), ('Washington', 0.69, 38.91, -77.04), ('Boston', 0.65, 42.36, -71.06),
+    ('Nashville', 0.69, 36.16, -86.78), ('Las Vegas', 0.65, 36.17, -115.14), ('Portland', 0.64, 45.52, -122.68),
+    ('Atlanta', 0.5, 33.75, -84.39), ('Miami', 0.44, 25.76, -80.19), ('Minneapolis', 0.43, 44.98, -93.27),
+    ('New Orleans', 0.38, 29.95, -90.07), ('Salt Lake City', 0.2, 40.76, -111.89), ('Baltimore', 0.58, 39.29, -76.61),
+]
+OPERATORS = {
+    'FLIGHT': ['SkyWays', 'BlueJet', 'Coastal Air', 'Summit Airlines', 'Northstar'],
+    'TRAIN': ['National Rail', 'Express Rail', 'Pacific Lines'],
+    'BUS': ['Greyline', 'MetroCoach', 'Budget Bus', 'Star Shuttle'],
+}
+AMENITIES = {
+    'FLIGHT': ['WiFi', 'Meals', 'Entertainment', 'Extra Legroom'],
+    'TRAIN': ['WiFi', 'Dining Car', 'Power Outlets', 'Quiet Car'],
+    'BUS': ['WiFi', 'Power Outlets', 'Restroom', 'Reclining Seats'],
+}
+# Speed in km/h, fixed overhead in hours, fare per km and flat fare, seat range
+TYPE_PROFILES = {
+    'FLIGHT': (750, 0.75, Decimal('0.11'), Decimal('45'), (120, 220)),
+    'TRAIN': (110, 0.25, Decimal('0.09'), Decimal('15'), (250, 500)),
+    'BUS': (75, 0.25, Decimal('0.05'), Decimal('8'), (40, 60)),
+}
+# Fare classes as (code, share of seats, price factor); buses sell one class
+FARE_CLASS_PLANS = {
+    'FLIGHT': [('ECONOMY', 0.8, Decimal('1.0')), ('PREMIUM', 0.12, Decimal('1.6')), ('BUSINESS', 0.08, Decimal('3.2'))],
+    'TRAIN': [('ECONOMY', 0.75, Decimal('1.0')), ('FIRST', 0.15, Decimal('1.8')), ('SLEEPER', 0.10, Decimal('2.4'))],
+    'BUS': [],
+}
+# Departure hours weighted towards the morning and evening peaks
+HOUR_WEIGHTS = [1, 1, 1, 1, 2, 4, 8, 10, 9, 6, 5, 5, 5, 5, 5, 6, 8, 10, 9, 6, 4, 3, 2, 1]
+SEAT_WEIGHTS = [50, 25, 15, 10]
+BOOKING_STATUSES = [('CONFIRMED', 85), ('PENDING', 7), ('CANCELLED', 8)]
+FIRST_NAMES = ['James', 'Mary', 'Wei', 'Aisha', 'Carlos', 'Priya', 'Olga', 'Kenji', 'Fatima', 'Liam', 'Sofia', 'Noah']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Khan', 'Johnson', 'Patel', 'Kim', 'Nguyen', 'Brown', 'Silva', 'Ivanova']
+CENT = Decimal('0.01')
+
+
+def distance_km(a, b):
+    """Great-circle distance between two ``CITIES`` entries"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[2], a[3], b[2], b[3]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+class FakeDataGenerator:
+    """
+    Writes ``travel_options`` options, ``users`` users and about
+    ``bookings`` bookings (fewer if options fill up) in chunks of
+    ``chunk_size`` options. Keys start with ``prefix`` so runs with
+    different prefixes don't collide.
+    """
+
+    def __init__(self, travel_options, users, bookings, seed=42, start_date=None, days=90,
+                 prefix='FAKE', chunk_size=5000, progress=None):
+        self.travel_options = travel_options
+        self.user_count = users
+        self.booking_count = bookings
+        self.rng = random.Random(seed)
+        self.start = timezone.make_aware(datetime.combine(start_date or timezone.localdate(), dt_time()))
+        self.days = days
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda counts: None)
+        self.counts = {'users': 0, 'travel_options': 0, 'fare_classes': 0, 'bookings': 0, 'passengers': 0}
+        self.user_ids = []
+        self._bookings_made = 0
+        # Cumulative weights, so random.choices doesn't add them up on every call
+        self._routes, self._route_weights = self._build_routes()
+        self._hour_weights = list(accumulate(HOUR_WEIGHTS))
+
+    def _build_routes(self):
+        routes, weights = [], []
+        for source in CITIES:
+            for destination in CITIES:
+                if source is destination:
+                    continue
+                km = distance_km(source, destination)
+                if km < 1500:
+                    types = [('BUS', 3), ('TRAIN', 2), ('FLIGHT', 1 if km > 300 else 0)]
+                else:
+                    types = [('FLIGHT', 8), ('TRAIN', 1), ('BUS', 1 if km < 2500 else 0)]
+                routes.append((source[0], destination[0], km, [t for t, w in types if w], [w for _, w in types if w]))
+                # Gravity model: traffic grows with both populations and falls with distance
+                weights.append(source[1] * destination[1] / (km ** 0.5))
+        return routes, list(accumulate(weights))
+
+    def run(self):
+        self.create_users()
+        for first in range(0, self.travel_options, self.chunk_size):
+            self.create_chunk(first, min(first + self.chunk_size, self.travel_options))
+            self.progress(self.counts)
+        return self.counts
+
+    def create_users(self):
+        User = get_user_model()
+        password = make_password('password123')
+        name = self.prefix.lower()
+        for first in range(0, self.user_count, self.chunk_size):
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{name}_user{number}', email=f'{name}.user{number}@example.com', password=password,
+                    first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                )
+                for number in range(first, min(first + self.chunk_size, self.user_count))
+            ])
+            self.user_ids.extend(user.pk for user in users)
+            for alias in shard_aliases():
+                add_shard_users(self.user_ids[first:], alias)
+            self.counts['users'] = len(self.user_ids)
+            self.progress(self.counts)
+
+    def make_option(self, number):
+        rng = self.rng
+        source, destination, km, types, type_weights = rng.choices(self._routes, cum_weights=self._route_weights)[0]
+        travel_type = rng.choices(types, type_weights)[0]
+        speed, overhead, per_km, flat, (fewest, most) = TYPE_PROFILES[travel_type]
+
+        departure = self.start + timedelta(
+            days=rng.randrange(1, self.days + 1), hours=rng.choices(range(24), cum_weights=self._hour_weights)[0],
+            minutes=rng.randrange(0, 60, 5),
+        )
+        hours = km * rng.uniform(1.15, 1.35) / speed + overhead
+        price = ((flat + per_km * Decimal(round(km))) * Decimal(str(round(rng.uniform(0.8, 1.3), 2)))).quantize(CENT)
+        total_seats = rng.randint(fewest, most)
+        return TravelOption(
+            travel_id=f'{self.prefix}{number:09d}', type=travel_type, source=source, destination=destination,
+            departure_datetime=departure, arrival_datetime=departure + timedelta(minutes=round(hours * 60 / 5) * 5),
+            price=price, base_price=price, total_seats=total_seats, available_seats=total_seats,
+            operator_name=rng.choice(OPERATORS[travel_type]),
+            amenities=rng.sample(AMENITIES[travel_type], rng.randint(0, 3)),
+        )
+
+    def make_fare_classes(self, option):
+        fare_classes = []
+        remaining = option.total_seats
+        plan = FARE_CLASS_PLANS[option.type]
+        for index, (code, share, factor) in enumerate(plan):
+            seats = remaining if index == len(plan) - 1 else max(1, round(option.total_seats * share))
+            remaining -= seats
+            fare_classes.append(FareClass(
+                travel_option=option, code=code, price=(option.price * factor).quantize(CENT),
+                total_seats=seats, available_seats=seats,
+            ))
+        return fare_classes
+
+    def make_bookings(self, option, fare_classes):
+        """Bookings and passengers on ``option``, taking confirmed seats out of it and its fare classes"""
+        rng = self.rng
+        bookings, passengers = [], []
+        if not self.user_ids or not self.booking_count:
+            return bookings, passengers
+        # Exponential, so popular departures sell out while others stay nearly empty
+        wanted = round(rng.expovariate(self.travel_options / self.booking_count))
+        for _ in range(wanted):
+            seats = rng.choices(range(1, 5), SEAT_WEIGHTS)[0]
+            fare_class = rng.choices(fare_classes, [f.total_seats for f in fare_classes])[0] if fare_classes else None
+            holder = fare_class or option
+            if seats > holder.available_seats:
+                continue
+            status = rng.choices(*zip(*BOOKING_STATUSES))[0]
+            if status in Booking.SEAT_HOLDING_STATUSES:
+                holder.available_seats -= seats
+                if fare_class:
+                    option.available_seats -= seats
+            unit_price = holder.price
+            self._bookings_made += 1
+            booking = Booking(
+                booking_id=f'BK{self.prefix}{self._bookings_made:011d}', user_id=rng.choice(self.user_ids),
+                travel_option=option, fare_class=fare_class, number_of_seats=seats,
+                total_price=unit_price * seats, currency=option.currency, status=status,
+                contact_email=f'traveller{rng.randrange(10 ** 6)}@example.com',
+                contact_phone=f'555{rng.randrange(10 ** 7):07d}', payment_method='card' if status != 'PENDING' else '',
+                cancelled_at=self.start if status == 'CANCELLED' else None,
+            )
+            bookings.append(booking)
+            passengers.extend(
+                PassengerDetail(
+                    booking=booking, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    age=rng.randint(1, 85), gender=rng.choice('MFO'),
+                )
+                for _ in range(seats)
+            )
+        return bookings, passengers
+
+    def create_chunk(self, first, last):
+        by_shard = {}
+        for number in range(first, last):
+            option = self.make_option(number)
+            fare_classes = self.make_fare_classes(option)
+            bookings, passengers = self.make_bookings(option, fare_classes)
+            alias = shard_for_route(option.source, option.destination) or DEFAULT_DB_ALIAS
+            rows = by_shard.setdefault(alias, ([], [], [], []))
+            rows[0].append(option)
+            rows[1].extend(fare_classes)
+            rows[2].extend(bookings)
+            rows[3].extend(passengers)
+
+        for alias, (options, fare_classes, bookings, passengers) in by_shard.items():
+            with transaction.atomic(using=alias):
+                TravelOption.objects.using(alias).bulk_create(options, batch_size=1000)
+                FareClass.objects.using(alias).bulk_create(fare_classes, batch_size=1000)
+                Booking.objects.using(alias).bulk_create(bookings, batch_size=1000)
+                PassengerDetail.objects.using(alias).bulk_create(passengers, batch_size=1000)
+            self.counts['travel_options'] += len(options)
+            self.counts['fare_classes'] += len(fare_classes)
+            self.counts['bookings'] += len(bookings)
+            self.counts['passengers'] += len(passengers)
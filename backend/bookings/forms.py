@@ -4,13 +4,20 @@ from .models import Booking
 class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
-        fields = ['number_of_seats', 'contact_email', 'contact_phone', 'special_requests']
+        fields = ['fare_class', 'number_of_seats', 'contact_email', 'contact_phone', 'special_requests']
         widgets = {
             'special_requests': forms.Textarea(attrs={'rows': 3}),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Options sold in fare classes need one picked; the others have none to offer
+        fare_classes = self.instance.travel_option.fare_classes.all() if self.instance.travel_option_id else None
+        if fare_classes is not None and fare_classes.exists():
+            self.fields['fare_class'].queryset = fare_classes
+            self.fields['fare_class'].required = True
+        else:
+            del self.fields['fare_class']
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'
         
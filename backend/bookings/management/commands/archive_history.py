@@ -0,0 +1,92 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import ArchivedBooking, Booking
+from bookings.serializers import BookingSerializer
+from travel_options.models import ArchivedTravelOption, TravelOption
+from travel_options.serializers import TravelOptionSerializer
+from travel_booking.db.sharding import each_shard, sharded
+
+
+class Command(BaseCommand):
+    help = (
+        "Move bookings and travel options that departed before the retention "
+        "window into the compressed archive tables, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Retention window in days')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would move')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Live bookings are never archived, whatever their departure date
+        bookings = Booking.objects.filter(
+            travel_option__departure_datetime__lt=cutoff
+        ).exclude(status__in=['PENDING', 'CONFIRMED']).order_by('pk')
+        travel_options = TravelOption.objects.filter(
+            departure_datetime__lt=cutoff, bookings__isnull=True
+        ).order_by('pk')
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would archive {sharded(bookings).count()} booking(s); travel options "
+                f"departed before {cutoff:%Y-%m-%d} are archived once they have no bookings left"
+            )
+            return
+
+        self.archive('bookings', bookings, self.archive_bookings, options['batch_size'])
+        self.archive('travel options', travel_options, self.archive_travel_options, options['batch_size'])
+
+    def archive(self, label, queryset, archive_batch, batch_size):
+        started = time.perf_counter()
+        total = 0
+        for alias in each_shard():
+            while True:
+                # Archive tables stay on default, next to the shard's own transaction
+                with transaction.atomic(), transaction.atomic(using=alias):
+                    ids = list(queryset.select_for_update(of=('self',)).values_list('pk', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    total += archive_batch(ids)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} {label} in {elapsed:.2f}s"))
+
+    def archive_bookings(self, ids):
+        bookings = Booking.objects.filter(pk__in=ids).select_related('travel_option', 'fare_class').prefetch_related(
+            'passengers', 'travel_option__stops', 'travel_option__fare_classes'
+        )
+        ArchivedBooking.objects.bulk_create([
+            ArchivedBooking(
+                original_id=booking.pk,
+                booking_id=booking.booking_id,
+                user_id=booking.user_id,
+                status=booking.status,
+                booking_date=booking.booking_date,
+                departure_datetime=booking.travel_option.departure_datetime,
+                payload=ArchivedBooking.compress(BookingSerializer(booking).data),
+            )
+            for booking in bookings
+        ])
+        Booking.objects.filter(pk__in=ids).delete()
+        return len(ids)
+
+    def archive_travel_options(self, ids):
+        travel_options = TravelOption.objects.filter(pk__in=ids).prefetch_related('stops', 'fare_classes')
+        ArchivedTravelOption.objects.bulk_create([
+            ArchivedTravelOption(
+                original_id=travel_option.pk,
+                travel_id=travel_option.travel_id,
+                departure_datetime=travel_option.departure_datetime,
+                payload=ArchivedTravelOption.compress(TravelOptionSerializer(travel_option).data),
+            )
+            for travel_option in travel_options
+        ])
+        TravelOption.objects.filter(pk__in=ids).delete()
+        return len(ids)
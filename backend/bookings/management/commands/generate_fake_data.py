@@ -0,0 +1,60 @@
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.fake_data import FakeDataGenerator
+from travel_booking.db.sharding import sharded
+from travel_options.models import TravelOption
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load deterministic synthetic travel options (with fare classes), "
+        "users, bookings and passengers for load and scaling tests. Confirmed "
+        "bookings are taken out of available_seats. Fake users log in with "
+        "password123."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--travel-options', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--bookings', type=int, default=20000, help='Bookings to aim for; full options take fewer')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--start-date', type=date.fromisoformat,
+                            help='Departures start the day after this (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--days', type=int, default=90, help='Days over which departures are spread')
+        parser.add_argument('--prefix', default='FAKE', help='Start of travel ids, booking ids and usernames')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Travel options per transaction')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if not prefix.isalnum() or len(prefix) > 6:
+            raise CommandError("--prefix must be 1-6 letters or digits")
+        if sharded(TravelOption.objects.filter(travel_id__startswith=prefix)).count() or \
+                get_user_model().objects.filter(username__startswith=f'{prefix.lower()}_user').exists():
+            raise CommandError(f"Data with prefix {prefix} already exists; pick another --prefix")
+
+        started = time.perf_counter()
+
+        def progress(counts):
+            rows = sum(counts.values())
+            self.stdout.write(
+                f"  {counts['travel_options']} options, {counts['bookings']} bookings, "
+                f"{rows} rows ({rows / (time.perf_counter() - started):.0f} rows/sec)"
+            )
+
+        counts = FakeDataGenerator(
+            travel_options=options['travel_options'], users=options['users'], bookings=options['bookings'],
+            seed=options['seed'], start_date=options['start_date'], days=options['days'], prefix=prefix,
+            chunk_size=options['chunk_size'], progress=progress if options['verbosity'] > 1 else None,
+        ).run()
+
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} users, {counts['travel_options']} travel options, "
+            f"{counts['fare_classes']} fare classes, {counts['bookings']} bookings and "
+            f"{counts['passengers']} passengers: {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/sec)"
+        ))
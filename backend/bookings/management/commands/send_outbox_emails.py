@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued booking emails from the outbox in batches over a reused "
+        "SMTP connection, retrying failures with exponential backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=int, default=60, help='Seconds before the first retry; doubles each attempt')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+            backoff=options['backoff'],
+        )
+
+        started = time.perf_counter()
+        worker.drain()
+        while options['loop']:
+            time.sleep(options['sleep'])
+            worker.drain()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {worker.sent} email(s), {worker.retried} to retry, {worker.failed} failed in {elapsed:.2f}s"
+        ))
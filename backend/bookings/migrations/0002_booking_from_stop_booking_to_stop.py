@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='from_stop',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='to_stop',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-19 02:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0003_fareclass_fareclass_fare_class_travel__2886fc_idx_and_more'),
+        ('bookings', '0002_booking_from_stop_booking_to_stop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='fare_class',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='travel_options.fareclass'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 02:07
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0003_fareclass_fareclass_fare_class_travel__2886fc_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0003_booking_fare_class'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number_of_seats', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('contact_email', models.EmailField(max_length=254)),
+                ('contact_phone', models.CharField(max_length=15)),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting'), ('PROMOTED', 'Promoted'), ('WITHDRAWN', 'Withdrawn')], default='WAITING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='bookings.booking')),
+                ('fare_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='travel_options.fareclass')),
+                ('travel_option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='travel_options.traveloption')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'waitlist_entry',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['travel_option', 'status', 'fare_class', 'id'], name='waitlist_en_travel__5d2470_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['user', 'status'], name='waitlist_en_user_id_4631f8_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_waitlistentry_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['travel_option', 'status'], name='booking_travel__5f00c8_idx'),
+        ),
+    ]
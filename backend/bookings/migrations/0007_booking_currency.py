@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_archivedbooking_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+    ]
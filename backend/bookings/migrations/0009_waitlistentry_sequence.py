@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+def number_waiting_entries(apps, schema_editor):
+    # Waiting entries get consecutive sequences per queue, in joining order
+    WaitlistEntry = apps.get_model('bookings', 'WaitlistEntry')
+    entries = WaitlistEntry.objects.using(schema_editor.connection.alias).filter(status='WAITING').order_by('id')
+    last = {}
+    for entry in entries.iterator():
+        queue = (entry.travel_option_id, entry.fare_class_id)
+        last[queue] = entry.sequence = last.get(queue, 0) + 1
+        entry.save(update_fields=['sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_outboxemail_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='waitlistentry',
+            name='waitlist_en_travel__5d2470_idx',
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='sequence',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(number_waiting_entries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['travel_option', 'status', 'fare_class', 'sequence'], name='waitlist_en_travel__c98727_idx'),
+        ),
+    ]
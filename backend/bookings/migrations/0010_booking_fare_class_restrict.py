@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-19 04:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0009_fareclass_base_price'),
+        ('bookings', '0009_waitlistentry_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='fare_class',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='bookings', to='travel_options.fareclass'),
+        ),
+    ]
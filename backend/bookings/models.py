@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 import uuid
 
+from travel_booking import metrics
+from travel_booking.db.sharding import use_shard
+from travel_options.models import ArchivedRecord
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -12,12 +17,19 @@ class Booking(models.Model):
         ('COMPLETED', 'Completed'),
         ('REFUNDED', 'Refunded'),
     ]
+    # Statuses whose seats are taken out of the travel option's inventory
+    SEAT_HOLDING_STATUSES = ['CONFIRMED', 'COMPLETED']
 
     booking_id = models.CharField(max_length=20, unique=True, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
     travel_option = models.ForeignKey('travel_options.TravelOption', on_delete=models.CASCADE, related_name='bookings')
+    # A class with bookings can't be deleted on its own, only along with its travel option
+    fare_class = models.ForeignKey('travel_options.FareClass', on_delete=models.RESTRICT, null=True, blank=True, related_name='bookings')
     number_of_seats = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    from_stop = models.PositiveIntegerField(null=True, blank=True)  # Boarding stop sequence on multi-stop routes
+    to_stop = models.PositiveIntegerField(null=True, blank=True)  # Alighting stop sequence on multi-stop routes
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='USD')  # Currency total_price was charged in
     booking_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     passenger_details = models.JSONField(default=list)  # List of passenger information
@@ -38,6 +50,7 @@ class Booking(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['booking_date']),
             models.Index(fields=['status']),
+            models.Index(fields=['travel_option', 'status']),
         ]
 
     def __str__(self):
@@ -49,7 +62,9 @@ class Booking(models.Model):
         
         # Calculate total price if not set
         if not self.total_price:
-            self.total_price = self.travel_option.price * self.number_of_seats
+            unit_price = self.fare_class.price if self.fare_class_id else self.travel_option.price
+            self.total_price = unit_price * self.number_of_seats
+            self.currency = self.travel_option.currency
         
         super().save(*args, **kwargs)
 
@@ -63,10 +78,30 @@ class Booking(models.Model):
     def clean(self):
         from django.core.exceptions import ValidationError
         
-        if self.travel_option and self.number_of_seats > self.travel_option.available_seats:
-            raise ValidationError(f'Only {self.travel_option.available_seats} seats available')
+        if not self.travel_option_id:
+            return
+
+        # The option's seats are the sum of its class buckets, so every seat
+        # has to come out of one of them
+        has_fare_classes = self.travel_option.fare_classes.exists()
+        if (self.from_stop is not None or self.to_stop is not None) and (self.fare_class_id or has_fare_classes):
+            raise ValidationError('Fare classes are sold for the whole route only')
+
+        if self.fare_class_id:
+            available = self.fare_class.available_seats
+            if self.number_of_seats > available:
+                raise ValidationError(f'Only {available} {self.fare_class.get_code_display()} seats available')
+        elif has_fare_classes:
+            raise ValidationError('A fare class is required for this travel option')
+        else:
+            try:
+                available = self.travel_option.seats_available_between(self.from_stop, self.to_stop)
+            except ValueError as e:
+                raise ValidationError(str(e))
+            if self.number_of_seats > available:
+                raise ValidationError(f'Only {available} seats available')
         
-        if self.travel_option and self.travel_option.departure_datetime <= timezone.now():
+        if self.travel_option.departure_datetime <= timezone.now():
             raise ValidationError('Cannot book past travel options')
 
     def confirm_booking(self):
@@ -74,33 +109,62 @@ class Booking(models.Model):
         if self.status != 'PENDING':
             raise ValueError('Only pending bookings can be confirmed')
         
-        # Check seat availability
-        if self.number_of_seats > self.travel_option.available_seats:
-            raise ValueError('Not enough seats available')
-        
-        # Update travel option seats
-        self.travel_option.book_seats(self.number_of_seats)
-        
-        # Update booking status
-        self.status = 'CONFIRMED'
-        self.save(update_fields=['status'])
+        db = router.db_for_write(Booking, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            # Update travel option seats; fare class buckets check availability atomically
+            try:
+                if self.fare_class_id:
+                    self.fare_class.book_seats(self.number_of_seats, self.from_stop, self.to_stop)
+                elif self.travel_option.fare_classes.exists():
+                    raise ValueError('A fare class is required for this travel option')
+                else:
+                    if self.number_of_seats > self.travel_option.seats_available_between(self.from_stop, self.to_stop):
+                        raise ValueError('Not enough seats available')
+                    self.travel_option.book_seats(self.number_of_seats, self.from_stop, self.to_stop)
+            except ValueError:
+                metrics.OVERSELL_REJECTIONS.inc()
+                raise
+
+            # Update booking status; the email is queued in the same transaction
+            self.status = 'CONFIRMED'
+            self.save(update_fields=['status'])
+            OutboxEmail.enqueue_for_booking(self, 'BOOKING_CONFIRMED')
         
+        metrics.BOOKINGS_CONFIRMED.inc()
         return True
 
     def cancel_booking(self, reason=''):
-        """Cancel the booking and restore seat availability"""
-        if self.status not in ['PENDING', 'CONFIRMED']:
-            raise ValueError('Only pending or confirmed bookings can be cancelled')
-        
-        # Restore seats if booking was confirmed
-        if self.status == 'CONFIRMED':
-            self.travel_option.cancel_seats(self.number_of_seats)
-        
-        # Update booking status
-        self.status = 'CANCELLED'
-        self.cancelled_at = timezone.now()
-        self.cancellation_reason = reason
-        self.save(update_fields=['status', 'cancelled_at', 'cancellation_reason'])
+        """Cancel the booking, restore seat availability and promote the waitlist"""
+        from travel_options.models import TravelOption
+
+        db = router.db_for_write(Booking, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            # Lock the booking and its travel option so concurrent cancellations
+            # and the promotions they trigger see each other's seat changes
+            self.status = Booking.objects.select_for_update().values_list('status', flat=True).get(pk=self.pk)
+            if self.status not in ['PENDING', 'CONFIRMED']:
+                raise ValueError('Only pending or confirmed bookings can be cancelled')
+
+            travel_option = TravelOption.objects.select_for_update().get(pk=self.travel_option_id)
+            self.travel_option = travel_option
+            seats_released = self.status == 'CONFIRMED'
+
+            # Restore seats if booking was confirmed
+            if seats_released:
+                if self.fare_class_id:
+                    self.fare_class.cancel_seats(self.number_of_seats)
+                else:
+                    travel_option.cancel_seats(self.number_of_seats, self.from_stop, self.to_stop)
+            
+            # Update booking status
+            self.status = 'CANCELLED'
+            self.cancelled_at = timezone.now()
+            self.cancellation_reason = reason
+            self.save(update_fields=['status', 'cancelled_at', 'cancellation_reason'])
+            OutboxEmail.enqueue_for_booking(self, 'BOOKING_CANCELLED')
+
+            if seats_released:
+                WaitlistEntry.promote(travel_option)
         
         return True
 
@@ -129,6 +193,134 @@ class Booking(models.Model):
         return time_diff.days
 
 
+class WaitlistEntry(models.Model):
+    """Request for seats on a sold-out travel option, served in FIFO order"""
+    STATUS_CHOICES = [
+        ('WAITING', 'Waiting'),
+        ('PROMOTED', 'Promoted'),
+        ('WITHDRAWN', 'Withdrawn'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    travel_option = models.ForeignKey('travel_options.TravelOption', on_delete=models.CASCADE, related_name='waitlist_entries')
+    fare_class = models.ForeignKey('travel_options.FareClass', on_delete=models.CASCADE, null=True, blank=True, related_name='waitlist_entries')
+    number_of_seats = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    contact_email = models.EmailField()
+    contact_phone = models.CharField(max_length=15)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='WAITING')
+    # 1-based place in the queue when joining; withdraw() closes the gaps it leaves
+    sequence = models.PositiveIntegerField(default=0, editable=False)
+    booking = models.OneToOneField(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry')
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'waitlist_entry'
+        ordering = ['id']
+        indexes = [
+            # Queue order: joins, withdrawals and position lookups seek on this index
+            models.Index(fields=['travel_option', 'status', 'fare_class', 'sequence']),
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Waitlist {self.pk} - {self.user.username} for {self.travel_option.travel_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.sequence:
+            return super().save(*args, **kwargs)
+
+        db = router.db_for_write(WaitlistEntry, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            self._lock_queue()
+            last = self._queue().order_by('-sequence').values_list('sequence', flat=True).first()
+            self.sequence = (last or 0) + 1
+            super().save(*args, **kwargs)
+
+    def _queue(self):
+        """Entries still waiting in this entry's queue"""
+        return WaitlistEntry.objects.filter(
+            travel_option_id=self.travel_option_id, status='WAITING', fare_class=self.fare_class_id
+        )
+
+    def _lock_queue(self):
+        # Joins, withdrawals and promotions all lock the travel option row first
+        from travel_options.models import TravelOption
+
+        TravelOption.objects.select_for_update().values_list('pk', flat=True).get(pk=self.travel_option_id)
+
+    @property
+    def position(self):
+        """1-based place in the queue, or None once the entry has left it"""
+        if self.status != 'WAITING':
+            return None
+        # Promotions only take entries from the head and withdrawals close
+        # their gap, so waiting sequences are consecutive from the head
+        head = self._queue().order_by('sequence').values_list('sequence', flat=True).first()
+        return None if head is None else self.sequence - head + 1
+
+    def withdraw(self):
+        """Leave the waitlist; everyone behind moves up one place"""
+        db = router.db_for_write(WaitlistEntry, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            self._lock_queue()
+            self.status = WaitlistEntry.objects.values_list('status', flat=True).get(pk=self.pk)
+            if self.status != 'WAITING':
+                raise ValueError('Only waiting entries can be withdrawn')
+            self.status = 'WITHDRAWN'
+            self.save(update_fields=['status'])
+            self._queue().filter(sequence__gt=self.sequence).update(sequence=F('sequence') - 1)
+        return True
+
+    @classmethod
+    def promote(cls, travel_option):
+        """
+        Turn waiting entries into confirmed bookings in FIFO order while their
+        seats fit. Each fare class is its own queue and an entry never jumps
+        ahead of an earlier one in its queue. Must be called inside the
+        transaction that released the seats, with the travel option locked.
+        """
+        travel_option.refresh_from_db(fields=['available_seats', 'segment_seats'])
+        fare_classes = {
+            fare_class.pk: fare_class
+            for fare_class in travel_option.fare_classes.select_for_update()
+        }
+        blocked_queues = set()
+        promoted = []
+
+        waiting = cls.objects.select_for_update().filter(
+            travel_option=travel_option, status='WAITING'
+        ).order_by('id')
+        for entry in waiting:
+            if entry.fare_class_id in blocked_queues:
+                continue
+
+            fare_class = fare_classes.get(entry.fare_class_id)
+            available = fare_class.available_seats if fare_class else travel_option.seats_available_between()
+            if entry.number_of_seats > available:
+                blocked_queues.add(entry.fare_class_id)
+                continue
+
+            booking = Booking(
+                user_id=entry.user_id,
+                travel_option=travel_option,
+                fare_class=fare_class,
+                number_of_seats=entry.number_of_seats,
+                contact_email=entry.contact_email,
+                contact_phone=entry.contact_phone,
+            )
+            booking.save()
+            booking.confirm_booking()
+
+            entry.status = 'PROMOTED'
+            entry.booking = booking
+            entry.promoted_at = timezone.now()
+            entry.save(update_fields=['status', 'booking', 'promoted_at'])
+            promoted.append(entry)
+
+        return promoted
+
+
 class PassengerDetail(models.Model):
     """Separate model for passenger details if needed for complex scenarios"""
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='passengers')
@@ -143,4 +335,77 @@ class PassengerDetail(models.Model):
         db_table = 'passenger_detail'
 
     def __str__(self):
-        return f"{self.first_name} {self.last_name} - {self.booking.booking_id}"
\ No newline at end of file
+        return f"{self.first_name} {self.last_name} - {self.booking.booking_id}"
+
+
+class ArchivedBooking(ArchivedRecord):
+    """
+    Cold-storage copy of a booking whose trip is past the retention window.
+    Only lookup columns are kept as columns; the full serialised booking is
+    stored as zlib-compressed JSON.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    booking_id = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_bookings')
+    status = models.CharField(max_length=10, choices=Booking.STATUS_CHOICES)
+    booking_date = models.DateTimeField()
+    departure_datetime = models.DateTimeField()
+
+    class Meta:
+        db_table = 'archived_booking'
+        ordering = ['-booking_date']
+        indexes = [
+            models.Index(fields=['user', 'booking_date']),
+        ]
+
+    def __str__(self):
+        return f"Archived booking {self.booking_id}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Transactional outbox for customer emails. Rows are written in the same
+    transaction as the booking change and sent later by send_outbox_emails,
+    so requests never wait on SMTP and rolled-back changes send nothing.
+    """
+    EVENT_CHOICES = [
+        ('BOOKING_CONFIRMED', 'Booking confirmed'),
+        ('BOOKING_CANCELLED', 'Booking cancelled'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_email'
+        ordering = ['id']
+        indexes = [
+            # Worker claims due rows in order: a range scan on this index
+            models.Index(fields=['status', 'next_attempt_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_event_display()} to {self.to_email} ({self.status})"
+
+    @classmethod
+    def enqueue_for_booking(cls, booking, event):
+        from .emails import render_booking_email
+
+        subject, body = render_booking_email(booking, event)
+        return cls.objects.create(
+            event=event, booking=booking, to_email=booking.contact_email, subject=subject, body=body
+        )
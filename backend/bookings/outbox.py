@@ -0,0 +1,96 @@
+"""
+Worker side of the email outbox.
+
+Due rows are claimed in a short transaction that pushes ``next_attempt_at``
+out by a lease, so concurrent workers skip them and a crashed worker's rows
+come back on their own. A claimed batch is sent over one SMTP connection;
+failures are retried with exponential backoff until ``max_attempts``.
+Emails are stored on their booking's shard, so ``drain`` visits each shard.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import router, transaction
+from django.utils import timezone
+
+from travel_booking.db.sharding import each_shard
+
+from .models import OutboxEmail
+
+
+class OutboxWorker:
+    def __init__(self, batch_size=100, max_attempts=5, backoff=60, max_backoff=3600, lease=300):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def claim(self):
+        now = timezone.now()
+        with transaction.atomic(using=router.db_for_write(OutboxEmail)):
+            ids = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(status='PENDING', next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'id')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            OutboxEmail.objects.filter(pk__in=ids).update(next_attempt_at=now + timedelta(seconds=self.lease))
+        return list(OutboxEmail.objects.filter(pk__in=ids).order_by('id'))
+
+    def send_batch(self):
+        """Send one claimed batch and return how many emails it held"""
+        emails = self.claim()
+        if not emails:
+            return 0
+
+        sent, handled = [], set()
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for email in emails:
+                message = EmailMessage(
+                    email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    self.retry(email, e)
+                else:
+                    sent.append(email.pk)
+                handled.add(email.pk)
+        except Exception as e:
+            # Connection-level failure: everything not yet handled goes back for a retry
+            for email in emails:
+                if email.pk not in handled:
+                    self.retry(email, e)
+        finally:
+            connection.close()
+
+        OutboxEmail.objects.filter(pk__in=sent).update(status='SENT', sent_at=timezone.now(), last_error='')
+        self.sent += len(sent)
+        return len(emails)
+
+    def retry(self, email, error):
+        email.attempts += 1
+        email.last_error = f"{type(error).__name__}: {error}"[:1000]
+        if email.attempts >= self.max_attempts:
+            email.status = 'FAILED'
+            self.failed += 1
+        else:
+            delay = min(self.backoff * 2 ** (email.attempts - 1), self.max_backoff)
+            email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            self.retried += 1
+        email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+    def drain(self):
+        """Send batches until nothing is due on any shard"""
+        for _ in each_shard():
+            while self.send_batch():
+                pass
+        return self
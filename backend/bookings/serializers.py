@@ -1,15 +1,18 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Booking, PassengerDetail
+from .models import Booking, PassengerDetail, WaitlistEntry
+from travel_options.models import FareClass
 from travel_options.serializers import TravelOptionSerializer
+from travel_booking.timing import TimedSerializerMixin
 
 class PassengerDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PassengerDetail
         fields = ['first_name', 'last_name', 'age', 'gender', 'id_number', 'seat_preference']
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     travel_option = TravelOptionSerializer(read_only=True)
+    fare_class = serializers.CharField(source='fare_class.code', read_only=True, default=None)
     passengers = PassengerDetailSerializer(many=True, read_only=True)
     can_be_cancelled = serializers.ReadOnlyField()
     is_upcoming = serializers.ReadOnlyField()
@@ -18,22 +21,30 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = [
-            'id', 'booking_id', 'travel_option', 'number_of_seats', 'total_price',
+            'id', 'booking_id', 'travel_option', 'fare_class', 'number_of_seats', 'from_stop', 'to_stop', 'total_price', 'currency',
             'booking_date', 'status', 'passenger_details', 'contact_email',
             'contact_phone', 'special_requests', 'passengers', 'can_be_cancelled',
             'is_upcoming', 'days_until_travel', 'cancelled_at', 'cancellation_reason'
         ]
 
+class FareClassCodeField(serializers.ChoiceField):
+    """Takes a fare class code; validate() swaps in the option's FareClass, shown again by its code"""
+
+    def to_representation(self, value):
+        return super().to_representation(getattr(value, 'code', value))
+
 class BookingCreateSerializer(serializers.ModelSerializer):
     travel_option_id = serializers.IntegerField()
+    fare_class = FareClassCodeField(choices=FareClass.FARE_CLASSES, required=False)
     passenger_details = serializers.JSONField(required=False, default=list)
 
     class Meta:
         model = Booking
         fields = [
-            'travel_option_id', 'number_of_seats', 'contact_email',
-            'contact_phone', 'special_requests', 'passenger_details'
+            'travel_option_id', 'fare_class', 'number_of_seats', 'from_stop', 'to_stop', 'contact_email',
+            'contact_phone', 'special_requests', 'passenger_details', 'total_price', 'currency'
         ]
+        read_only_fields = ['total_price', 'currency']
 
     def validate_travel_option_id(self, value):
         from travel_options.models import TravelOption
@@ -49,10 +60,33 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         from travel_options.models import TravelOption
         
         travel_option = TravelOption.objects.get(id=attrs['travel_option_id'])
+
+        # Fare class buckets count whole-route seats, so segment bookings can't draw on them
+        if (attrs.get('from_stop') is not None or attrs.get('to_stop') is not None) and (
+            attrs.get('fare_class') or travel_option.fare_classes.exists()
+        ):
+            raise serializers.ValidationError("Fare classes are sold for the whole route only")
         
-        if attrs['number_of_seats'] > travel_option.available_seats:
+        if attrs.get('fare_class'):
+            try:
+                fare_class = travel_option.fare_classes.get(code=attrs['fare_class'])
+            except FareClass.DoesNotExist:
+                raise serializers.ValidationError("Fare class not offered on this travel option")
+            attrs['fare_class'] = fare_class
+            available = fare_class.available_seats
+        elif travel_option.fare_classes.exists():
+            raise serializers.ValidationError("A fare class is required for this travel option")
+        else:
+            try:
+                available = travel_option.seats_available_between(
+                    attrs.get('from_stop'), attrs.get('to_stop')
+                )
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+
+        if attrs['number_of_seats'] > available:
             raise serializers.ValidationError(
-                f"Only {travel_option.available_seats} seats available"
+                f"Only {available} seats available"
             )
         
         # Validate passenger details if provided
@@ -69,11 +103,24 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         
         travel_option_id = validated_data.pop('travel_option_id')
         travel_option = TravelOption.objects.get(id=travel_option_id)
+        fare_class = validated_data.get('fare_class')
+        unit_price = fare_class.price if fare_class else travel_option.price
+        currency = travel_option.currency
+
+        # Charge the converted unit price shown by ?currency= on the listing
+        converter = self.context.get('converter')
+        if converter is not None:
+            try:
+                unit_price = converter.convert(unit_price, currency)
+            except ValueError as e:
+                raise serializers.ValidationError({'currency': [str(e)]})
+            currency = converter.target
         
         booking = Booking.objects.create(
-            user=self.context['request'].user,
+            user=validated_data.pop('user', self.context['request'].user),
             travel_option=travel_option,
-            total_price=travel_option.price * validated_data['number_of_seats'],
+            total_price=unit_price * validated_data['number_of_seats'],
+            currency=currency,
             **validated_data
         )
         
@@ -86,4 +133,61 @@ class BookingCancelSerializer(serializers.Serializer):
         booking = self.context['booking']
         if not booking.can_be_cancelled:
             raise serializers.ValidationError("This booking cannot be cancelled")
-        return attrs
\ No newline at end of file
+        return attrs
+
+class WaitlistEntrySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    travel_option_id = serializers.IntegerField(read_only=True)
+    travel_id = serializers.CharField(source='travel_option.travel_id', read_only=True)
+    fare_class = serializers.CharField(source='fare_class.code', read_only=True, default=None)
+    booking_id = serializers.CharField(source='booking.booking_id', read_only=True, default=None)
+    position = serializers.ReadOnlyField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'travel_option_id', 'travel_id', 'fare_class', 'number_of_seats',
+            'status', 'position', 'booking_id', 'created_at', 'promoted_at'
+        ]
+
+class WaitlistJoinSerializer(serializers.ModelSerializer):
+    travel_option_id = serializers.IntegerField()
+    fare_class = serializers.ChoiceField(choices=FareClass.FARE_CLASSES, required=False)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['travel_option_id', 'fare_class', 'number_of_seats', 'contact_email', 'contact_phone']
+
+    def validate(self, attrs):
+        from travel_options.models import TravelOption
+
+        try:
+            travel_option = TravelOption.objects.get(id=attrs['travel_option_id'], is_active=True)
+        except TravelOption.DoesNotExist:
+            raise serializers.ValidationError("Travel option not found or inactive")
+        if travel_option.departure_datetime <= timezone.now():
+            raise serializers.ValidationError("Cannot join the waitlist for past travel options")
+
+        if attrs.get('fare_class'):
+            try:
+                fare_class = travel_option.fare_classes.get(code=attrs['fare_class'])
+            except FareClass.DoesNotExist:
+                raise serializers.ValidationError("Fare class not offered on this travel option")
+            attrs['fare_class'] = fare_class
+            available = fare_class.available_seats
+        elif travel_option.fare_classes.exists():
+            raise serializers.ValidationError("A fare class is required for this travel option")
+        else:
+            available = travel_option.available_seats
+
+        if attrs['number_of_seats'] <= available:
+            raise serializers.ValidationError("Seats are available; book directly instead")
+
+        if WaitlistEntry.objects.filter(
+            user=self.context['request'].user, travel_option=travel_option, status='WAITING'
+        ).exists():
+            raise serializers.ValidationError("You are already on the waitlist for this travel option")
+
+        return attrs
+
+    def create(self, validated_data):
+        return WaitlistEntry.objects.create(user=self.context['request'].user, **validated_data)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('create/', views.BookingCreateAPIView.as_view(), name='api_create'),
     path('<int:pk>/cancel/', views.cancel_booking_api, name='api_cancel'),
     path('<int:pk>/confirm/', views.confirm_booking_api, name='api_confirm'),
+    path('waitlist/', views.WaitlistListAPIView.as_view(), name='api_waitlist'),
+    path('waitlist/join/', views.WaitlistJoinAPIView.as_view(), name='api_waitlist_join'),
+    path('waitlist/<int:pk>/leave/', views.leave_waitlist_api, name='api_waitlist_leave'),
     
     # Template views
     path('list/', views.booking_list, name='list'),
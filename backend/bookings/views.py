@@ -1,46 +1,77 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Booking
-from .serializers import BookingSerializer, BookingCreateSerializer, BookingCancelSerializer
+from .models import ArchivedBooking, Booking, WaitlistEntry
+from .serializers import (
+    BookingSerializer,
+    BookingCreateSerializer,
+    BookingCancelSerializer,
+    WaitlistEntrySerializer,
+    WaitlistJoinSerializer,
+)
 from .forms import BookingForm
+from travel_options.currency import CurrencyMixin
 from travel_options.models import TravelOption
+from travel_booking.db.routers import stick_to_primary
+from travel_booking.db.sharding import add_shard_user, shard_for_pk, sharded, use_shard
 
 # ---------------- API VIEWS ----------------
 
-class BookingListAPIView(generics.ListAPIView):
+class BookingListAPIView(CurrencyMixin, generics.ListAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
         return Booking.objects.filter(user=self.request.user)
 
-class BookingDetailAPIView(generics.RetrieveAPIView):
+    def filter_queryset(self, queryset):
+        return sharded(super().filter_queryset(queryset))
+
+class BookingDetailAPIView(CurrencyMixin, generics.RetrieveAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user)
+        return Booking.objects.using(shard_for_pk(self.kwargs['pk'])).filter(user=self.request.user)
 
-class BookingCreateAPIView(generics.CreateAPIView):
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Fall back to cold storage for bookings moved out by archive_history
+            archived = get_object_or_404(ArchivedBooking, original_id=kwargs['pk'], user=request.user)
+            return Response({**archived.data, 'archived': True})
+
+class BookingCreateAPIView(CurrencyMixin, generics.CreateAPIView):
     serializer_class = BookingCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def create(self, request, *args, **kwargs):
+        # The booking is stored on its travel option's shard
+        shard = shard_for_pk(request.data.get('travel_option_id'))
+        with use_shard(shard):
+            add_shard_user(request.user, shard)
+            return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        stick_to_primary(self.request)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def cancel_booking_api(request, pk):
-    booking = get_object_or_404(Booking, pk=pk, user=request.user)
-    serializer = BookingCancelSerializer(data=request.data)
+    booking = get_object_or_404(Booking.objects.using(shard_for_pk(pk)), pk=pk, user=request.user)
+    serializer = BookingCancelSerializer(data=request.data, context={'booking': booking})
 
     if serializer.is_valid():
         reason = serializer.validated_data.get('reason', '')
         booking.cancel_booking(reason)
+        stick_to_primary(request)
         return Response({'message': 'Booking cancelled', 'booking': BookingSerializer(booking).data})
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -48,13 +79,49 @@ def cancel_booking_api(request, pk):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def confirm_booking_api(request, pk):
-    booking = get_object_or_404(Booking, pk=pk, user=request.user)
+    booking = get_object_or_404(Booking.objects.using(shard_for_pk(pk)), pk=pk, user=request.user)
     if booking.status != 'PENDING':
         return Response({'error': 'Only pending bookings can be confirmed'}, status=status.HTTP_400_BAD_REQUEST)
     
     booking.confirm_booking()
+    stick_to_primary(request)
     return Response({'message': 'Booking confirmed', 'booking': BookingSerializer(booking).data})
 
+class WaitlistListAPIView(generics.ListAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user).select_related(
+            'travel_option', 'fare_class', 'booking'
+        )
+
+    def filter_queryset(self, queryset):
+        return sharded(super().filter_queryset(queryset))
+
+class WaitlistJoinAPIView(generics.CreateAPIView):
+    serializer_class = WaitlistJoinSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        shard = shard_for_pk(request.data.get('travel_option_id'))
+        with use_shard(shard):
+            add_shard_user(request.user, shard)
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            entry = serializer.save()
+            return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def leave_waitlist_api(request, pk):
+    entry = get_object_or_404(WaitlistEntry.objects.using(shard_for_pk(pk)), pk=pk, user=request.user)
+    if entry.status != 'WAITING':
+        return Response({'error': 'Only waiting entries can be withdrawn'}, status=status.HTTP_400_BAD_REQUEST)
+
+    entry.withdraw()
+    return Response({'message': 'Left the waitlist', 'entry': WaitlistEntrySerializer(entry).data})
+
 
 # ---------------- TEMPLATE VIEWS ----------------
 
@@ -64,39 +131,44 @@ def booking_list(request):
     status_filter = request.GET.get('status')
     if status_filter:
         bookings = bookings.filter(status=status_filter)
-    return render(request, 'bookings/list.html', {'bookings': bookings, 'status_choices': Booking.STATUS_CHOICES, 'current_status': status_filter})
+    return render(request, 'bookings/list.html', {'bookings': sharded(bookings), 'status_choices': Booking.STATUS_CHOICES, 'current_status': status_filter})
 
 @login_required
 def booking_detail(request, pk):
-    booking = get_object_or_404(Booking, pk=pk, user=request.user)
+    booking = get_object_or_404(Booking.objects.using(shard_for_pk(pk)), pk=pk, user=request.user)
     return render(request, 'bookings/detail.html', {'booking': booking})
 
 @login_required
 def create_booking(request, travel_option_id):
-    travel_option = get_object_or_404(TravelOption, pk=travel_option_id, is_active=True)
+    shard = shard_for_pk(travel_option_id)
+    travel_option = get_object_or_404(TravelOption.objects.using(shard), pk=travel_option_id, is_active=True)
     if not travel_option.is_available:
         messages.error(request, 'This travel option is no longer available.')
         return redirect('travel_options:detail', pk=travel_option_id)
 
+    # The form validates against the option, so it sees the option's fare classes and seats
+    booking = Booking(user=request.user, travel_option=travel_option)
     if request.method == 'POST':
-        form = BookingForm(request.POST)
+        form = BookingForm(request.POST, instance=booking)
         if form.is_valid():
             booking = form.save(commit=False)
-            booking.user = request.user
-            booking.travel_option = travel_option
-            booking.total_price = travel_option.price * booking.number_of_seats
+            unit_price = booking.fare_class.price if booking.fare_class_id else travel_option.price
+            booking.total_price = unit_price * booking.number_of_seats
+            booking.currency = travel_option.currency
+            add_shard_user(request.user, shard)
             booking.save()
             booking.confirm_booking()
+            stick_to_primary(request)
             messages.success(request, f'Booking {booking.booking_id} created successfully!')
             return redirect('bookings:detail', pk=booking.pk)
     else:
-        form = BookingForm(initial={'contact_email': request.user.email, 'contact_phone': getattr(request.user, 'phone_number', '')})
+        form = BookingForm(instance=booking, initial={'contact_email': request.user.email, 'contact_phone': getattr(request.user, 'phone_number', '')})
 
     return render(request, 'bookings/create.html', {'form': form, 'travel_option': travel_option})
 
 @login_required
 def cancel_booking(request, pk):
-    booking = get_object_or_404(Booking, pk=pk, user=request.user)
+    booking = get_object_or_404(Booking.objects.using(shard_for_pk(pk)), pk=pk, user=request.user)
     if not booking.can_be_cancelled:
         messages.error(request, 'This booking cannot be cancelled.')
         return redirect('bookings:detail', pk=pk)
@@ -104,6 +176,7 @@ def cancel_booking(request, pk):
     if request.method == 'POST':
         reason = request.POST.get('reason', '')
         booking.cancel_booking(reason)
+        stick_to_primary(request)
         messages.success(request, 'Booking cancelled successfully.')
         return redirect('bookings:detail', pk=booking.pk)
 
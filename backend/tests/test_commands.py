@@ -0,0 +1,853 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.utils import timezone
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+
+from rest_framework.authtoken.models import Token
+
+from accounts.models import ThrottleBucket
+
+from travel_options.currency import invalidate_rates
+from travel_options.models import (
+    TravelOption, RouteStop, FareClass, ArchivedTravelOption, ExchangeRate, PriceAlert, PriceAlertNotification
+)
+from bookings.models import Booking, ArchivedBooking, OutboxEmail, PassengerDetail
+
+User = get_user_model()
+
+class ReconcileSeatsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        self.future_date = timezone.now() + timedelta(days=7)
+        self.arrival_date = self.future_date + timedelta(hours=2)
+
+    def create_option(self, travel_id, **kwargs):
+        defaults = dict(
+            travel_id=travel_id,
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.arrival_date,
+            price=Decimal('100.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Airlines'
+        )
+        defaults.update(kwargs)
+        return TravelOption.objects.create(**defaults)
+
+    def book(self, travel_option, seats, **kwargs):
+        booking = Booking.objects.create(
+            user=self.user,
+            travel_option=travel_option,
+            number_of_seats=seats,
+            contact_email='test@example.com',
+            contact_phone='1234567890',
+            **kwargs
+        )
+        booking.confirm_booking()
+        return booking
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('reconcile_seats', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_without_repairing(self):
+        option = self.create_option('FL001')
+        self.book(option, 3)
+        TravelOption.objects.filter(pk=option.pk).update(available_seats=9)
+
+        output = self.run_command()
+
+        self.assertIn('1 travel option(s)', output)
+        self.assertIn('FL001: stored 9, expected 7', output)
+        option.refresh_from_db()
+        self.assertEqual(option.available_seats, 9)
+
+    def test_repairs_options_fare_classes_and_segments(self):
+        plain = self.create_option('FL001')
+        self.book(plain, 3)
+        TravelOption.objects.filter(pk=plain.pk).update(available_seats=10)
+
+        with_classes = self.create_option('FL002', total_seats=6, available_seats=6)
+        economy = FareClass.objects.create(
+            travel_option=with_classes, code='ECONOMY',
+            price=Decimal('100.00'), total_seats=4, available_seats=4
+        )
+        FareClass.objects.create(
+            travel_option=with_classes, code='BUSINESS',
+            price=Decimal('300.00'), total_seats=2, available_seats=2
+        )
+        self.book(with_classes, 2, fare_class=economy)
+        FareClass.objects.filter(pk=economy.pk).update(available_seats=1)
+
+        train = self.create_option('TR001', type='TRAIN')
+        for sequence, name in enumerate(['A', 'B', 'C']):
+            RouteStop.objects.create(travel_option=train, sequence=sequence, name=name)
+        self.book(train, 4, from_stop=0, to_stop=1)
+        TravelOption.objects.filter(pk=train.pk).update(available_seats=10)
+
+        self.run_command('--repair', '--batch-size', '2')
+
+        plain.refresh_from_db()
+        economy.refresh_from_db()
+        with_classes.refresh_from_db()
+        train.refresh_from_db()
+        self.assertEqual(plain.available_seats, 7)
+        self.assertEqual(economy.available_seats, 2)
+        self.assertEqual(with_classes.available_seats, 4)
+        self.assertEqual(train.available_seats, 6)
+        self.assertEqual(train.seats_available_between(1, 2), 10)
+        self.assertIn('0 travel option(s) and 0 fare class(es)', self.run_command())
+
+    def test_segment_drift_behind_the_route_minimum_is_repaired(self):
+        train = self.create_option('TR001', type='TRAIN')
+        for sequence, name in enumerate(['A', 'B', 'C', 'D']):
+            RouteStop.objects.create(travel_option=train, sequence=sequence, name=name)
+        self.book(train, 4, from_stop=0, to_stop=1)
+        train.refresh_from_db()
+        # The last segment loses seats, but the first one stays the fullest
+        tree = train.segment_tree()
+        tree.add(2, 3, -2)
+        TravelOption.objects.filter(pk=train.pk).update(segment_seats=tree.to_state())
+
+        output = self.run_command('--repair')
+
+        self.assertIn('1 travel option(s)', output)
+        self.assertIn('TR001: stored 6, expected 6 (segments stored [6, 10, 8], expected [6, 10, 10])', output)
+        train.refresh_from_db()
+        self.assertEqual(train.seats_available_between(2, 3), 10)
+        self.assertEqual(train.available_seats, 6)
+        self.assertIn('0 travel option(s)', self.run_command())
+
+    def test_seats_booked_outside_fare_classes_stay_sold(self):
+        option = self.create_option('FL002', total_seats=6, available_seats=6)
+        economy = FareClass.objects.create(
+            travel_option=option, code='ECONOMY', price=Decimal('100.00'), total_seats=4, available_seats=4
+        )
+        self.book(option, 2, fare_class=economy)
+        # A whole-route booking taken before fare classes were required
+        Booking.objects.create(
+            user=self.user, travel_option=option, number_of_seats=3, status='CONFIRMED',
+            contact_email='test@example.com', contact_phone='1234567890'
+        )
+        TravelOption.objects.filter(pk=option.pk).update(available_seats=F('available_seats') - 3)
+
+        output = self.run_command('--repair')
+
+        self.assertIn('0 travel option(s) and 0 fare class(es) drifted', output)
+        self.assertIn('FL002: 3 seat(s) booked without a fare class', output)
+        self.assertIn('Repaired 0 row(s)', output)
+        option.refresh_from_db()
+        self.assertEqual(option.available_seats, 1)
+
+    def test_rows_that_moved_since_the_check_are_not_counted(self):
+        from travel_options.management.commands.reconcile_seats import Command
+
+        drifted = self.create_option('FL001', available_seats=9)
+        moved = self.create_option('FL002', available_seats=8)
+        # Both were read with 9 seats; FL002 has changed since
+        mismatches = {drifted.pk: ('FL001', 9, 10), moved.pk: ('FL002', 9, 10)}
+
+        self.assertEqual(Command().repair(TravelOption, mismatches, batch_size=10), 1)
+        moved.refresh_from_db()
+        self.assertEqual(moved.available_seats, 8)
+
+    def test_date_window(self):
+        option = self.create_option('FL001')
+        TravelOption.objects.filter(pk=option.pk).update(available_seats=5)
+
+        later = (self.future_date + timedelta(days=1)).date().isoformat()
+        self.assertIn('0 travel option(s)', self.run_command('--from-date', later))
+        self.assertIn('1 travel option(s)', self.run_command('--to-date', later))
+
+class CompleteDepartedCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        future_date = timezone.now() + timedelta(days=7)
+        self.departed = TravelOption.objects.create(
+            travel_id='FL001',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=2),
+            price=Decimal('100.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Airlines'
+        )
+        self.upcoming = TravelOption.objects.create(
+            travel_id='FL002',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=2),
+            price=Decimal('100.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Airlines'
+        )
+
+        self.bookings = {}
+        for travel_option in (self.departed, self.upcoming):
+            for status in ('CONFIRMED', 'CANCELLED'):
+                self.bookings[(travel_option.travel_id, status)] = Booking.objects.create(
+                    user=self.user,
+                    travel_option=travel_option,
+                    number_of_seats=1,
+                    status=status,
+                    contact_email='test@example.com',
+                    contact_phone='1234567890'
+                )
+
+        past_date = timezone.now() - timedelta(days=1)
+        TravelOption.objects.filter(pk=self.departed.pk).update(
+            departure_datetime=past_date, arrival_datetime=past_date + timedelta(hours=2)
+        )
+
+    def test_completes_bookings_and_deactivates_options(self):
+        out = StringIO()
+        call_command('complete_departed', '--chunk-size', '1', stdout=out)
+
+        self.assertIn('Completed bookings: 1 row(s)', out.getvalue())
+        self.assertIn('Deactivated travel options: 1 row(s)', out.getvalue())
+
+        statuses = {
+            key: Booking.objects.get(pk=booking.pk).status
+            for key, booking in self.bookings.items()
+        }
+        self.assertEqual(statuses, {
+            ('FL001', 'CONFIRMED'): 'COMPLETED',
+            ('FL001', 'CANCELLED'): 'CANCELLED',
+            ('FL002', 'CONFIRMED'): 'CONFIRMED',
+            ('FL002', 'CANCELLED'): 'CANCELLED',
+        })
+        self.departed.refresh_from_db()
+        self.upcoming.refresh_from_db()
+        self.assertFalse(self.departed.is_active)
+        self.assertTrue(self.upcoming.is_active)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('complete_departed', '--dry-run', stdout=out)
+
+        self.assertIn('Would complete 1 booking(s) and deactivate 1 travel option(s)', out.getvalue())
+        self.departed.refresh_from_db()
+        self.assertTrue(self.departed.is_active)
+
+
+class ArchiveHistoryCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        future_date = timezone.now() + timedelta(days=7)
+        self.old_options = []
+        for travel_id in ('FL001', 'FL002'):
+            self.old_options.append(TravelOption.objects.create(
+                travel_id=travel_id,
+                type='FLIGHT',
+                source='New York',
+                destination='Los Angeles',
+                departure_datetime=future_date,
+                arrival_datetime=future_date + timedelta(hours=2),
+                price=Decimal('100.00'),
+                total_seats=10,
+                available_seats=10,
+                operator_name='Test Airlines'
+            ))
+
+        self.completed = self.create_booking(self.old_options[0], 'COMPLETED')
+        PassengerDetail.objects.create(booking=self.completed, first_name='Ada', last_name='Lovelace', age=36, gender='F')
+        self.cancelled = self.create_booking(self.old_options[0], 'CANCELLED')
+        self.confirmed = self.create_booking(self.old_options[1], 'CONFIRMED')
+
+        past_date = timezone.now() - timedelta(days=400)
+        TravelOption.objects.filter(pk__in=[o.pk for o in self.old_options]).update(
+            departure_datetime=past_date, arrival_datetime=past_date + timedelta(hours=2)
+        )
+
+    def create_booking(self, travel_option, status):
+        return Booking.objects.create(
+            user=self.user,
+            travel_option=travel_option,
+            number_of_seats=1,
+            status=status,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+
+    def test_moves_finished_history_to_archive(self):
+        out = StringIO()
+        call_command('archive_history', '--days', '365', '--batch-size', '1', stdout=out)
+
+        self.assertIn('Archived 2 bookings', out.getvalue())
+        self.assertIn('Archived 1 travel options', out.getvalue())
+        self.assertEqual(list(Booking.objects.values_list('pk', flat=True)), [self.confirmed.pk])
+        self.assertEqual(list(TravelOption.objects.values_list('travel_id', flat=True)), ['FL002'])
+
+        archived = ArchivedBooking.objects.get(original_id=self.completed.pk)
+        self.assertEqual(archived.data['booking_id'], self.completed.booking_id)
+        self.assertEqual(archived.data['passengers'][0]['first_name'], 'Ada')
+        self.assertEqual(ArchivedTravelOption.objects.get().data['travel_id'], 'FL001')
+
+    def test_archived_booking_readable_through_detail_api(self):
+        call_command('archive_history', stdout=StringIO())
+        token = Token.objects.create(user=self.user)
+
+        response = self.client.get(
+            f'/api/bookings/{self.completed.pk}/',
+            HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertTrue(data['archived'])
+        self.assertEqual(data['booking_id'], self.completed.booking_id)
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        response = self.client.get(
+            f'/api/bookings/{self.completed.pk}/',
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportTimetableCommandTest(TestCase):
+    def setUp(self):
+        self.departure = (timezone.now() + timedelta(days=7)).replace(microsecond=0)
+        self.arrival = self.departure + timedelta(hours=3)
+
+    def write_feed(self, lines, suffix='.csv'):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as feed:
+            feed.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, path)
+        return path
+
+    def csv_row(self, travel_id, departure=None, arrival=None, total='50', available='', price='99.50'):
+        departure = departure or self.departure
+        arrival = arrival or self.arrival
+        return (
+            f"{travel_id},BUS,Austin,Dallas,{departure.isoformat()},{arrival.isoformat()},"
+            f"{price},{total},{available},Lone Star Bus,wifi|power"
+        )
+
+    def run_command(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_timetable', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_valid_rows_and_reports_invalid_ones(self):
+        path = self.write_feed([
+            'travel_id,type,source,destination,departure_datetime,arrival_datetime,price,total_seats,available_seats,operator_name,amenities',
+            self.csv_row('BUS001'),
+            self.csv_row('BUS002', arrival=self.departure - timedelta(hours=1)),
+            self.csv_row('BUS003', departure=timezone.now() - timedelta(days=1)),
+            self.csv_row('BUS004', total='10', available='20'),
+            self.csv_row('BUS005', price='free'),
+            self.csv_row('BUS001'),
+        ])
+
+        out, err = self.run_command(path, '--chunk-size', '2')
+
+        self.assertIn('1 created, 0 updated, 5 rejected', out)
+        self.assertIn('line 3 (BUS002): Departure time must be before arrival time.', err)
+        self.assertIn('line 4 (BUS003): Departure time must be in the future.', err)
+        self.assertIn('line 5 (BUS004): Available seats cannot exceed total seats.', err)
+        self.assertIn('line 6 (BUS005): Invalid price', err)
+        self.assertIn('line 7 (BUS001): Duplicate travel_id in feed', err)
+
+        option = TravelOption.objects.get(travel_id='BUS001')
+        self.assertEqual(option.price, Decimal('99.50'))
+        self.assertEqual(option.available_seats, 50)
+        self.assertEqual(option.amenities, ['wifi', 'power'])
+
+    def test_malformed_jsonl_values_are_rejected_per_row(self):
+        def row(travel_id, **values):
+            return json.dumps({
+                'travel_id': travel_id, 'type': 'BUS', 'source': 'Austin', 'destination': 'Dallas',
+                'departure_datetime': self.departure.isoformat(), 'arrival_datetime': self.arrival.isoformat(),
+                'price': '85.00', 'total_seats': 50, 'operator_name': 'Lone Star Bus', **values,
+            })
+
+        path = self.write_feed([
+            row('BUS001'),
+            row('BUS002', departure_datetime='2027-13-45T10:00:00'),
+            row('BUS003', price='NaN'),
+            row('BUS004', price='Infinity'),
+            row('BUS005', price='123456789.00'),
+            row('BUS006', departure_datetime=1893456000),
+            row('BUS007', price=85),
+            json.dumps(['BUS008', 'BUS']),
+            row('BUS009', source=12),
+        ], suffix='.jsonl')
+
+        out, err = self.run_command(path)
+
+        self.assertIn('2 created, 0 updated, 7 rejected', out)
+        self.assertIn('line 2 (BUS002): Invalid departure_datetime: month must be in 1..12', err)
+        self.assertIn('line 3 (BUS003): Invalid price', err)
+        self.assertIn('line 4 (BUS004): Invalid price', err)
+        self.assertIn('line 5 (BUS005): Invalid price', err)
+        self.assertIn('line 6 (BUS006): Invalid departure_datetime: expected an ISO 8601 string, not int', err)
+        self.assertIn('line 8 (?): Row is not an object', err)
+        self.assertIn('line 9 (BUS009): Invalid source: expected text, not int', err)
+        self.assertEqual(TravelOption.objects.get(travel_id='BUS007').price, Decimal('85.00'))
+
+    def test_update_keeps_sold_seats(self):
+        TravelOption.objects.create(
+            travel_id='BUS001',
+            type='BUS',
+            source='Austin',
+            destination='Dallas',
+            departure_datetime=self.departure,
+            arrival_datetime=self.arrival,
+            price=Decimal('80.00'),
+            total_seats=40,
+            available_seats=30,
+            operator_name='Lone Star Bus'
+        )
+        path = self.write_feed([
+            json.dumps({
+                'travel_id': 'BUS001', 'type': 'BUS', 'source': 'Austin', 'destination': 'Dallas',
+                'departure_datetime': self.departure.isoformat(), 'arrival_datetime': self.arrival.isoformat(),
+                'price': '85.00', 'total_seats': 50, 'operator_name': 'Lone Star Bus',
+            }),
+        ], suffix='.jsonl')
+
+        out, _ = self.run_command(path)
+
+        self.assertIn('0 created, 1 updated, 0 rejected', out)
+        option = TravelOption.objects.get(travel_id='BUS001')
+        self.assertEqual(option.price, Decimal('85.00'))
+        self.assertEqual(option.total_seats, 50)
+        self.assertEqual(option.available_seats, 40)
+
+    def test_sync_writes_only_changed_rows_and_deactivates_missing(self):
+        header = 'travel_id,type,source,destination,departure_datetime,arrival_datetime,price,total_seats,available_seats,operator_name,amenities'
+        self.run_command(self.write_feed([header, self.csv_row('BUS001'), self.csv_row('BUS002'), self.csv_row('BUS003')]))
+        TravelOption.objects.create(
+            travel_id='OTHER1',
+            type='BUS',
+            source='Austin',
+            destination='Dallas',
+            departure_datetime=self.departure,
+            arrival_datetime=self.arrival,
+            price=Decimal('80.00'),
+            total_seats=40,
+            available_seats=40,
+            operator_name='Other Operator'
+        )
+        before = TravelOption.objects.get(travel_id='BUS001').updated_at
+
+        path = self.write_feed([
+            header,
+            self.csv_row('BUS001'),
+            self.csv_row('BUS002', price='120.00'),
+            self.csv_row('BUS004'),
+        ])
+        out, _ = self.run_command(path, '--sync')
+
+        self.assertIn('1 created, 1 updated, 1 unchanged, 1 deactivated, 0 rejected', out)
+        self.assertEqual(TravelOption.objects.get(travel_id='BUS001').updated_at, before)
+        self.assertEqual(TravelOption.objects.get(travel_id='BUS002').price, Decimal('120.00'))
+        self.assertFalse(TravelOption.objects.get(travel_id='BUS003').is_active)
+        self.assertTrue(TravelOption.objects.get(travel_id='OTHER1').is_active)
+
+    def test_sync_keeps_rejected_rows_active(self):
+        header = 'travel_id,type,source,destination,departure_datetime,arrival_datetime,price,total_seats,available_seats,operator_name,amenities'
+        self.run_command(self.write_feed([header, self.csv_row('BUS001'), self.csv_row('BUS002')]))
+
+        path = self.write_feed([header, self.csv_row('BUS001'), self.csv_row('BUS002', price='free')])
+        out, _ = self.run_command(path, '--sync')
+
+        self.assertIn('0 created, 0 updated, 1 unchanged, 0 deactivated, 1 rejected', out)
+        self.assertTrue(TravelOption.objects.get(travel_id='BUS002').is_active)
+
+
+@override_settings(DYNAMIC_PRICING={
+    'load_factor_curve': [(0.0, 1.0), (1.0, 2.0)],
+    'days_curve': [(0, 1.0)],
+    'floor': 0.5,
+    'cap': 1.8,
+})
+class RepriceTravelOptionsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        future_date = timezone.now() + timedelta(days=7)
+        self.options = {}
+        for travel_id, available in (('FL001', 50), ('FL002', 100), ('FL003', 0)):
+            self.options[travel_id] = TravelOption.objects.create(
+                travel_id=travel_id,
+                type='FLIGHT',
+                source='New York',
+                destination='Los Angeles',
+                departure_datetime=future_date,
+                arrival_datetime=future_date + timedelta(hours=2),
+                price=Decimal('100.00'),
+                total_seats=100,
+                available_seats=available,
+                operator_name='Test Airlines'
+            )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.options['FL001'],
+            number_of_seats=2,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('reprice_travel_options', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reprices_from_load_factor_within_cap(self):
+        untouched = TravelOption.objects.get(travel_id='FL002').updated_at
+
+        out = self.run_command()
+
+        self.assertIn('Repriced 2 of 3 travel option(s)', out)
+        prices = dict(TravelOption.objects.values_list('travel_id', 'price'))
+        self.assertEqual(prices, {
+            'FL001': Decimal('150.00'),
+            'FL002': Decimal('100.00'),
+            'FL003': Decimal('180.00'),
+        })
+        self.assertEqual(TravelOption.objects.get(travel_id='FL002').updated_at, untouched)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.total_price, Decimal('200.00'))
+        self.booking.confirm_booking()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.total_price, Decimal('200.00'))
+
+    def test_fare_classes_move_with_their_option(self):
+        economy = FareClass.objects.create(
+            travel_option=self.options['FL001'], code='ECONOMY',
+            price=Decimal('80.00'), total_seats=80, available_seats=40
+        )
+
+        out = self.run_command()
+        self.run_command()
+
+        self.assertIn('Repriced 2 of 3 travel option(s) and 1 fare class(es)', out)
+        economy.refresh_from_db()
+        self.assertEqual(economy.price, Decimal('120.00'))
+        self.assertEqual(economy.base_price, Decimal('80.00'))
+
+    def test_repeated_runs_do_not_compound(self):
+        self.run_command()
+        out = self.run_command()
+
+        self.assertIn('Repriced 0 of 3 travel option(s)', out)
+        self.assertEqual(TravelOption.objects.get(travel_id='FL001').price, Decimal('150.00'))
+        self.assertEqual(TravelOption.objects.get(travel_id='FL001').base_price, Decimal('100.00'))
+
+    def test_dry_run_writes_nothing(self):
+        out = self.run_command('--dry-run')
+
+        self.assertIn('Would reprice 2 of 3 travel option(s)', out)
+        self.assertFalse(TravelOption.objects.exclude(price=Decimal('100.00')).exists())
+
+
+class MatchPriceAlertsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.addCleanup(invalidate_rates)
+        ExchangeRate.objects.create(currency='EUR', rate=Decimal('0.92'))
+
+        self.departure = timezone.now() + timedelta(days=7)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=self.departure,
+            arrival_datetime=self.departure + timedelta(hours=2),
+            price=Decimal('100.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Airlines'
+        )
+
+        def alert(**overrides):
+            fields = {
+                'user': self.user,
+                'source': 'New York',
+                'destination': 'Los Angeles',
+                'departure_from': self.departure - timedelta(days=1),
+                'departure_to': self.departure + timedelta(days=1),
+                'max_price': Decimal('120.00'),
+            }
+            fields.update(overrides)
+            return PriceAlert.objects.create(**fields)
+
+        self.matching = alert()
+        self.in_euros = alert(max_price=Decimal('95.00'), currency='EUR')
+        alert(max_price=Decimal('80.00'))
+        alert(destination='Chicago')
+        alert(departure_from=self.departure + timedelta(days=2), departure_to=self.departure + timedelta(days=3))
+        alert(type='TRAIN')
+        alert(is_active=False)
+
+    def run_command(self):
+        out = StringIO()
+        call_command('match_price_alerts', stdout=out)
+        return out.getvalue()
+
+    def test_queues_matching_alerts_once(self):
+        out = self.run_command()
+
+        self.assertIn('2 alert match(es), 2 notification(s) queued', out)
+        self.assertEqual(
+            set(PriceAlertNotification.objects.values_list('alert_id', flat=True)),
+            {self.matching.pk, self.in_euros.pk}
+        )
+
+        out = self.run_command()
+        self.assertIn('2 alert match(es), 0 notification(s) queued', out)
+
+    def test_requeues_when_price_drops_further(self):
+        self.run_command()
+        PriceAlertNotification.objects.update(sent_at=timezone.now())
+
+        self.travel_option.price = Decimal('90.00')
+        self.travel_option.save()
+        out = self.run_command()
+
+        self.assertIn('2 notification(s) queued', out)
+        notification = PriceAlertNotification.objects.get(alert=self.matching)
+        self.assertEqual(notification.price, Decimal('90.00'))
+        self.assertIsNone(notification.sent_at)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class SendOutboxEmailsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        future_date = timezone.now() + timedelta(days=7)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=2),
+            price=Decimal('100.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Airlines'
+        )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=2,
+            contact_email='traveller@example.com',
+            contact_phone='1234567890'
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('send_outbox_emails', *args, stdout=out)
+        return out.getvalue()
+
+    def test_booking_changes_queue_emails_instead_of_sending(self):
+        self.booking.confirm_booking()
+        self.booking.cancel_booking('Plans changed')
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            list(OutboxEmail.objects.values_list('event', 'status')),
+            [('BOOKING_CONFIRMED', 'PENDING'), ('BOOKING_CANCELLED', 'PENDING')]
+        )
+
+        out = self.run_command()
+
+        self.assertIn('Sent 2 email(s), 0 to retry, 0 failed', out)
+        self.assertEqual([m.to for m in mail.outbox], [['traveller@example.com']] * 2)
+        self.assertIn(self.booking.booking_id, mail.outbox[0].subject)
+        self.assertIn('Reason: Plans changed', mail.outbox[1].body)
+        self.assertFalse(OutboxEmail.objects.exclude(status='SENT').exists())
+
+    def test_failed_confirmation_queues_nothing(self):
+        self.booking.number_of_seats = 20
+        with self.assertRaises(ValueError):
+            self.booking.confirm_booking()
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='tests.test_commands.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        self.booking.confirm_booking()
+
+        out = self.run_command('--max-attempts', '2', '--backoff', '60')
+        self.assertIn('Sent 0 email(s), 1 to retry, 0 failed', out)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTP server unavailable', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet, so a second run leaves it alone
+        self.assertIn('Sent 0 email(s), 0 to retry', self.run_command('--max-attempts', '2'))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.run_command('--max-attempts', '2')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('FAILED', 2))
+
+
+class ClearExpiredThrottlesCommandTest(TestCase):
+    def test_deletes_only_refilled_buckets(self):
+        now = time.time()
+        ThrottleBucket.objects.create(key='throttle:search_ip:10.0.0.1', tat=now - 1)
+        ThrottleBucket.objects.create(key='throttle:search_ip:10.0.0.2', tat=now + 30)
+
+        out = StringIO()
+        call_command('clear_expired_throttles', stdout=out)
+
+        self.assertIn('Deleted 1 expired throttle bucket(s)', out.getvalue())
+        self.assertEqual(
+            list(ThrottleBucket.objects.values_list('key', flat=True)), ['throttle:search_ip:10.0.0.2']
+        )
+
+
+class SlowQueryReportCommandTest(TestCase):
+    def write(self, path, entries):
+        with open(path, 'w') as log:
+            for entry in entries:
+                log.write(json.dumps({
+                    'time': '2026-01-02T10:00:00+00:00', 'view': 'views.Search', 'caller': None,
+                    'plan': None, **entry,
+                }) + '\n')
+
+    def test_ranks_by_total_time_across_rotated_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'slow.log')
+            self.write(path + '.1', [
+                {'fingerprint': 'a', 'sql': 'SELECT a', 'count': 1, 'total_ms': 300.0, 'max_ms': 300.0,
+                 'plan': ['SCAN a']},
+            ])
+            self.write(path, [
+                {'fingerprint': 'b', 'sql': 'SELECT b', 'count': 10, 'total_ms': 2500.0, 'max_ms': 400.0},
+                {'fingerprint': 'a', 'sql': 'SELECT a', 'count': 2, 'total_ms': 500.0, 'max_ms': 260.0,
+                 'view': 'views.Detail'},
+            ])
+            out = StringIO()
+            call_command('slow_query_report', log=path, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('2 slow queries in 2 file(s)', output)
+        self.assertLess(output.index('SELECT b'), output.index('SELECT a'))
+        self.assertIn('[b] total 2500 ms, 10 call(s), mean 250.0 ms, max 400.0 ms', output)
+        self.assertIn('[a] total 800 ms, 3 call(s)', output)
+        self.assertIn('from views.Detail, views.Search', output)
+        self.assertIn('SCAN a', output)
+
+
+class AggregateProfilesCommandTest(TestCase):
+    def test_merges_profiles_and_lists_hottest_functions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '1-10-SearchView.folded'), 'w') as f:
+                f.write('request;handler;search;query 6\nrequest;handler;serialize 2\n')
+            with open(os.path.join(directory, '2-10-SearchView.folded'), 'w') as f:
+                f.write('request;handler;search;query 2\n')
+            with open(os.path.join(directory, '3-10-DetailView.folded'), 'w') as f:
+                f.write('request;handler;detail 100\n')
+            output = os.path.join(directory, 'merged.txt')
+            out = StringIO()
+            call_command('aggregate_profiles', dir=directory, view='Search', output=output, stdout=out)
+            with open(output) as f:
+                merged = f.read()
+
+        self.assertEqual(merged, 'request;handler;search;query 8\nrequest;handler;serialize 2\n')
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], '10 sample(s) from 2 profile(s)')
+        self.assertEqual(lines[2].split(), ['80.0%', '80.0%', 'query'])
+        self.assertIn('20.0%', lines[3])
+
+
+class GenerateFakeDataCommandTest(TestCase):
+    def generate(self, prefix, **options):
+        out = StringIO()
+        call_command(
+            'generate_fake_data', travel_options=300, users=20, bookings=600, start_date=date(2030, 1, 1),
+            prefix=prefix, chunk_size=100, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_generates_consistent_rows(self):
+        output = self.generate('A')
+
+        self.assertEqual(TravelOption.objects.count(), 300)
+        self.assertEqual(User.objects.filter(username__startswith='a_user').count(), 20)
+        bookings = Booking.objects.all()
+        self.assertGreater(bookings.count(), 300)
+        self.assertEqual(PassengerDetail.objects.count(), sum(b.number_of_seats for b in bookings))
+        self.assertIn(f'{bookings.count()} bookings', output)
+        self.assertFalse(TravelOption.objects.filter(departure_datetime__lt=datetime(2030, 1, 2, tzinfo=dt_timezone.utc)).exists())
+        self.assertFalse(TravelOption.objects.filter(arrival_datetime__lte=F('departure_datetime')).exists())
+
+        report = StringIO()
+        call_command('reconcile_seats', stdout=report)
+        self.assertIn('0 travel option(s) and 0 fare class(es) drifted, 0 oversold', report.getvalue())
+
+    def test_same_seed_gives_same_data(self):
+        self.generate('A')
+        self.generate('B')
+
+        def rows(prefix):
+            return list(TravelOption.objects.filter(travel_id__startswith=prefix).order_by('travel_id').values_list(
+                'type', 'source', 'destination', 'departure_datetime', 'price', 'available_seats'
+            ))
+
+        self.assertEqual(rows('A'), rows('B'))
+
+    def test_existing_prefix_is_refused(self):
+        self.generate('A')
+        with self.assertRaises(CommandError):
+            self.generate('A')
@@ -0,0 +1,413 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from bookings.models import Booking, OutboxEmail, PassengerDetail
+from bookings.views import BookingListAPIView
+from travel_booking.db.routers import (
+    ReplicaRouter, ReplicaRoutingMiddleware, _client_key, is_stuck_to_primary, replica_reads, stick_to_primary
+)
+from travel_booking.db.sharding import (
+    SHARD_ID_SPAN, ShardRouter, id_range, shard_for_pk, shard_for_route, use_shard
+)
+from travel_options.models import FareClass, PriceAlertNotification, TravelOption
+from travel_options.views import SearchTravelOptionsAPIView
+
+User = get_user_model()
+
+POOL_AVAILABLE = connection.vendor == 'postgresql' and importlib.util.find_spec('psycopg_pool') is not None
+
+
+@unittest.skipUnless(POOL_AVAILABLE, 'Needs PostgreSQL with psycopg 3 and psycopg_pool')
+class PooledConnectionTest(TransactionTestCase):
+    """Runs against the test database, e.g. a throwaway local Postgres"""
+
+    def setUp(self):
+        from travel_booking.db.postgresql_pool.base import DatabaseWrapper
+
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'travel_booking.db.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], 'pool': {'min_size': 1, 'max_size': 2}},
+        }
+        self.wrapper_class = DatabaseWrapper
+        self.db = DatabaseWrapper(settings_dict, alias='pool_test')
+        self.addCleanup(DatabaseWrapper.close_pools)
+
+    def backend_pid(self, db):
+        with db.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_closed_connections_are_reused(self):
+        pid = self.backend_pid(self.db)
+        self.db.close()
+
+        self.assertEqual(self.backend_pid(self.db), pid)
+        self.db.close()
+        self.assertLessEqual(self.db.pool.get_stats()['pool_size'], 2)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        pid = self.backend_pid(self.db)
+        self.db.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        # The pre-ping discards the terminated connection instead of handing it out
+        self.assertNotEqual(self.backend_pid(self.db), pid)
+        self.db.close()
+
+    def test_persistent_connections_are_rejected(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        db = self.wrapper_class({**self.db.settings_dict, 'CONN_MAX_AGE': 600}, alias='pool_test_persistent')
+        with self.assertRaises(ImproperlyConfigured):
+            db.ensure_connection()
+
+
+class EmailUniqueMigrationTest(TransactionTestCase):
+    def migrate(self, target):
+        call_command('migrate', 'accounts', target, verbosity=0, stdout=StringIO())
+
+    def test_duplicate_emails_are_cleared_before_the_index(self):
+        self.migrate('0001')
+        self.addCleanup(self.migrate, '0003')
+        User = get_user_model()
+        recent = User.objects.create_user(username='recent', email='Foo@example.com', last_login=timezone.now())
+        older = User.objects.create_user(username='older', email='foo@example.com')
+        blanks = [User.objects.create_user(username=f'blank{i}', email='') for i in range(2)]
+
+        with self.assertLogs('accounts.migrations', 'INFO') as logs:
+            self.migrate('0003')
+
+        recent.refresh_from_db()
+        older.refresh_from_db()
+        self.assertEqual(recent.email, 'Foo@example.com')
+        self.assertEqual(older.email, '')
+        self.assertIn('(older)', logs.output[0])
+        self.assertEqual(User.objects.filter(pk__in=[user.pk for user in blanks], email='').count(), 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTest(SimpleTestCase):
+    """Routing decisions only; no replica database needs to exist"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, model, view=None, request=None, write=False):
+        """Router's choice for ``model`` during a request to ``view``"""
+        def get_response(request):
+            middleware.process_view(request, view or self.plain_view, (), {})
+            return (self.router.db_for_write if write else self.router.db_for_read)(model)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request or self.factory.get('/'))
+
+    @staticmethod
+    def plain_view(request):
+        pass
+
+    @staticmethod
+    @replica_reads
+    def replica_view(request):
+        pass
+
+    def test_marked_views_read_catalog_and_history_from_replica(self):
+        self.assertEqual(self.route(TravelOption, self.replica_view), 'replica_1')
+        self.assertEqual(self.route(Booking, self.replica_view), 'replica_1')
+        self.assertEqual(self.route(TravelOption, SearchTravelOptionsAPIView.as_view()), 'replica_1')
+        self.assertEqual(self.route(Booking, BookingListAPIView.as_view()), 'replica_1')
+
+    def test_other_reads_use_primary(self):
+        self.assertIsNone(self.route(TravelOption, self.plain_view))
+        self.assertIsNone(self.route(Token, self.replica_view))
+
+    def test_replica_reads_end_with_the_request(self):
+        self.assertEqual(self.route(TravelOption, self.replica_view), 'replica_1')
+        # After the request, or outside any (e.g. management commands)
+        self.assertIsNone(self.router.db_for_read(TravelOption))
+
+    def test_writes_and_migrations_use_primary(self):
+        self.assertEqual(self.route(TravelOption, self.replica_view, write=True), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'travel_options'))
+        self.assertIsNone(self.router.allow_migrate('default', 'travel_options'))
+
+    def test_reads_in_a_primary_transaction_stay_on_primary(self):
+        connection.in_atomic_block = True
+        self.addCleanup(setattr, connection, 'in_atomic_block', False)
+
+        self.assertEqual(self.route(TravelOption, self.replica_view), 'default')
+
+    def test_client_sticks_to_primary_after_booking_change(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token abc123')
+        other = self.factory.get('/', HTTP_AUTHORIZATION='Token def456')
+        stick_to_primary(request)
+        self.addCleanup(caches[settings.REPLICA_STICKY_CACHE].delete, _client_key(request))
+
+        self.assertIsNone(self.route(Booking, self.replica_view, request=request))
+        self.assertEqual(self.route(Booking, self.replica_view, request=other), 'replica_1')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaStickinessAPITest(TestCase):
+    # The booking lands on its travel option's shard when shards are configured
+    databases = {'default', *settings.DATABASE_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        if settings.DATABASE_SHARDS:
+            call_command('init_shards', stdout=StringIO())
+
+    def test_booking_changes_stick_client_to_primary(self):
+        user = User.objects.create_user(username='traveller', password='testpass123')
+        token = Token.objects.create(user=user)
+        departure = timezone.now() + timedelta(days=7)
+        # save() rather than objects.create() so the option goes to its route's shard
+        option = TravelOption(
+            travel_id='FL001', type='FLIGHT', source='New York', destination='Boston',
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=2),
+            price=Decimal('100.00'), total_seats=10, available_seats=10, operator_name='Test'
+        )
+        option.save()
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        request = RequestFactory().get('/', **auth)
+        self.addCleanup(caches[settings.REPLICA_STICKY_CACHE].delete, _client_key(request))
+        self.assertFalse(is_stuck_to_primary(request))
+
+        response = self.client.post(
+            '/api/bookings/create/',
+            data=json.dumps({
+                'travel_option_id': option.pk, 'number_of_seats': 1,
+                'contact_email': 'traveller@example.com', 'contact_phone': '1234567890',
+            }),
+            content_type='application/json', **auth
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(is_stuck_to_primary(request))
+
+
+@override_settings(DATABASE_SHARDS=['shard_0', 'shard_1', 'shard_2'])
+class ShardRouterTest(SimpleTestCase):
+    """Routing decisions only; no shard database needs to exist"""
+
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_ids_name_their_shard(self):
+        self.assertEqual(id_range('shard_1'), (SHARD_ID_SPAN + 1, 2 * SHARD_ID_SPAN))
+        self.assertEqual(shard_for_pk(5), 'shard_0')
+        self.assertEqual(shard_for_pk(str(2 * SHARD_ID_SPAN + 5)), 'shard_2')
+        self.assertIsNone(shard_for_pk(3 * SHARD_ID_SPAN + 5))
+        self.assertIsNone(shard_for_pk('abc'))
+
+    def test_route_picks_one_shard_whatever_the_spelling(self):
+        shard = shard_for_route('New York', 'Boston')
+        self.assertEqual(shard_for_route(' new york', 'BOSTON '), shard)
+        self.assertEqual(self.router.db_for_write(
+            TravelOption, instance=TravelOption(source='New York', destination='Boston')
+        ), shard)
+
+    def test_rows_follow_their_travel_option(self):
+        option_id = SHARD_ID_SPAN + 7
+        booking = Booking(travel_option_id=option_id)
+        self.assertEqual(self.router.db_for_write(Booking, instance=booking), 'shard_1')
+        self.assertEqual(self.router.db_for_read(FareClass, instance=TravelOption(pk=option_id)), 'shard_1')
+        passenger = PassengerDetail(booking_id=2 * SHARD_ID_SPAN + 1)
+        self.assertEqual(self.router.db_for_write(PassengerDetail, instance=passenger), 'shard_2')
+
+    def test_users_are_read_from_default_through_shard_rows(self):
+        booking = Booking(travel_option_id=SHARD_ID_SPAN + 7)
+        self.assertEqual(self.router.db_for_read(User, instance=booking), 'default')
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_queries_without_an_instance_use_the_current_shard(self):
+        self.assertIsNone(self.router.db_for_read(Booking))
+        with use_shard('shard_2'):
+            self.assertEqual(self.router.db_for_read(Booking), 'shard_2')
+            self.assertIsNone(self.router.db_for_read(Token))
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_no_shards_no_routing(self):
+        self.assertIsNone(self.router.db_for_write(Booking, instance=Booking(travel_option_id=SHARD_ID_SPAN + 7)))
+        self.assertIsNone(shard_for_pk(5))
+
+
+@unittest.skipUnless(len(settings.DATABASE_SHARDS) >= 2, 'Needs at least two DATABASE_SHARD_URLS')
+class ShardedBookingTest(TestCase):
+    """Runs against the configured shards, e.g. a few local SQLite files"""
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_shards', stdout=StringIO())
+        cls.user = User.objects.create_user(username='traveller', password='testpass123')
+        cls.token = Token.objects.create(user=cls.user)
+        departure = timezone.now() + timedelta(days=7)
+        routes = [('New York', 'Boston'), ('Boston', 'Chicago'), ('Denver', 'Austin'), ('Miami', 'Dallas')]
+        cls.options = []
+        for number, (source, destination) in enumerate(routes):
+            option = TravelOption(
+                travel_id=f'FL{number:03}', type='FLIGHT', source=source, destination=destination,
+                departure_datetime=departure + timedelta(hours=number),
+                arrival_datetime=departure + timedelta(hours=number + 2),
+                price=Decimal('100.00'), total_seats=10, available_seats=10, operator_name='Test'
+            )
+            option.save()
+            cls.options.append(option)
+
+    def setUp(self):
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def book(self, option):
+        return self.client.post(
+            '/api/bookings/create/',
+            data=json.dumps({
+                'travel_option_id': option.pk, 'number_of_seats': 2,
+                'contact_email': 'traveller@example.com', 'contact_phone': '1234567890',
+            }),
+            content_type='application/json', **self.auth
+        )
+
+    def test_options_live_on_their_route_shard(self):
+        shards = {option._state.db for option in self.options}
+        self.assertGreater(len(shards), 1)
+        for option in self.options:
+            self.assertEqual(option._state.db, shard_for_route(option.source, option.destination))
+            self.assertEqual(shard_for_pk(option.pk), option._state.db)
+            self.assertFalse(TravelOption.objects.using('default').filter(pk=option.pk).exists())
+
+    def test_booking_is_stored_with_its_travel_option(self):
+        for option in self.options:
+            response = self.book(option)
+            self.assertEqual(response.status_code, 201)
+            booking = Booking.objects.using(option._state.db).get(travel_option=option)
+            self.assertEqual(shard_for_pk(booking.pk), option._state.db)
+
+            response = self.client.post(f'/api/bookings/{booking.pk}/confirm/', **self.auth)
+            self.assertEqual(response.status_code, 200)
+            option.refresh_from_db()
+            self.assertEqual(option.available_seats, 8)
+
+            booking.refresh_from_db()
+            booking.cancel_booking()
+            option.refresh_from_db()
+            self.assertEqual(option.available_seats, 10)
+            self.assertEqual(booking.emails.count(), 2)
+
+    def test_lists_and_search_gather_every_shard(self):
+        for option in self.options:
+            self.book(option)
+
+        response = self.client.get('/api/bookings/', **self.auth)
+        self.assertEqual(response.data['count'], len(self.options))
+
+        response = self.client.get('/api/travel-options/')
+        self.assertEqual(response.data['count'], len(self.options))
+        self.assertEqual([item['travel_id'] for item in response.data['results']], ['FL000', 'FL001', 'FL002', 'FL003'])
+
+        response = self.client.post('/api/travel-options/search/', data={}, content_type='application/json')
+        self.assertEqual(response.data['count'], len(self.options))
+        self.assertEqual(response.data['facets'], {'type': {'FLIGHT': len(self.options)}})
+        self.assertEqual([item['travel_id'] for item in response.data['results']], ['FL000', 'FL001', 'FL002', 'FL003'])
+
+    def test_detail_reads_from_the_shard_named_by_the_id(self):
+        option = self.options[2]
+        response = self.client.get(f'/api/travel-options/{option.pk}/')
+        self.assertEqual(response.data['travel_id'], option.travel_id)
+
+    def test_outbox_is_sent_from_every_shard(self):
+        for option in self.options:
+            self.book(option)
+            Booking.objects.using(option._state.db).get(travel_option=option).confirm_booking()
+
+        call_command('send_outbox_emails', stdout=StringIO())
+
+        statuses = [
+            status for alias in settings.DATABASE_SHARDS
+            for status in OutboxEmail.objects.using(alias).values_list('status', flat=True)
+        ]
+        self.assertEqual(statuses, ['SENT'] * len(self.options))
+        self.assertEqual(len(mail.outbox), len(self.options))
+
+    def test_import_updates_in_place_and_creates_on_the_route_shard(self):
+        departure = (timezone.now() + timedelta(days=9)).replace(microsecond=0)
+        rows = [
+            {'travel_id': 'FL000', 'source': 'New York', 'destination': 'Boston', 'price': '80.00'},
+            {'travel_id': 'FL100', 'source': 'Seattle', 'destination': 'Portland', 'price': '60.00'},
+            {'travel_id': 'FL101', 'source': 'Phoenix', 'destination': 'Denver', 'price': '70.00'},
+        ]
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w') as feed:
+            for row in rows:
+                feed.write(json.dumps({
+                    **row, 'type': 'FLIGHT', 'departure_datetime': departure.isoformat(),
+                    'arrival_datetime': (departure + timedelta(hours=2)).isoformat(),
+                    'total_seats': 10, 'operator_name': 'Test',
+                }) + '\n')
+        self.addCleanup(os.remove, path)
+
+        call_command('import_timetable', path, stdout=StringIO(), stderr=StringIO())
+
+        option = self.options[0]
+        self.assertEqual(TravelOption.objects.using(option._state.db).get(travel_id='FL000').price, Decimal('80.00'))
+        for row in rows:
+            stored = [
+                alias for alias in settings.DATABASE_SHARDS
+                if TravelOption.objects.using(alias).filter(travel_id=row['travel_id']).exists()
+            ]
+            self.assertEqual(len(stored), 1)
+        for row in rows[1:]:
+            imported = TravelOption.objects.using(shard_for_route(row['source'], row['destination'])).get(
+                travel_id=row['travel_id']
+            )
+            self.assertEqual(shard_for_pk(imported.pk), imported._state.db)
+
+    def test_alerts_are_matched_on_their_route_shard(self):
+        option = self.options[1]
+        response = self.client.post(
+            '/api/travel-options/alerts/',
+            data=json.dumps({
+                'source': option.source, 'destination': option.destination,
+                'departure_from': (option.departure_datetime - timedelta(days=1)).isoformat(),
+                'departure_to': (option.departure_datetime + timedelta(days=1)).isoformat(),
+                'max_price': '150.00',
+            }),
+            content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(shard_for_pk(response.data['id']), option._state.db)
+        self.assertEqual(self.client.get('/api/travel-options/alerts/', **self.auth).data['count'], 1)
+
+        call_command('match_price_alerts', stdout=StringIO())
+
+        notification = PriceAlertNotification.objects.using(option._state.db).get()
+        self.assertEqual(notification.travel_option_id, option.pk)
+
+    def test_reconcile_repairs_every_shard(self):
+        for option in self.options:
+            TravelOption.objects.using(option._state.db).filter(pk=option.pk).update(available_seats=3)
+
+        call_command('reconcile_seats', '--repair', stdout=StringIO())
+
+        for option in self.options:
+            option.refresh_from_db()
+            self.assertEqual(option.available_seats, 10)
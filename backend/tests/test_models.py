@@ -1,12 +1,17 @@
-from django.test import TestCase
+import threading
+from django.db import connection
+from django.db.models import RestrictedError
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import timedelta
 from decimal import Decimal
 
-from travel_options.models import TravelOption
-from bookings.models import Booking
+from travel_options.models import TravelOption, RouteStop, FareClass
+from travel_options.segments import SegmentTree
+from bookings.forms import BookingForm
+from bookings.models import Booking, WaitlistEntry
 
 User = get_user_model()
 
@@ -167,4 +172,465 @@ class BookingModelTest(TestCase):
                 contact_email='test@example.com',
                 contact_phone='1234567890'
             )
-            booking.full_clean()
\ No newline at end of file
+            booking.full_clean()
+
+
+class MultiStopRouteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        self.future_date = timezone.now() + timedelta(days=7)
+        self.arrival_date = self.future_date + timedelta(hours=6)
+
+        self.travel_option = TravelOption.objects.create(
+            travel_id='TR001',
+            type='TRAIN',
+            source='A',
+            destination='D',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.arrival_date,
+            price=Decimal('50.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Rail'
+        )
+        for sequence, name in enumerate(['A', 'B', 'C', 'D']):
+            RouteStop.objects.create(travel_option=self.travel_option, sequence=sequence, name=name)
+
+    def test_segment_tree_range_queries(self):
+        tree = SegmentTree([5, 3, 7, 2, 9])
+        self.assertEqual(tree.min(0, 5), 2)
+        self.assertEqual(tree.min(0, 3), 3)
+        tree.add(1, 4, 2)
+        self.assertEqual(tree.values(), [5, 5, 9, 4, 9])
+        self.assertEqual(tree.max(0, 5), 9)
+
+        restored = SegmentTree.from_state(tree.to_state())
+        self.assertEqual(restored.min(2, 4), 4)
+
+    def test_partial_segment_leaves_other_segments_free(self):
+        self.travel_option.book_seats(10, from_stop=0, to_stop=1)
+        self.travel_option.refresh_from_db()
+
+        self.assertEqual(self.travel_option.seats_available_between(0, 1), 0)
+        self.assertEqual(self.travel_option.seats_available_between(1, 3), 10)
+        self.assertEqual(self.travel_option.available_seats, 0)
+
+        with self.assertRaises(ValueError):
+            self.travel_option.book_seats(1, from_stop=0, to_stop=2)
+
+    def test_segment_booking_confirm_and_cancel(self):
+        booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=4,
+            from_stop=1,
+            to_stop=3,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+        booking.confirm_booking()
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.seats_available_between(0, 1), 10)
+        self.assertEqual(self.travel_option.seats_available_between(1, 3), 6)
+
+        booking.cancel_booking()
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.seats_available_between(0, 3), 10)
+
+
+class FareClassTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        self.future_date = timezone.now() + timedelta(days=7)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL010',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.future_date + timedelta(hours=5),
+            price=Decimal('200.00'),
+            total_seats=12,
+            available_seats=12,
+            operator_name='Test Airlines'
+        )
+        self.economy = FareClass.objects.create(
+            travel_option=self.travel_option, code='ECONOMY',
+            price=Decimal('200.00'), total_seats=10, available_seats=10
+        )
+        self.business = FareClass.objects.create(
+            travel_option=self.travel_option, code='BUSINESS',
+            price=Decimal('650.00'), total_seats=2, available_seats=2
+        )
+
+    def test_booking_uses_fare_class_price_and_bucket(self):
+        booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            fare_class=self.business,
+            number_of_seats=2,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+        self.assertEqual(booking.total_price, Decimal('1300.00'))
+
+        booking.confirm_booking()
+        self.business.refresh_from_db()
+        self.economy.refresh_from_db()
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.business.available_seats, 0)
+        self.assertEqual(self.economy.available_seats, 10)
+        self.assertEqual(self.travel_option.available_seats, 10)
+
+        booking.cancel_booking()
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.available_seats, 2)
+
+    def test_fare_class_cannot_oversell(self):
+        with self.assertRaises(ValueError):
+            self.business.book_seats(3)
+
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.available_seats, 2)
+
+    def test_fare_class_seats_cannot_exceed_option_seats(self):
+        first = FareClass(
+            travel_option=self.travel_option, code='FIRST',
+            price=Decimal('900.00'), total_seats=1, available_seats=1
+        )
+        with self.assertRaises(ValidationError):
+            first.full_clean()
+
+        self.economy.total_seats = 9
+        self.economy.available_seats = 9
+        self.economy.save()
+        first.full_clean()
+
+    def test_fare_class_booking_between_stops_is_rejected(self):
+        for sequence, name in enumerate(['New York', 'Chicago', 'Los Angeles']):
+            RouteStop.objects.create(travel_option=self.travel_option, sequence=sequence, name=name)
+        booking = Booking(
+            user=self.user,
+            travel_option=self.travel_option,
+            fare_class=self.economy,
+            number_of_seats=1,
+            from_stop=0,
+            to_stop=1,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+        with self.assertRaises(ValidationError):
+            booking.full_clean()
+
+        booking.save()
+        with self.assertRaises(ValueError):
+            booking.confirm_booking()
+        self.economy.refresh_from_db()
+        self.assertEqual(self.economy.available_seats, 10)
+
+    def test_fare_class_seats_move_an_existing_segment_tree(self):
+        option = TravelOption.objects.create(
+            travel_id='TR010', type='TRAIN', source='A', destination='C',
+            departure_datetime=self.future_date, arrival_datetime=self.future_date + timedelta(hours=3),
+            price=Decimal('50.00'), total_seats=10, available_seats=10, operator_name='Test Rail'
+        )
+        for sequence, name in enumerate(['A', 'B', 'C']):
+            RouteStop.objects.create(travel_option=option, sequence=sequence, name=name)
+        option.book_seats(6, from_stop=0, to_stop=1)
+        economy = FareClass.objects.create(
+            travel_option=option, code='ECONOMY', price=Decimal('50.00'), total_seats=10, available_seats=10
+        )
+
+        economy.book_seats(3)
+        option.refresh_from_db()
+        self.assertEqual(option.segment_tree().values(), [1, 7])
+        self.assertEqual(option.available_seats, 1)
+
+        # The bucket has seats left, but the first segment doesn't
+        with self.assertRaises(ValueError):
+            economy.book_seats(2)
+        economy.refresh_from_db()
+        self.assertEqual(economy.available_seats, 7)
+
+        economy.cancel_seats(3)
+        option.refresh_from_db()
+        self.assertEqual(option.segment_tree().values(), [4, 10])
+        self.assertEqual(option.available_seats, 4)
+
+    def test_booked_fare_class_is_deleted_only_with_its_option(self):
+        booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            fare_class=self.economy,
+            number_of_seats=1,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+        with self.assertRaises(RestrictedError):
+            self.economy.delete()
+
+        self.travel_option.delete()
+        self.assertFalse(Booking.objects.filter(pk=booking.pk).exists())
+        self.assertFalse(FareClass.objects.filter(pk=self.economy.pk).exists())
+
+    def test_whole_route_booking_needs_a_fare_class(self):
+        booking = Booking(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=1,
+            contact_email='test@example.com',
+            contact_phone='1234567890'
+        )
+        with self.assertRaises(ValidationError):
+            booking.full_clean()
+
+        booking.save()
+        with self.assertRaises(ValueError):
+            booking.confirm_booking()
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 12)
+
+    def test_booking_form_offers_the_option_fare_classes(self):
+        booking = Booking(user=self.user, travel_option=self.travel_option)
+        data = {'number_of_seats': 1, 'contact_email': 'test@example.com', 'contact_phone': '1234567890'}
+
+        form = BookingForm(data, instance=booking)
+        self.assertFalse(form.is_valid())
+        self.assertIn('fare_class', form.errors)
+
+        form = BookingForm({**data, 'fare_class': self.business.pk}, instance=booking)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save(commit=False).fare_class, self.business)
+
+
+class WaitlistTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(4)
+        ]
+
+        self.future_date = timezone.now() + timedelta(days=7)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL020',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.future_date + timedelta(hours=5),
+            price=Decimal('100.00'),
+            total_seats=4,
+            available_seats=4,
+            operator_name='Test Airlines'
+        )
+        self.booking = Booking.objects.create(
+            user=self.users[0],
+            travel_option=self.travel_option,
+            number_of_seats=4,
+            contact_email='user0@example.com',
+            contact_phone='1234567890'
+        )
+        self.booking.confirm_booking()
+
+    def join(self, user, seats):
+        return WaitlistEntry.objects.create(
+            user=user,
+            travel_option=self.travel_option,
+            number_of_seats=seats,
+            contact_email=user.email,
+            contact_phone='1234567890'
+        )
+
+    def test_cancellation_promotes_in_fifo_order(self):
+        first = self.join(self.users[1], 3)
+        second = self.join(self.users[2], 1)
+        third = self.join(self.users[3], 1)
+        self.assertEqual([first.position, second.position, third.position], [1, 2, 3])
+
+        self.booking.cancel_booking()
+
+        for entry in (first, second, third):
+            entry.refresh_from_db()
+        self.assertEqual(first.status, 'PROMOTED')
+        self.assertEqual(first.booking.status, 'CONFIRMED')
+        self.assertEqual(second.status, 'PROMOTED')
+        self.assertEqual(third.status, 'WAITING')
+        self.assertEqual(third.position, 1)
+
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 0)
+
+    def test_head_of_queue_is_not_skipped(self):
+        self.booking.cancel_booking()
+        self.travel_option.refresh_from_db()
+        small = Booking.objects.create(
+            user=self.users[0],
+            travel_option=self.travel_option,
+            number_of_seats=3,
+            contact_email='user0@example.com',
+            contact_phone='1234567890'
+        )
+        small.confirm_booking()
+        other = Booking.objects.create(
+            user=self.users[0],
+            travel_option=self.travel_option,
+            number_of_seats=1,
+            contact_email='user0@example.com',
+            contact_phone='1234567890'
+        )
+        other.confirm_booking()
+
+        large = self.join(self.users[1], 2)
+        later = self.join(self.users[2], 1)
+
+        other.cancel_booking()
+
+        large.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(large.status, 'WAITING')
+        self.assertEqual(later.status, 'WAITING')
+
+    def test_withdrawal_moves_later_entries_up(self):
+        first = self.join(self.users[1], 1)
+        second = self.join(self.users[2], 1)
+        third = self.join(self.users[3], 1)
+
+        second.withdraw()
+        first.refresh_from_db()
+        third.refresh_from_db()
+        self.assertIsNone(second.position)
+        self.assertEqual([first.position, third.position], [1, 2])
+
+        self.booking.cancel_booking()
+        third.refresh_from_db()
+        self.assertEqual(third.status, 'PROMOTED')
+        late = self.join(self.users[2], 1)
+        self.assertEqual(late.position, 1)
+
+
+class WaitlistCancellationOrderTest(TransactionTestCase):
+    def test_cancellations_from_other_threads_promote_in_fifo_order(self):
+        future_date = timezone.now() + timedelta(days=7)
+        travel_option = TravelOption.objects.create(
+            travel_id='FL022',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=5),
+            price=Decimal('100.00'),
+            total_seats=3,
+            available_seats=3,
+            operator_name='Test Airlines'
+        )
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(6)
+        ]
+        bookings = []
+        for user in users[:3]:
+            booking = Booking.objects.create(
+                user=user, travel_option=travel_option, number_of_seats=1,
+                contact_email=user.email, contact_phone='1234567890'
+            )
+            booking.confirm_booking()
+            bookings.append(booking)
+        entries = [
+            WaitlistEntry.objects.create(
+                user=user, travel_option=travel_option, number_of_seats=seats,
+                contact_email=user.email, contact_phone='1234567890'
+            )
+            for user, seats in zip(users[3:], [2, 1, 1])
+        ]
+
+        # SQLite allows one writer, so the cancellations take turns on their own connections
+        turn = threading.Lock()
+
+        def cancel(booking):
+            try:
+                with turn:
+                    Booking.objects.get(pk=booking.pk).cancel_booking()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cancel, args=(booking,)) for booking in bookings[:2]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for entry in entries:
+            entry.refresh_from_db()
+        # The head needs both freed seats, and nobody behind it jumps ahead
+        self.assertEqual([entry.status for entry in entries], ['PROMOTED', 'WAITING', 'WAITING'])
+        self.assertEqual([entry.position for entry in entries[1:]], [1, 2])
+        self.assertEqual(entries[0].booking.number_of_seats, 2)
+        travel_option.refresh_from_db()
+        self.assertEqual(travel_option.available_seats, 0)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class WaitlistConcurrencyTest(TransactionTestCase):
+    def test_concurrent_cancellations_promote_each_entry_once(self):
+        future_date = timezone.now() + timedelta(days=7)
+        travel_option = TravelOption.objects.create(
+            travel_id='FL021',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=5),
+            price=Decimal('100.00'),
+            total_seats=8,
+            available_seats=8,
+            operator_name='Test Airlines'
+        )
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(12)
+        ]
+        bookings = []
+        for user in users[:8]:
+            booking = Booking.objects.create(
+                user=user, travel_option=travel_option, number_of_seats=1,
+                contact_email=user.email, contact_phone='1234567890'
+            )
+            booking.confirm_booking()
+            bookings.append(booking)
+        entries = [
+            WaitlistEntry.objects.create(
+                user=user, travel_option=travel_option, number_of_seats=1,
+                contact_email=user.email, contact_phone='1234567890'
+            )
+            for user in users[8:]
+        ]
+
+        def cancel(booking):
+            try:
+                Booking.objects.get(pk=booking.pk).cancel_booking()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cancel, args=(booking,)) for booking in bookings[:6]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        travel_option.refresh_from_db()
+        statuses = [WaitlistEntry.objects.get(pk=entry.pk).status for entry in entries]
+        self.assertEqual(statuses, ['PROMOTED'] * 4)
+        self.assertEqual(travel_option.available_seats, 2)
+        self.assertEqual(
+            Booking.objects.filter(travel_option=travel_option, status='CONFIRMED').count(), 6
+        )
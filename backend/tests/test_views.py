@@ -1,12 +1,22 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 import json
+import os
+import tempfile
 
-from travel_options.models import TravelOption
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import issue_token
+
+from travel_options.currency import invalidate_rates
+from travel_options.models import TravelOption, RouteStop, FareClass, ExchangeRate
 from bookings.models import Booking
 
 User = get_user_model()
@@ -68,6 +78,96 @@ class TravelOptionAPITest(TestCase):
         data = json.loads(response.content)
         self.assertEqual(data['count'], 1)
 
+    def test_travel_option_search_matches_intermediate_stops(self):
+        train = TravelOption.objects.create(
+            travel_id='TR001',
+            type='TRAIN',
+            source='Boston',
+            destination='Washington',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.arrival_date,
+            price=Decimal('89.00'),
+            total_seats=50,
+            available_seats=50,
+            operator_name='Test Rail'
+        )
+        for sequence, name in enumerate(['Boston', 'New York', 'Philadelphia', 'Washington']):
+            RouteStop.objects.create(travel_option=train, sequence=sequence, name=name)
+
+        def search(source, destination):
+            response = self.client.post(
+                '/api/travel-options/search/',
+                data=json.dumps({'source': source, 'destination': destination}),
+                content_type='application/json'
+            )
+            return [r['travel_id'] for r in json.loads(response.content)['results']]
+
+        self.assertEqual(search('New York', 'Philadelphia'), ['TR001'])
+        self.assertEqual(search('Philadelphia', 'New York'), [])
+
+    def test_travel_option_search_checks_seats_between_searched_stops(self):
+        train = TravelOption.objects.create(
+            travel_id='TR002',
+            type='TRAIN',
+            source='Boston',
+            destination='Washington',
+            departure_datetime=self.future_date,
+            arrival_datetime=self.arrival_date,
+            price=Decimal('89.00'),
+            total_seats=10,
+            available_seats=10,
+            operator_name='Test Rail'
+        )
+        for sequence, name in enumerate(['Boston', 'New York', 'Philadelphia', 'Washington']):
+            RouteStop.objects.create(travel_option=train, sequence=sequence, name=name)
+        train.book_seats(8, from_stop=0, to_stop=1)
+
+        def search(source, destination):
+            response = self.client.post(
+                '/api/travel-options/search/',
+                data=json.dumps({'source': source, 'destination': destination, 'available_seats_min': 5}),
+                content_type='application/json'
+            )
+            return [r['travel_id'] for r in json.loads(response.content)['results']]
+
+        self.assertEqual(search('New York', 'Washington'), ['TR002'])
+        self.assertEqual(search('Boston', 'Philadelphia'), [])
+
+    def test_travel_option_search_returns_cheapest_available_fare_class(self):
+        FareClass.objects.create(
+            travel_option=self.travel_option, code='ECONOMY',
+            price=Decimal('199.00'), total_seats=50, available_seats=0
+        )
+        FareClass.objects.create(
+            travel_option=self.travel_option, code='BUSINESS',
+            price=Decimal('499.00'), total_seats=50, available_seats=10
+        )
+
+        response = self.client.post(
+            '/api/travel-options/search/',
+            data=json.dumps({'source': 'New York', 'max_price': '600.00'}),
+            content_type='application/json'
+        )
+
+        data = json.loads(response.content)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['cheapest_price'], '499.00')
+        self.assertEqual(len(data['results'][0]['fare_classes']), 2)
+
+    def test_travel_option_search_skips_sold_out_fare_classes(self):
+        FareClass.objects.create(
+            travel_option=self.travel_option, code='ECONOMY',
+            price=Decimal('199.00'), total_seats=50, available_seats=0
+        )
+
+        response = self.client.post(
+            '/api/travel-options/search/',
+            data=json.dumps({'source': 'New York'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(json.loads(response.content)['count'], 0)
+
 class BookingAPITest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -147,6 +247,183 @@ class BookingAPITest(TestCase):
         self.assertIn('results', data)
         self.assertEqual(len(data['results']), 1)
 
+    def test_cancel_booking_api(self):
+        auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        booking = Booking.objects.create(
+            user=self.user, travel_option=self.travel_option, number_of_seats=2,
+            contact_email='test@example.com', contact_phone='1234567890'
+        )
+        booking.confirm_booking()
+
+        response = self.client.post(f'/api/bookings/{booking.pk}/cancel/', **auth)
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        self.travel_option.refresh_from_db()
+        self.assertEqual(booking.status, 'CANCELLED')
+        self.assertEqual(self.travel_option.available_seats, 100)
+
+    def test_create_booking_api_with_fare_class(self):
+        auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        FareClass.objects.create(
+            travel_option=self.travel_option, code='ECONOMY', price=Decimal('199.00'),
+            total_seats=100, available_seats=100
+        )
+        booking_data = {
+            'travel_option_id': self.travel_option.id, 'number_of_seats': 2,
+            'contact_email': 'test@example.com', 'contact_phone': '1234567890'
+        }
+
+        response = self.client.post(
+            '/api/bookings/create/', data=json.dumps(booking_data), content_type='application/json', **auth
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('A fare class is required for this travel option', str(response.json()))
+
+        response = self.client.post(
+            '/api/bookings/create/', data=json.dumps({**booking_data, 'fare_class': 'ECONOMY'}),
+            content_type='application/json', **auth
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['fare_class'], 'ECONOMY')
+        self.assertEqual(response.json()['total_price'], '398.00')
+        self.assertEqual(Booking.objects.get(user=self.user).fare_class.code, 'ECONOMY')
+
+class CurrencyAPITest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.addCleanup(invalidate_rates)
+        ExchangeRate.objects.create(currency='EUR', rate=Decimal('0.92'))
+        ExchangeRate.objects.create(currency='GBP', rate=Decimal('0.79'))
+
+        future_date = timezone.now() + timedelta(days=7)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            type='FLIGHT',
+            source='New York',
+            destination='Los Angeles',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=2),
+            price=Decimal('299.99'),
+            total_seats=100,
+            available_seats=100,
+            operator_name='Test Airlines'
+        )
+        self.euro_option = TravelOption.objects.create(
+            travel_id='TR001',
+            type='TRAIN',
+            source='Paris',
+            destination='Lyon',
+            departure_datetime=future_date,
+            arrival_datetime=future_date + timedelta(hours=2),
+            price=Decimal('46.00'),
+            currency='EUR',
+            total_seats=100,
+            available_seats=100,
+            operator_name='Test Rail'
+        )
+
+    def test_list_converts_prices_to_requested_currency(self):
+        response = self.client.get('/api/travel-options/?currency=eur')
+        self.assertEqual(response.status_code, 200)
+
+        results = {r['travel_id']: r for r in json.loads(response.content)['results']}
+        self.assertEqual(results['FL001']['price'], '275.99')
+        self.assertEqual(results['FL001']['currency'], 'EUR')
+        self.assertEqual(results['TR001']['price'], '46.00')
+
+        response = self.client.get(f'/api/travel-options/{self.euro_option.id}/?currency=GBP')
+        self.assertEqual(json.loads(response.content)['price'], '39.50')
+
+    def test_unknown_currency_is_rejected(self):
+        response = self.client.get('/api/travel-options/?currency=XYZ')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('currency', json.loads(response.content))
+
+    def test_search_price_bounds_use_requested_currency(self):
+        response = self.client.post(
+            '/api/travel-options/search/?currency=USD',
+            data=json.dumps({'max_price': '60.00'}),
+            content_type='application/json'
+        )
+
+        data = json.loads(response.content)
+        self.assertEqual([r['travel_id'] for r in data['results']], ['TR001'])
+        self.assertEqual(data['results'][0]['cheapest_price'], '50.00')
+
+    def test_booking_charges_displayed_price(self):
+        token = Token.objects.create(user=self.user)
+        listed = self.client.get(f'/api/travel-options/{self.travel_option.id}/?currency=EUR')
+        unit_price = Decimal(json.loads(listed.content)['price'])
+
+        response = self.client.post(
+            '/api/bookings/create/?currency=EUR',
+            data=json.dumps({
+                'travel_option_id': self.travel_option.id,
+                'number_of_seats': 3,
+                'contact_email': 'test@example.com',
+                'contact_phone': '1234567890'
+            }),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        booking = Booking.objects.get(user=self.user)
+        self.assertEqual(booking.total_price, unit_price * 3)
+        self.assertEqual(booking.currency, 'EUR')
+
+class PriceAlertAPITest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        self.departure = timezone.now() + timedelta(days=7)
+
+    def test_create_and_list_alerts(self):
+        response = self.client.post(
+            '/api/travel-options/alerts/',
+            data=json.dumps({
+                'source': ' New York',
+                'destination': 'Los Angeles',
+                'departure_from': self.departure.isoformat(),
+                'departure_to': (self.departure + timedelta(days=3)).isoformat(),
+                'max_price': '150.00',
+            }),
+            content_type='application/json',
+            **self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get('/api/travel-options/alerts/', **self.auth)
+        results = json.loads(response.content)['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['source'], 'new york')
+        self.assertEqual(results[0]['currency'], 'USD')
+
+    def test_rejects_inverted_window(self):
+        response = self.client.post(
+            '/api/travel-options/alerts/',
+            data=json.dumps({
+                'source': 'New York',
+                'destination': 'Los Angeles',
+                'departure_from': self.departure.isoformat(),
+                'departure_to': (self.departure - timedelta(days=1)).isoformat(),
+                'max_price': '150.00',
+            }),
+            content_type='application/json',
+            **self.auth
+        )
+        self.assertEqual(response.status_code, 400)
+
 class AuthenticationTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -208,4 +485,515 @@ class AuthenticationTest(TestCase):
             content_type='application/json'
         )
         
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_by_email_ignores_case(self):
+        User.objects.create_user(username='emailuser', email='Mixed@Example.com', password='testpass123')
+
+        response = self.client.post(
+            '/api/accounts/login/',
+            data=json.dumps({'email': ' mixed@EXAMPLE.com', 'password': 'testpass123'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'emailuser')
+
+        response = self.client.post(
+            '/api/accounts/login/',
+            data=json.dumps({'email': 'mixed@example.com', 'password': 'wrongpass'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_registration_rejects_email_differing_only_in_case(self):
+        User.objects.create_user(username='first', email='taken@example.com', password='testpass123')
+
+        response = self.client.post(
+            '/api/accounts/register/',
+            data=json.dumps({
+                'username': 'second',
+                'email': 'TAKEN@example.com',
+                'password': 'complexpass123',
+                'password_confirm': 'complexpass123',
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_email_unique_constraint_ignores_case(self):
+        from django.db import IntegrityError, transaction
+
+        User.objects.create_user(username='first', email='dup@example.com')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='second', email='DUP@example.com')
+        # Blank emails are not subject to the constraint
+        User.objects.create_user(username='blank1', email='')
+        User.objects.create_user(username='blank2', email='')
+
+
+class TokenAuthenticationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def get_profile(self, key=None):
+        return self.client.get(
+            '/api/accounts/profile/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}'
+        )
+
+    def test_repeated_requests_skip_token_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_profile().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.get_profile()
+        self.assertEqual(json.loads(response.content)['username'], 'testuser')
+
+    def test_revocation_reaches_cached_lookups(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+
+        # Another worker's logout only shows up in the shared cache
+        caches[settings.TOKEN_REVOCATION_CACHE].set(f'auth:revoked:{self.token.key}', 1)
+        self.addCleanup(caches[settings.TOKEN_REVOCATION_CACHE].delete, f'auth:revoked:{self.token.key}')
+
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_deactivation_reaches_cached_lookups(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.addCleanup(caches[settings.TOKEN_REVOCATION_CACHE].delete, f'auth:revoked:{self.token.key}')
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_profile().status_code, 401)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_logout_revokes_token(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.client.post('/api/accounts/logout/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.assertEqual(self.get_profile().status_code, 401)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_expired_token_is_rejected(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - settings.TOKEN_EXPIRY)
+
+        response = self.get_profile()
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('expired', json.loads(response.content)['detail'])
+
+    def test_login_rotates_old_token(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - settings.TOKEN_ROTATE_AFTER)
+
+        new_token = issue_token(self.user)
+
+        self.assertNotEqual(new_token.key, self.token.key)
+        self.assertEqual(self.get_profile(self.token.key).status_code, 401)
+        self.assertEqual(self.get_profile(new_token.key).status_code, 200)
+        self.assertEqual(issue_token(self.user).key, new_token.key)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, ip='10.0.0.1', **extra):
+        return self.client.post(
+            '/api/travel-options/search/', data=json.dumps({}), content_type='application/json',
+            REMOTE_ADDR=ip, **extra
+        )
+
+    def login(self, email, ip):
+        return self.client.post(
+            '/api/accounts/login/', data=json.dumps({'email': email, 'password': 'wrongpass'}),
+            content_type='application/json', REMOTE_ADDR=ip
+        )
+
+    @throttle_rates(search_ip='3/min')
+    def test_search_is_throttled_per_ip(self):
+        for _ in range(3):
+            self.assertEqual(self.search().status_code, 200)
+
+        response = self.search()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.search(ip='10.0.0.2').status_code, 200)
+
+    @throttle_rates(search_ip='2/min')
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        # The router appends the address it saw; anything before it comes from the client
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            response = self.search(ip='10.0.0.254', HTTP_X_FORWARDED_FOR=f'{spoofed}, 203.0.113.7')
+            self.assertEqual(response.status_code, 200)
+
+        response = self.search(ip='10.0.0.254', HTTP_X_FORWARDED_FOR='3.3.3.3, 203.0.113.7')
+        self.assertEqual(response.status_code, 429)
+        response = self.search(ip='10.0.0.254', HTTP_X_FORWARDED_FOR='3.3.3.3, 203.0.113.8')
+        self.assertEqual(response.status_code, 200)
+
+    @throttle_rates(search_user='2/min')
+    def test_search_is_throttled_per_user_across_ips(self):
+        user = User.objects.create_user(username='searcher', password='testpass123')
+        token = issue_token(user)
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+        self.assertEqual(self.search(ip='10.0.0.1', **auth).status_code, 200)
+        self.assertEqual(self.search(ip='10.0.0.2', **auth).status_code, 200)
+        self.assertEqual(self.search(ip='10.0.0.3', **auth).status_code, 429)
+        # Anonymous requests are only limited per address
+        self.assertEqual(self.search(ip='10.0.0.3').status_code, 200)
+
+    @throttle_rates(login_email='2/min', login_ip='100/min')
+    def test_login_is_throttled_per_email_ignoring_case(self):
+        self.assertEqual(self.login('victim@example.com', '10.0.0.1').status_code, 400)
+        self.assertEqual(self.login('VICTIM@example.com', '10.0.0.2').status_code, 400)
+        self.assertEqual(self.login('victim@example.com', '10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('other@example.com', '10.0.0.3').status_code, 400)
+
+    def test_bucket_refills_over_time(self):
+        from accounts.models import ThrottleBucket
+
+        now = 1000.0
+        for _ in range(4):
+            self.assertEqual(ThrottleBucket.consume('k', 4, 60, now=now), (True, None))
+        allowed, wait = ThrottleBucket.consume('k', 4, 60, now=now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 15)
+
+        # One token back every 15 seconds
+        self.assertTrue(ThrottleBucket.consume('k', 4, 60, now=now + 15)[0])
+        self.assertFalse(ThrottleBucket.consume('k', 4, 60, now=now + 15)[0])
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+
+class AsyncViewTest(TransactionTestCase):
+    """Outside a test transaction, so ORM work runs on the database thread pool"""
+
+    def setUp(self):
+        from travel_booking import async_api
+
+        async_api.enable_pool()
+        self.addCleanup(async_api.enable_pool, False)
+        departure = timezone.now() + timedelta(days=7)
+        for travel_id, travel_type in (('FL001', 'FLIGHT'), ('FL002', 'FLIGHT'), ('TR001', 'TRAIN')):
+            TravelOption.objects.create(
+                travel_id=travel_id, type=travel_type, source='New York', destination='Boston',
+                departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+                price=Decimal('100.00'), total_seats=10, available_seats=10, operator_name='Test'
+            )
+
+    def test_views_are_coroutines(self):
+        from asgiref.sync import iscoroutinefunction
+        from travel_options import views
+
+        for view in (views.search_travel_options, views.TravelOptionListAPIView.as_view(),
+                     views.TravelOptionDetailAPIView.as_view(), views.home_view):
+            self.assertTrue(iscoroutinefunction(view))
+
+    def test_search_returns_results_with_type_facets(self):
+        response = self.client.post(
+            '/api/travel-options/search/', data=json.dumps({'source': 'new york', 'type': 'TRAIN'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['travel_id'] for r in data['results']], ['TR001'])
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['facets'], {'type': {'FLIGHT': 2, 'TRAIN': 1}})
+
+    def test_pool_only_runs_work_when_enabled(self):
+        import threading
+        from asgiref.sync import async_to_sync
+        from travel_booking import async_api
+
+        def thread_name():
+            return threading.current_thread().name
+
+        self.assertTrue(async_to_sync(async_api.run_query)(thread_name).startswith('db'))
+        async_api.enable_pool(False)
+        self.assertEqual(async_to_sync(async_api.run_query)(thread_name), threading.current_thread().name)
+
+    def test_list_and_detail(self):
+        self.assertEqual(self.client.get('/api/travel-options/').json()['count'], 3)
+        option = TravelOption.objects.get(travel_id='TR001')
+        self.assertEqual(self.client.get(f'/api/travel-options/{option.pk}/').json()['travel_id'], 'TR001')
+        self.assertEqual(self.client.get('/api/travel-options/999999/').status_code, 404)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        departure = timezone.now() + timedelta(days=7)
+        for number in range(3):
+            TravelOption.objects.create(
+                travel_id=f'FL00{number}', type='FLIGHT', source='New York', destination='Boston',
+                departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+                price=Decimal('100.00'), total_seats=10, available_seats=10, operator_name='Test'
+            )
+
+    def metrics(self, response):
+        """Server-Timing header as {name: (duration, description)}"""
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            metrics[name] = (float(params['dur']), params.get('desc'))
+        return metrics
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_sampled_request_reports_db_serialize_and_render(self):
+        with self.assertLogs('travel_booking.timing', 'INFO') as logs:
+            response = self.client.get('/api/travel-options/')
+
+        self.assertEqual(response.status_code, 200)
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'serialize', 'render', 'total'})
+        # Count, page and the two prefetches
+        self.assertEqual(metrics['db'][1], '"4 queries"')
+        self.assertLessEqual(metrics['serialize'][0], metrics['total'][0])
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['route'], 'api/travel-options/')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['db_queries'], 4)
+        self.assertEqual(set(entry), {
+            'method', 'path', 'route', 'status', 'db_ms', 'db_queries', 'serialize_ms', 'render_ms', 'total_ms'
+        })
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_has_no_timing(self):
+        response = self.client.get('/api/travel-options/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_nested_spans_count_once(self):
+        from travel_booking.timing import RequestTimings, _timings, timed
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            with timed('render'):
+                with timed('render'):
+                    pass
+        finally:
+            _timings.reset(token)
+        self.assertEqual(list(timings.durations), ['render'])
+        self.assertIn('render;dur=', timings.header(0.01))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_DIR=self.directory, METRICS_TOKEN='', DEBUG=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        departure = timezone.now() + timedelta(days=7)
+        self.user = User.objects.create_user(username='metrics', password='testpass123')
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001', type='FLIGHT', source='New York', destination='Boston',
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+            price=Decimal('100.00'), total_seats=2, available_seats=2, operator_name='Test'
+        )
+
+    def samples(self):
+        """Exposed samples as {line without value: value}"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_request_counts_and_latency_by_route(self):
+        self.client.get('/api/travel-options/')
+        self.client.get('/api/travel-options/')
+        self.client.get('/api/travel-options/999999/')
+
+        samples = self.samples()
+        self.assertEqual(samples['http_requests_total{method="GET",route="api/travel-options/",status="200"}'], 2)
+        self.assertEqual(
+            samples['http_requests_total{method="GET",route="api/travel-options/<int:pk>/",status="404"}'], 1
+        )
+        self.assertEqual(
+            samples['http_request_duration_seconds_bucket{method="GET",route="api/travel-options/",le="+Inf"}'], 2
+        )
+        self.assertEqual(samples['http_request_duration_seconds_count{method="GET",route="api/travel-options/"}'], 2)
+        self.assertGreater(samples['db_query_duration_seconds_count{alias="default"}'], 0)
+
+    def test_booking_confirmations_and_oversell_rejections(self):
+        first = Booking.objects.create(user=self.user, travel_option=self.travel_option, number_of_seats=2)
+        second = Booking.objects.create(user=self.user, travel_option=self.travel_option, number_of_seats=1)
+        first.confirm_booking()
+        with self.assertRaises(ValueError):
+            second.confirm_booking()
+
+        samples = self.samples()
+        self.assertEqual(samples['bookings_confirmed_total'], 1)
+        self.assertEqual(samples['booking_oversell_rejections_total'], 1)
+
+    def test_cache_lookups_by_result(self):
+        token = issue_token(self.user)
+        for _ in range(2):
+            self.client.get('/api/bookings/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        samples = self.samples()
+        self.assertEqual(samples['cache_requests_total{cache="token",result="miss"}'], 1)
+        self.assertEqual(samples['cache_requests_total{cache="token",result="hit"}'], 1)
+
+    def test_values_are_summed_over_process_files(self):
+        from travel_booking.metrics import BOOKINGS_CONFIRMED, MmapStore, _key, exposition
+
+        BOOKINGS_CONFIRMED.inc()
+        # Another worker's file
+        MmapStore(os.path.join(self.directory, 'other.db')).inc([(_key('bookings_confirmed_total', ()), 2)])
+        self.assertIn('\nbookings_confirmed_total 3\n', exposition())
+
+    def test_store_grows_and_reopens(self):
+        from travel_booking.metrics import MmapStore, _key, read_values
+
+        path = os.path.join(self.directory, 'grow.db')
+        store = MmapStore(path)
+        for number in range(3000):
+            store.inc([(_key('test_total', (('n', str(number)),)), number)])
+        store.inc([(_key('test_total', (('n', '7'),)), 1)])
+
+        reopened = MmapStore(path)
+        reopened.inc([(_key('test_total', (('n', '7'),)), 1)])
+        values = read_values(self.directory)
+        self.assertEqual(sum(key.startswith('["test_total"') for key in values), 3000)
+        self.assertEqual(values[_key('test_total', (('n', '7'),))], 9)
+
+    def test_token_required_when_set(self):
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+    def test_hidden_without_token_unless_debug(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with override_settings(METRICS_TOKEN='secret'):
+                response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG_INTERVAL=3600)
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        from travel_booking import slow_queries
+
+        slow_queries._pending.clear()
+        self.addCleanup(slow_queries._pending.clear)
+        departure = timezone.now() + timedelta(days=7)
+        TravelOption.objects.create(
+            travel_id='FL001', type='FLIGHT', source='New York', destination='Boston',
+            departure_datetime=departure, arrival_datetime=departure + timedelta(hours=3),
+            price=Decimal('100.00'), total_seats=10, available_seats=10, operator_name='Test'
+        )
+
+    def search(self):
+        return self.client.post(
+            '/api/travel-options/search/',
+            data=json.dumps({'source': 'New York', 'destination': 'Boston'}),
+            content_type='application/json',
+        )
+
+    def test_slow_queries_are_logged_with_view_and_plan(self):
+        with self.assertLogs('travel_booking.slow_queries', 'WARNING') as logs:
+            response = self.search()
+        self.assertEqual(response.status_code, 200)
+
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        search = next(entry for entry in entries if entry['sql'].startswith('SELECT "travel_option"."id"'))
+        self.assertEqual(search['view'], 'travel_options.views.SearchTravelOptionsAPIView')
+        self.assertEqual(search['path'], '/api/travel-options/search/')
+        self.assertTrue(search['caller'].startswith('travel_options/views.py:'))
+        self.assertNotIn('New York', search['sql'])
+        self.assertTrue(search['plan'])
+        self.assertEqual(search['count'], 1)
+
+    def test_repeats_are_counted_into_the_next_line(self):
+        with self.assertLogs('travel_booking.slow_queries', 'WARNING'):
+            self.search()
+        with self.assertNoLogs('travel_booking.slow_queries', 'WARNING'):
+            self.search()
+
+        with override_settings(SLOW_QUERY_LOG_INTERVAL=0), \
+                self.assertLogs('travel_booking.slow_queries', 'WARNING') as logs:
+            self.search()
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        search = next(entry for entry in entries if entry['sql'].startswith('SELECT "travel_option"."id"'))
+        self.assertEqual(search['count'], 2)
+        self.assertIsNotNone(search['plan'])
+
+    def test_normalize(self):
+        from travel_booking.slow_queries import normalize
+
+        self.assertEqual(
+            normalize('SELECT "t"."id" FROM "t" WHERE "t"."a" = %s AND "t"."b" IN (1, 2, 3)\n AND "t"."c" = \'x\' LIMIT 21'),
+            'SELECT "t"."id" FROM "t" WHERE "t"."a" = ? AND "t"."b" IN (...) AND "t"."c" = ? LIMIT ?',
+        )
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(PROFILING_ENABLED=True, PROFILE_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='user', password='testpass123')
+
+    def test_staff_request_is_profiled_to_a_file(self):
+        token = issue_token(self.staff)
+        response = self.client.get('/api/travel-options/?profile=1', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('results', json.loads(response.content))
+        self.assertTrue(response['X-Profile'].endswith('-TravelOptionListAPIView.folded'))
+        with open(os.path.join(self.directory, response['X-Profile'])) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(count.isdigit())
+        self.assertTrue(any(line.startswith('request;') for line in lines))
+
+    def test_folded_stacks_returned_for_session_staff(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/travel-options/', HTTP_X_PROFILE='folded')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('request;', response.content.decode())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_other_users_are_not_profiled(self):
+        token = issue_token(self.user)
+        response = self.client.get('/api/travel-options/?profile=1', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertFalse(self.client.get('/api/travel-options/?profile=1').has_header('X-Profile'))
+
+    def test_disabled_middleware_is_not_loaded(self):
+        from travel_booking.profiling import ProfilingMiddleware
+
+        with override_settings(PROFILING_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
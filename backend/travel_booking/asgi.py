@@ -0,0 +1,16 @@
+"""
+ASGI config for travel_booking project.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_booking.settings')
+
+application = get_asgi_application()
+
+# Only ASGI servers get the database thread pool; see travel_booking.async_api
+from travel_booking.async_api import enable_pool  # noqa: E402
+
+enable_pool()
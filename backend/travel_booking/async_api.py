@@ -0,0 +1,127 @@
+"""
+Async views on top of DRF, for serving read-heavy endpoints under ASGI.
+
+Django 4.2's async ORM hands every query to one shared thread per process,
+so async views built on it serialise their database work. Instead, views
+here run ORM code on a small thread pool (``ASYNC_DB_THREADS``) where each
+thread keeps its own connection. Calls awaited together with
+``run_concurrently`` are actually in flight at the same time, and the event
+loop stays free for other requests meanwhile.
+
+The pool is only started by the ASGI entry point (``travel_booking.asgi``
+calls ``enable_pool``). Under WSGI each worker already serves one request
+per thread, so the work runs on the request's own thread and connection
+rather than opening up to ``ASYNC_DB_THREADS`` more per worker.
+
+When the calling thread's connection is inside a transaction (as in
+``TestCase``) the work also stays on that connection, since the pool's
+connections can't see its uncommitted rows.
+"""
+import asyncio
+import contextvars
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from rest_framework.views import APIView
+
+_executor = None
+_executor_lock = threading.Lock()
+_pool_enabled = False
+
+
+def enable_pool(enabled=True):
+    """Run database work on the thread pool; called by the ASGI entry point"""
+    global _pool_enabled
+    _pool_enabled = enabled
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_THREADS', 8), thread_name_prefix='db'
+            )
+        return _executor
+
+
+def _run(func, args):
+    # Same connection housekeeping Django does around each request
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _run_in_order(calls):
+    return [func(*args) for func, *args in calls]
+
+
+async def run_concurrently(*calls):
+    """
+    Run ``(func, *args)`` calls on the database pool at the same time and
+    return their results in order. Each ``func`` is plain sync ORM code.
+    Without the pool they run one after another on the request's thread.
+    """
+    if not _pool_enabled or await sync_to_async(_in_transaction)():
+        return await sync_to_async(_run_in_order)(calls)
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    # Each call gets a copy of the request's context (e.g. replica routing), as sync_to_async does
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, _run, func, args) for func, *args in calls
+    ))
+
+
+async def run_query(func, *args):
+    """Run sync ORM code ``func(*args)`` on the database pool"""
+    (result,) = await run_concurrently((func, *args))
+    return result
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines. Authentication, permissions and
+    throttles run on the database pool; so should any ORM code in handlers.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # csrf_exempt() in Django 4.2 hides that the view is a coroutine
+        markcoroutinefunction(view)
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_query(partial(self.initial, request, *args, **kwargs))
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # OPTIONS is answered by DRF's sync handler
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,123 @@
+"""
+PostgreSQL backend that takes connections from a psycopg_pool pool.
+
+Enabled with ``DB_POOL`` (see settings). Each process keeps one pool per
+database alias. Django checks a connection out when it first needs one in
+a request and hands it back when it closes it at the end of the request,
+so a worker only holds a server connection while it is using it.
+
+Pooled connections are pre-pinged on checkout, closed after ``max_idle``
+seconds unused and replaced after ``max_lifetime``. TLS handshakes then
+happen when the pool grows or recycles, not on every request or worker
+restart.
+
+Pool parameters go in ``OPTIONS['pool']`` as ``ConnectionPool`` keyword
+arguments. That matches the native pooling added in Django 5.1, so
+upgrading only means switching ENGINE back to
+``django.db.backends.postgresql``.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError as e:
+    raise ImproperlyConfigured(f"Error loading psycopg_pool module: {e}")
+
+if not is_psycopg3:
+    raise ImproperlyConfigured("The pooled PostgreSQL backend requires psycopg 3.")
+
+POOL_DEFAULTS = {
+    'min_size': 1,
+    'max_size': 10,
+    'timeout': 10,  # Seconds to wait for a free connection before failing
+    'max_idle': 300,
+    'max_lifetime': 3600,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # alias -> (database name, pool), shared by every thread in the process
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pooled(self):
+        # Connections for test database setup bypass the pool
+        return self.alias != NO_DB_ALIAS
+
+    @property
+    def pool(self):
+        name = self.settings_dict['NAME']
+        with self._pools_lock:
+            current = self._pools.get(self.alias)
+            if current is not None and current[0] == name:
+                return current[1]
+            if current is not None:
+                # NAME changed, e.g. the test runner switched to the test database
+                current[1].close()
+
+            if self.settings_dict['CONN_MAX_AGE'] != 0:
+                raise ImproperlyConfigured('Pooled connections require CONN_MAX_AGE = 0.')
+            options = {**POOL_DEFAULTS, **(self.settings_dict['OPTIONS'].get('pool') or {})}
+            pool = ConnectionPool(
+                kwargs=self.get_connection_params(),
+                configure=self._configure_connection,
+                check=ConnectionPool.check_connection,
+                name=self.alias,
+                open=True,
+                **options,
+            )
+            self._pools[self.alias] = (name, pool)
+            return pool
+
+    @classmethod
+    def close_pools(cls):
+        """Close every pool in this process, e.g. when a worker exits"""
+        with cls._pools_lock:
+            for _, pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def _configure_connection(self, connection):
+        """Per-connection setup the parent does in get_new_connection, run once when the pool opens it"""
+        options = self.settings_dict['OPTIONS']
+        if 'isolation_level' in options:
+            connection.isolation_level = IsolationLevel(options['isolation_level'])
+        connection.cursor_factory = (
+            base.ServerBindingCursor if options.get('server_side_binding') is True else base.Cursor
+        )
+        # The pool hands out connections in autocommit mode; Django sets its own mode on checkout
+        connection.autocommit = True
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        try:
+            self.isolation_level = IsolationLevel(
+                self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {self.settings_dict['OPTIONS']['isolation_level']} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+        # Remembered so the connection goes back where it came from even if NAME changes meanwhile
+        self.checkout_pool = self.pool
+        return self.checkout_pool.getconn()
+
+    def _close(self):
+        if self.connection is None or not self.pooled:
+            return super()._close()
+        # Back to the pool, which rolls back anything left open and drops broken connections
+        with self.wrap_database_errors:
+            self.checkout_pool.putconn(self.connection)
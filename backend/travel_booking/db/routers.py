@@ -0,0 +1,101 @@
+"""
+Read-replica routing for catalog and booking history reads.
+
+Replicas are only read from in requests to views marked with
+``replica_reads`` (see ``ReplicaRoutingMiddleware``), and only for models of
+``ReplicaRouter.replica_apps``. Everything else, including management
+commands, reads the primary, so code that reads a row and then writes
+based on it never acts on a lagging copy. On top of that:
+
+- reads inside a transaction on the primary stay on the primary, so seat
+  checks in the booking transaction see committed and in-flight writes;
+- ``select_for_update()`` queries are routed as writes;
+- after a client creates, confirms or cancels a booking, ``stick_to_primary``
+  keeps that client on the primary for ``REPLICA_STICKY_SECONDS``, so it
+  sees its own change on every worker.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_reads(view):
+    """Mark a view whose catalog and history reads may be served by a replica"""
+    view.replica_reads = True
+    return view
+
+
+def _client_key(request):
+    """Cache key for the client making ``request``: its API token, else its session"""
+    credentials = request.META.get('HTTP_AUTHORIZATION', '')
+    if not credentials:
+        session = getattr(request, 'session', None)
+        credentials = session.session_key if session is not None else None
+    if not credentials:
+        return None
+    return 'db:primary:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def stick_to_primary(request):
+    """Read from the primary for this client's next requests, until replicas have caught up"""
+    key = _client_key(request)
+    if key is not None and settings.DATABASE_REPLICAS:
+        caches[settings.REPLICA_STICKY_CACHE].set(key, 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def is_stuck_to_primary(request):
+    key = _client_key(request)
+    return key is not None and caches[settings.REPLICA_STICKY_CACHE].get(key) is not None
+
+
+class ReplicaRoutingMiddleware:
+    """Allows replica reads for the duration of requests to ``replica_reads`` views"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Decided per request in process_view; nothing before or after it reads replicas
+        previous = _replica_reads.get()
+        _replica_reads.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            _replica_reads.set(previous)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        marked = getattr(view_func, 'replica_reads', False) or getattr(view_class, 'replica_reads', False)
+        _replica_reads.set(bool(marked and settings.DATABASE_REPLICAS and not is_stuck_to_primary(request)))
+
+
+class ReplicaRouter:
+    replica_apps = {'travel_options', 'bookings'}
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label not in self.replica_apps:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would save an instance to the replica it was read from
+        return DEFAULT_DB_ALIAS if settings.DATABASE_REPLICAS else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,300 @@
+"""
+Horizontal sharding of travel options and everything booked on them.
+
+A travel option is stored on the shard its route hashes to
+(``shard_for_route``), and its stops, fare classes, bookings, passengers,
+waitlist entries and queued emails are stored with it, so a booking never
+spans databases. Price alerts go to their route's shard too, next to the
+options they are matched against. Each shard hands out primary keys from its own block of
+``SHARD_ID_SPAN`` ids (set up by ``init_shards``), so any of those ids names
+its shard: ``Booking.objects.using(shard_for_pk(pk)).get(pk=pk)``.
+
+Users, tokens and everything else stay on ``default``. Shard rows point at
+a stub copy of their user (``add_shard_user``) so foreign keys still hold.
+
+Queries that can't tell their shard from an instance go to the one set by
+``use_shard``; lists that span shards go through ``sharded`` or ``scatter``,
+and batch jobs walk the shards one at a time with ``each_shard``.
+With ``DATABASE_SHARDS`` empty every helper falls through to the normal
+routing, so the same views serve an unsharded deployment.
+"""
+import contextvars
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+SHARD_ID_SPAN = 10 ** 12
+
+# Sharded models and the field naming the row their shard follows
+SHARD_KEYS = {
+    'travel_options.traveloption': 'pk',
+    'travel_options.routestop': 'travel_option_id',
+    'travel_options.fareclass': 'travel_option_id',
+    'travel_options.pricealert': 'pk',
+    'travel_options.pricealertnotification': 'travel_option_id',
+    'bookings.booking': 'travel_option_id',
+    'bookings.waitlistentry': 'travel_option_id',
+    'bookings.passengerdetail': 'booking_id',
+    'bookings.outboxemail': 'booking_id',
+}
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shard_aliases():
+    return list(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARD_KEYS
+
+
+def shard_for_route(source, destination):
+    """Shard holding the travel options from ``source`` to ``destination``"""
+    shards = shard_aliases()
+    if not shards:
+        return None
+    route = f'{source.strip().lower()}|{destination.strip().lower()}'
+    return shards[zlib.crc32(route.encode()) % len(shards)]
+
+
+def shard_for_pk(pk):
+    """Shard that allocated the sharded row with primary key ``pk``, if any"""
+    shards = shard_aliases()
+    try:
+        index = int(pk) // SHARD_ID_SPAN
+    except (TypeError, ValueError):
+        return None
+    return shards[index] if 0 <= index < len(shards) else None
+
+
+def id_range(alias):
+    """First and last primary key handed out by shard ``alias``"""
+    index = shard_aliases().index(alias)
+    return index * SHARD_ID_SPAN + 1, (index + 1) * SHARD_ID_SPAN
+
+
+def shard_for_instance(instance):
+    key = SHARD_KEYS.get(instance._meta.label_lower)
+    if key is None:
+        return None
+    # Not getattr: a key that isn't set yet (as while a related object is
+    # assigned in __init__) would be loaded from the database, through here
+    value = instance.pk if key == 'pk' else instance.__dict__.get(key)
+    if value is not None:
+        return shard_for_pk(value)
+    if key == 'pk' and instance.source and instance.destination:
+        return shard_for_route(instance.source, instance.destination)
+    return instance._state.db if instance._state.db in shard_aliases() else None
+
+
+@contextmanager
+def use_shard(alias):
+    """Send queries on sharded models that carry no instance of their own to ``alias``"""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def each_shard():
+    """
+    Yield every shard alias in turn with ``use_shard`` set to it, for batch
+    jobs over all rows. Yields None once when sharding is off.
+    """
+    for alias in shard_aliases() or [None]:
+        with use_shard(alias):
+            yield alias
+
+
+def add_shard_user(user, alias):
+    """Stub row for ``user`` on shard ``alias``, for rows stored there to reference"""
+    if alias not in shard_aliases():
+        return
+    User = get_user_model()
+    User.objects.using(alias).get_or_create(pk=user.pk, defaults={
+        User.USERNAME_FIELD: f'shard-user-{user.pk}',
+        'password': make_password(None),
+        'is_active': False,
+    })
+
+
+def add_shard_users(user_ids, alias):
+    """``add_shard_user`` for many users at once, for bulk loads"""
+    User = get_user_model()
+    password = make_password(None)
+    User.objects.using(alias).bulk_create([
+        User(pk=pk, **{User.USERNAME_FIELD: f'shard-user-{pk}'}, password=password, is_active=False)
+        for pk in user_ids
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def start_id_sequences(alias):
+    """
+    Move the id sequences of every sharded table on shard ``alias`` to the
+    start of its range, unless they are already past it. Returns the tables moved.
+    """
+    from django.apps import apps
+
+    first, _ = id_range(alias)
+    moved = []
+    if first == 1:
+        return moved
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for label in SHARD_KEYS:
+            table = apps.get_model(label)._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is not None and row[0] >= first - 1:
+                    continue
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [table])
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, first - 1])
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+                (sequence,) = cursor.fetchone()
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] >= first:
+                    continue
+                cursor.execute('SELECT setval(%s, %s, false)', [sequence, first])
+            else:
+                raise NotImplementedError(f'Shard id ranges are not supported on {connection.vendor}')
+            moved.append(table)
+    return moved
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Separate from the async views' pool, whose threads wait on these calls
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SHARD_SCATTER_THREADS', 16), thread_name_prefix='shard'
+            )
+        return _executor
+
+
+def _run(func, alias, args):
+    close_old_connections()
+    try:
+        return func(alias, *args)
+    finally:
+        close_old_connections()
+
+
+def scatter(func, *args):
+    """
+    Call ``func(alias, *args)`` for every shard at once and return the results
+    in shard order. ``alias`` is None when sharding is off.
+    """
+    shards = shard_aliases()
+    in_transaction = any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+    if len(shards) < 2 or in_transaction:
+        # Other threads' connections can't see this one's uncommitted rows
+        return [func(alias, *args) for alias in shards or [None]]
+    executor = _get_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _run, func, alias, args) for alias in shards
+    ]
+    return [future.result() for future in futures]
+
+
+def _fetch(alias, queryset, limit):
+    queryset = queryset.using(alias)
+    return list(queryset if limit is None else queryset[:limit])
+
+
+def _count(alias, queryset):
+    return queryset.using(alias).count()
+
+
+class ShardedQuerySet:
+    """
+    Read-only stand-in for ``queryset`` run on every shard, enough for
+    pagination, serializers and templates. Counts are summed; a slice reads
+    up to its end from each shard and merges the rows in the queryset's
+    ordering, so deep pages cost offset plus page size rows per shard.
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.model = queryset.model
+
+    def count(self):
+        return sum(scatter(_count, self.queryset))
+
+    def __len__(self):
+        return len(self._rows(None))
+
+    def __iter__(self):
+        return iter(self._rows(None))
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return self._rows(k.stop)[k]
+        return self._rows(k + 1)[k]
+
+    def _ordering(self):
+        query = self.queryset.query
+        ordering = query.order_by or (self.model._meta.ordering if query.default_ordering else [])
+        return [field for field in ordering if isinstance(field, str)]
+
+    def _rows(self, limit):
+        rows = [row for rows in scatter(_fetch, self.queryset, limit) for row in rows]
+        # Stable sorts from the last ordering field to the first
+        for field in reversed(self._ordering()):
+            name = field.lstrip('-').replace('__', '.')
+            rows.sort(key=attrgetter(name), reverse=field.startswith('-'))
+        return rows if limit is None else rows[:limit]
+
+
+def sharded(queryset):
+    """``queryset`` over every shard's rows"""
+    shards = shard_aliases()
+    if not shards:
+        return queryset
+    if len(shards) == 1:
+        return queryset.using(shards[0])
+    return ShardedQuerySet(queryset)
+
+
+class ShardRouter:
+    """
+    Routes sharded models by their instance's shard key, then the shard set
+    with ``use_shard``. Other models read by way of a shard row (such as
+    ``booking.user``) go to ``default`` rather than to the stub on the shard.
+    """
+
+    def _db_for(self, model, hints):
+        if not shard_aliases():
+            return None
+        instance = hints.get('instance')
+        shard = shard_for_instance(instance) if instance is not None else None
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS if shard is not None else None
+        return shard or _current_shard.get()
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Shard rows reference users and other rows on default by design
+        shards = shard_aliases()
+        if obj1._state.db in shards or obj2._state.db in shards:
+            return True
+        return None
@@ -0,0 +1,255 @@
+"""
+Prometheus metrics shared by every worker process.
+
+Each process adds to its own file in ``METRICS_DIR``, memory-mapped, so an
+update is a dict lookup and an in-place float write under a lock no other
+process ever takes. ``/metrics`` reads every process's file and sums them;
+files of exited workers keep counting, so counters survive worker restarts.
+Empty ``METRICS_DIR`` when the server (re)starts.
+
+A file is a used-bytes header followed by entries of key length, key
+(``[name, {labels}]`` as JSON), padding to 8 bytes and a float64 value. An
+entry is written before the header is moved past it, so readers never see
+half of one.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+HEADER = struct.Struct('i4x')
+INITIAL_SIZE = 1 << 16
+
+_registry = []
+_store = None
+_store_lock = threading.Lock()
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+def _entries(data, used):
+    """``(key, value offset)`` for each entry in a file's bytes"""
+    position = HEADER.size
+    while position < used:
+        (length,) = struct.unpack_from('i', data, position)
+        key_end = position + 4 + length
+        offset = _padded(key_end)
+        yield data[position + 4:key_end].decode(), offset
+        position = offset + 8
+
+
+class MmapStore:
+    """One process's metric values, in the memory-mapped file at ``path``"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._used = HEADER.unpack_from(self._map, 0)[0] or HEADER.size
+        self._offsets = dict(_entries(self._map, self._used))
+        self._lock = threading.Lock()
+
+    def inc(self, items):
+        """Add each ``(key, amount)`` of ``items``"""
+        with self._lock:
+            for key, amount in items:
+                offset = self._offsets.get(key)
+                if offset is None:
+                    offset = self._add(key)
+                value = struct.unpack_from('d', self._map, offset)[0]
+                struct.pack_into('d', self._map, offset, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode()
+        offset = _padded(self._used + 4 + len(encoded))
+        end = offset + 8
+        while end > len(self._map):
+            self._map.close()
+            self._file.truncate(2 * os.fstat(self._file.fileno()).st_size)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        struct.pack_into(f'i{len(encoded)}s', self._map, self._used, len(encoded), encoded)
+        struct.pack_into('d', self._map, offset, 0.0)
+        HEADER.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = offset
+        return offset
+
+
+def get_store():
+    """This process's store, reopened after a fork or a change of ``METRICS_DIR``"""
+    global _store
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+    with _store_lock:
+        if _store is None or _store.path != path:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _store = MmapStore(path)
+        return _store
+
+
+def read_values(directory):
+    """Every key's value summed over all processes' files in ``directory``"""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            continue
+        used = HEADER.unpack_from(data, 0)[0]
+        for key, offset in _entries(data, used):
+            totals[key] += struct.unpack_from('d', data, offset)[0]
+    return totals
+
+
+@lru_cache(maxsize=4096)
+def _key(name, labels):
+    return json.dumps([name, dict(labels)], sort_keys=True)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        get_store().inc([(_key(self.name, tuple(sorted(labels.items()))), amount)])
+
+    def samples(self, values):
+        for (name, labels), value in values.get(self.name, {}).items():
+            yield name, dict(labels), value
+
+
+class Histogram:
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        # Stored per bucket and made cumulative when exposed, so an
+        # observation is three writes whatever the number of buckets
+        labels = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        le = repr(self.buckets[index]) if index < len(self.buckets) else '+Inf'
+        get_store().inc([
+            (_key(f'{self.name}_bucket', labels + (('le', le),)), 1),
+            (_key(f'{self.name}_sum', labels), value),
+            (_key(f'{self.name}_count', labels), 1),
+        ])
+
+    def samples(self, values):
+        series = defaultdict(lambda: {'buckets': defaultdict(float), 'sum': 0.0, 'count': 0.0})
+        for (name, labels), value in values.get(self.name, {}).items():
+            labels = dict(labels)
+            le = labels.pop('le', None)
+            entry = series[tuple(sorted(labels.items()))]
+            if name.endswith('_bucket'):
+                entry['buckets'][le] += value
+            else:
+                entry[name.rsplit('_', 1)[1]] += value
+
+        for labels, entry in sorted(series.items()):
+            labels = dict(labels)
+            cumulative = 0.0
+            for le in (*map(repr, self.buckets), '+Inf'):
+                cumulative += entry['buckets'].get(le, 0.0)
+                yield f'{self.name}_bucket', {**labels, 'le': le}, cumulative
+            yield f'{self.name}_sum', labels, entry['sum']
+            yield f'{self.name}_count', labels, entry['count']
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value):
+    return repr(int(value)) if value.is_integer() else repr(value)
+
+
+def exposition(directory=None):
+    """All registered metrics in the Prometheus text format"""
+    histograms = {metric.name for metric in _registry if metric.type == 'histogram'}
+    values = defaultdict(dict)
+    for key, value in read_values(directory or settings.METRICS_DIR).items():
+        name, labels = json.loads(key)
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in histograms:
+                family = name[:-len(suffix)]
+        values[family][(name, tuple(sorted(labels.items())))] = value
+
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples(values):
+            label_text = ','.join(f'{label}="{_escape(value)}"' for label, value in labels.items())
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text else f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    ``GET /metrics``; needs ``Authorization: Bearer <METRICS_TOKEN>``. Without
+    a token it is only served with DEBUG on, and is a 404 otherwise.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseNotFound()
+    elif not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """Counts every request and its latency by route, the URL pattern it matched"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        REQUEST_DURATION.observe(duration, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=str(response.status_code))
+        return response
+
+
+REQUESTS = Counter('http_requests_total', 'Requests by route, method and status.', ('route', 'method', 'status'))
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency by route.', ('route', 'method'))
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'SQL query time by database alias.', ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit or miss).', ('cache', 'result'))
+BOOKINGS_CONFIRMED = Counter('bookings_confirmed_total', 'Bookings confirmed, including waitlist promotions.')
+OVERSELL_REJECTIONS = Counter(
+    'booking_oversell_rejections_total', 'Booking confirmations refused because the seats were no longer free.'
+)
@@ -0,0 +1,139 @@
+"""
+On-demand sampling profiler for single requests.
+
+With ``PROFILING_ENABLED`` set, a staff user (session or API token) adds
+``?profile=1`` or an ``X-Profile: 1`` header to a request. While it runs, a
+background thread records the stacks of every thread in the process every
+``PROFILING_INTERVAL_MS``, and the samples are written to ``PROFILE_DIR`` as
+folded stacks (``thread;outer;...;inner count`` lines), the input of
+flamegraph.pl, speedscope and ``manage.py aggregate_profiles``. The response
+names the file in an ``X-Profile`` header; ``profile=folded`` returns the
+folded stacks instead of the response body.
+
+The requesting thread is sampled throughout, waits included. Other threads,
+such as the async views' database pool, are sampled while they are busy; on
+an ASGI server they may be working for other requests too. One request per
+process is profiled at a time. With ``PROFILING_ENABLED`` off the middleware
+removes itself, so requests pay nothing.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from rest_framework import exceptions
+
+_busy = threading.Lock()
+
+# Innermost frames of threads waiting for work
+_IDLE = {('thread.py', '_worker'), ('selectors.py', 'select'), ('threading.py', 'wait')}
+
+
+def _label(code):
+    filename = code.co_filename
+    if filename.startswith(str(settings.BASE_DIR)):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return labels[::-1]
+
+
+class Sampler:
+    """Folded stack counts of ``thread_id`` and of other busy threads, taken on a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if thread_id != self.thread_id and (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                name = 'request' if thread_id == self.thread_id else names.get(thread_id, str(thread_id))
+                self.stacks[';'.join([name, *_stack(frame)])] += 1
+            if self._stop.wait(self.interval):
+                return
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _profile_mode(request):
+    return request.GET.get('profile') or request.headers.get('X-Profile')
+
+
+def _is_staff(request):
+    from accounts.authentication import CachedTokenAuthentication
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = CachedTokenAuthentication().authenticate(request) or (None, None)
+        except exceptions.AuthenticationFailed:
+            return False
+    return user is not None and user.is_staff
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = _profile_mode(request)
+        if not mode or not _is_staff(request) or not _busy.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            sampler = Sampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+        finally:
+            _busy.release()
+
+        folded = sampler.folded()
+        if mode == 'folded':
+            return HttpResponse(folded, content_type='text/plain; charset=utf-8')
+
+        match = request.resolver_match
+        view = getattr(match.func, 'view_class', match.func).__name__ if match else 'unmatched'
+        name = f'{int(time.time() * 1000)}-{os.getpid()}-{view}.folded'
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(settings.PROFILE_DIR, name), 'w') as f:
+            f.write(folded)
+        response['X-Profile'] = name
+        return response
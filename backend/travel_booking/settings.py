@@ -2,10 +2,12 @@
 Django settings for travel_booking project.
 """
 
+from datetime import timedelta
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import dj_database_url
 import os
+import tempfile
 
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,12 +42,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # MUST be at the top
+    "travel_booking.metrics.MetricsMiddleware",
+    "travel_booking.slow_queries.SlowQueryMiddleware",
+    "travel_booking.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "travel_booking.profiling.ProfilingMiddleware",
+    "travel_booking.db.routers.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -54,7 +61,8 @@ ROOT_URLCONF = "travel_booking.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that reports rendering time (travel_booking/timing.py)
+        "BACKEND": "travel_booking.timing.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -69,15 +77,57 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "travel_booking.wsgi.application"
+ASGI_APPLICATION = "travel_booking.asgi.application"
 
 # Database configuration
-DATABASES = {
-    "default": dj_database_url.config(
-        default=config("DATABASE_URL"),
-        conn_max_age=600,
-        ssl_require=True
+# With DB_POOL each process shares a small pool of connections (see
+# travel_booking/db/postgresql_pool) instead of every worker thread holding one.
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+
+
+def database_config(url):
+    database = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DB_POOL else 600,
+        ssl_require=config("DB_SSL_REQUIRE", default=True, cast=bool),
     )
-}
+    if DB_POOL:
+        database["ENGINE"] = "travel_booking.db.postgresql_pool"
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": config("DB_POOL_MIN_SIZE", cast=int, default=2),
+            "max_size": config("DB_POOL_MAX_SIZE", cast=int, default=10),
+            "timeout": config("DB_POOL_TIMEOUT", cast=float, default=10),  # Seconds to wait for a connection
+            "max_idle": config("DB_POOL_MAX_IDLE", cast=float, default=300),
+            "max_lifetime": config("DB_POOL_MAX_LIFETIME", cast=float, default=3600),
+        }
+    return database
+
+
+DATABASES = {"default": database_config(config("DATABASE_URL"))}
+
+# Read replicas for catalog and booking history reads (travel_booking/db/routers.py)
+DATABASE_REPLICAS = []
+for number, url in enumerate(config("DATABASE_REPLICA_URLS", default="", cast=Csv()), start=1):
+    DATABASES[f"replica_{number}"] = {**database_config(url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica_{number}")
+# Shards for travel options and their bookings (travel_booking/db/sharding.py);
+# append new shards at the end, as each shard's position fixes its id range
+DATABASE_SHARDS = []
+for number, url in enumerate(config("DATABASE_SHARD_URLS", default="", cast=Csv())):
+    DATABASES[f"shard_{number}"] = database_config(url)
+    DATABASE_SHARDS.append(f"shard_{number}")
+DATABASE_ROUTERS = [
+    "travel_booking.db.sharding.ShardRouter",
+    "travel_booking.db.routers.ReplicaRouter",
+]
+# Seconds a client reads from the primary after changing a booking, to cover replication lag
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", cast=int, default=10)
+REPLICA_STICKY_CACHE = "shared"
+
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -125,15 +175,93 @@ CSRF_TRUSTED_ORIGINS = [
 # === REST Framework ===
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # Proxies in front of the app that append to X-Forwarded-For (1: the platform router). Throttles
+    # identify clients by the address the last proxy saw; set 0 when clients connect directly.
+    "NUM_PROXIES": config("NUM_PROXIES", cast=int, default=1),
+    # Used by accounts.throttling; state is shared by all workers through the database
+    "DEFAULT_THROTTLE_RATES": {
+        "search_ip": config("THROTTLE_SEARCH_IP", default="60/min"),
+        "search_user": config("THROTTLE_SEARCH_USER", default="60/min"),
+        "login_ip": config("THROTTLE_LOGIN_IP", default="20/min"),
+        "login_email": config("THROTTLE_LOGIN_EMAIL", default="5/min"),
+    },
 }
 
+# Share of requests timed for Server-Timing headers and travel_booking.timing logs
+SERVER_TIMING_SAMPLE_RATE = config("SERVER_TIMING_SAMPLE_RATE", cast=float, default=0.01)
+
+# Per-process metric files summed by /metrics; empty it when the server (re)starts
+METRICS_DIR = config("METRICS_DIR", default=os.path.join(tempfile.gettempdir(), "travel_booking_metrics"))
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; left empty, it is
+# only served with DEBUG on
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Queries at least this slow are logged with their EXPLAIN to SLOW_QUERY_LOG; 0 turns the log off
+SLOW_QUERY_THRESHOLD_MS = config("SLOW_QUERY_THRESHOLD_MS", cast=float, default=200)
+# Seconds between log lines (and EXPLAINs) for the same query; repeats in between are only counted
+SLOW_QUERY_LOG_INTERVAL = config("SLOW_QUERY_LOG_INTERVAL", cast=float, default=60)
+SLOW_QUERY_LOG = config("SLOW_QUERY_LOG", default=os.path.join(tempfile.gettempdir(), "travel_booking_slow_queries.log"))
+
+# Staff can profile a request with ?profile=1 or an X-Profile: 1 header; off, it costs nothing
+PROFILING_ENABLED = config("PROFILING_ENABLED", cast=bool, default=False)
+PROFILING_INTERVAL_MS = config("PROFILING_INTERVAL_MS", cast=float, default=1)
+PROFILE_DIR = config("PROFILE_DIR", default=os.path.join(tempfile.gettempdir(), "travel_booking_profiles"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "message"},
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        # One JSON line per sampled request
+        "travel_booking.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        # One JSON line per slow query, read by manage.py slow_query_report
+        "travel_booking.slow_queries": {"handlers": ["slow_queries"], "level": "WARNING", "propagate": False},
+    },
+}
+
+# Threads (each with its own database connection) running ORM work for async views
+ASYNC_DB_THREADS = config("ASYNC_DB_THREADS", cast=int, default=8)
+# Threads running cross-shard list and search queries, one per shard per call
+SHARD_SCATTER_THREADS = config("SHARD_SCATTER_THREADS", cast=int, default=16)
+
+# === Caches ===
+# "shared" is seen by every worker process on the host (token revocation)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config("SHARED_CACHE_DIR", default=os.path.join(tempfile.gettempdir(), "travel_booking_cache")),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+# === API tokens ===
+TOKEN_EXPIRY = timedelta(days=config("TOKEN_EXPIRY_DAYS", cast=int, default=7))
+TOKEN_ROTATE_AFTER = timedelta(days=config("TOKEN_ROTATE_AFTER_DAYS", cast=int, default=1))  # Logins past this get a new key
+TOKEN_CACHE_SIZE = 10000  # Token lookups cached per worker
+TOKEN_CACHE_TTL = 60  # Seconds
+TOKEN_REVOCATION_CACHE = "shared"
+
 # Login URLs
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
@@ -0,0 +1,147 @@
+"""
+Slow-query log.
+
+Every query taking at least ``SLOW_QUERY_THRESHOLD_MS`` (timed by
+``travel_booking.timing``) is written as a JSON line to the
+``travel_booking.slow_queries`` logger, which settings send to the rotating
+file ``SLOW_QUERY_LOG``. A line carries the SQL with its literals replaced
+by ``?`` (so the same query with other values groups together), the view
+and code line that ran it, and the database's ``EXPLAIN`` of it.
+
+Each normalized query is logged at most once per
+``SLOW_QUERY_LOG_INTERVAL`` seconds per process, with the EXPLAIN taken
+again only then; the line's ``count`` and ``total_ms`` include the
+occurrences held back since the previous one, so totals stay right.
+``manage.py slow_query_report`` ranks the logged queries by total time.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('travel_booking.slow_queries')
+
+_request = ContextVar('slow_query_request', default=None)
+_explaining = ContextVar('slow_query_explaining', default=False)
+_pending = {}
+_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+# Frames in these directories aren't reported as the caller
+_LIBRARY_DIRS = tuple(
+    os.path.dirname(module.__file__) + os.sep
+    for module in (sys.modules['django'], sys.modules['rest_framework'], sys.modules['asgiref'])
+) + (os.path.dirname(os.__file__) + os.sep,)
+_OWN_FILES = (__file__, os.path.join(os.path.dirname(__file__), 'timing.py'))
+
+
+def normalize(sql):
+    """``sql`` with literals and parameters as ``?`` and ``IN`` lists as ``(...)``"""
+    sql = _SAVEPOINT.sub('"s?_x?"', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _view_name(request):
+    match = request.resolver_match if request is not None else None
+    if match is None:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def _caller():
+    """``file:line in function`` of the innermost project code on the stack"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_LIBRARY_DIRS) and filename not in _OWN_FILES and 'site-packages' not in filename:
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """The database's plan for ``sql`` as a list of lines, or None if it can't give one"""
+    token = _explaining.set(True)
+    try:
+        # A savepoint, so a failed EXPLAIN doesn't break the caller's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def record(sql, params, many, connection, seconds):
+    """Count a slow query, logging it if its normalized form is due"""
+    if _explaining.get():
+        return
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    now = time.monotonic()
+    with _lock:
+        state = _pending.setdefault(key, {'logged_at': None, 'count': 0, 'total': 0.0, 'max': 0.0})
+        state['count'] += 1
+        state['total'] += seconds
+        state['max'] = max(state['max'], seconds)
+        if state['logged_at'] is not None and now - state['logged_at'] < settings.SLOW_QUERY_LOG_INTERVAL:
+            return
+        count, total, longest = state['count'], state['total'], state['max']
+        state.update(logged_at=now, count=0, total=0.0, max=0.0)
+
+    is_select = sql.split(None, 1)[0].upper() in ('SELECT', 'WITH')
+    request = _request.get()
+    logger.warning(json.dumps({
+        'time': timezone.now().isoformat(),
+        'fingerprint': key,
+        'sql': normalized,
+        'database': connection.alias,
+        'view': _view_name(request),
+        'path': request.path if request is not None else None,
+        'caller': _caller(),
+        'duration_ms': round(seconds * 1000, 2),
+        'count': count,
+        'total_ms': round(total * 1000, 2),
+        'max_ms': round(longest * 1000, 2),
+        'plan': explain(connection, sql, params) if is_select and not many else None,
+    }))
+
+
+class SlowQueryMiddleware:
+    """Makes the request available to slow-query log lines, for their view and path"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,200 @@
+"""
+Per-request timing: database, serialization and rendering.
+
+``ServerTimingMiddleware`` samples ``SERVER_TIMING_SAMPLE_RATE`` of requests.
+For those it adds up
+
+- ``db``: time in SQL on every connection the request used, including the
+  async views' pool threads and other shards, with the query count;
+- ``serialize``: ``to_representation`` of serializers using
+  ``TimedSerializerMixin`` (lazy queries they trigger count here too);
+- ``render``: DRF response rendering and Django template rendering;
+
+and reports them in a ``Server-Timing`` header and one JSON log line on the
+``travel_booking.timing`` logger. Requests that aren't sampled only pay for
+a context variable lookup per serialized object; every query, sampled or
+not, is also counted in the ``db_query_duration_seconds`` metric and checked
+against the slow-query threshold (``travel_booking.slow_queries``).
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+from travel_booking import metrics, slow_queries
+
+logger = logging.getLogger('travel_booking.timing')
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Seconds per phase of one request; shared by the threads working on it"""
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._depth = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.durations['db'] = self.durations.get('db', 0.0) + seconds
+            self.queries += 1
+
+    def enter(self, name):
+        """Whether this starts the outermost ``name`` span, so nested ones aren't counted twice"""
+        key = (threading.get_ident(), name)
+        with self._lock:
+            self._depth[key] = self._depth.get(key, 0) + 1
+            return self._depth[key] == 1
+
+    def leave(self, name):
+        key = (threading.get_ident(), name)
+        with self._lock:
+            self._depth[key] -= 1
+
+    def as_dict(self, total):
+        result = {f'{name}_ms': round(seconds * 1000, 2) for name, seconds in self.durations.items()}
+        result['db_queries'] = self.queries
+        result['total_ms'] = round(total * 1000, 2)
+        return result
+
+    def header(self, total):
+        metrics = [
+            f'db;dur={self.durations.get("db", 0.0) * 1000:.2f};desc="{self.queries} queries"',
+            *(
+                f'{name};dur={seconds * 1000:.2f}'
+                for name, seconds in self.durations.items() if name != 'db'
+            ),
+            f'total;dur={total * 1000:.2f}',
+        ]
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timed(name):
+    """Count the enclosed block as ``name`` in the sampled request in progress"""
+    timings = _timings.get()
+    outermost = timings is not None and timings.enter(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            if outermost:
+                timings.add(name, time.perf_counter() - start)
+            timings.leave(name)
+
+
+def _add_query(seconds, connection):
+    metrics.DB_QUERY_DURATION.observe(seconds, alias=connection.alias)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add_query(seconds)
+
+
+def _record_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    except Exception:
+        _add_query(time.perf_counter() - start, context['connection'])
+        raise
+    seconds = time.perf_counter() - start
+    _add_query(seconds, context['connection'])
+    # Only queries that succeeded, so EXPLAIN never runs in a failed transaction
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold and seconds * 1000 >= threshold:
+        slow_queries.record(sql, params, many, context['connection'], seconds)
+    return result
+
+
+def install_query_timer(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_timer, dispatch_uid='travel_booking.timing')
+
+
+class TimedSerializerMixin:
+    """Counts this serializer's ``to_representation`` as ``serialize``"""
+
+    def to_representation(self, instance):
+        if _timings.get() is None:
+            return super().to_representation(instance)
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('render'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates count their rendering as ``render``"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = timings.header(total)
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': match.route if match else None,
+            'status': response.status_code,
+            **timings.as_dict(total),
+        }))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, by the handler
+        if _timings.get() is not None:
+            render = response.render
+
+            def timed_render():
+                with timed('render'):
+                    return render()
+
+            response.render = timed_render
+        return response
@@ -6,8 +6,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from travel_booking.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),
     path('api/accounts/', include('accounts.urls')),
     path('api/travel-options/', include('travel_options.urls')),
     path('api/bookings/', include('bookings.urls')),
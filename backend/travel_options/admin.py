@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import TravelOption
+from .models import TravelOption, RouteStop, FareClass, ExchangeRate, PriceAlert, PriceAlertNotification
+
+class RouteStopInline(admin.TabularInline):
+    model = RouteStop
+    extra = 0
+    ordering = ('sequence',)
+
+class FareClassInline(admin.TabularInline):
+    model = FareClass
+    extra = 0
 
 @admin.register(TravelOption)
 class TravelOptionAdmin(admin.ModelAdmin):
@@ -9,6 +18,7 @@ class TravelOptionAdmin(admin.ModelAdmin):
     search_fields = ('travel_id', 'source', 'destination', 'operator_name')
     list_editable = ('is_active', 'available_seats')
     readonly_fields = ('created_at', 'updated_at')
+    inlines = [RouteStopInline, FareClassInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -18,7 +28,7 @@ class TravelOptionAdmin(admin.ModelAdmin):
             'fields': ('source', 'destination', 'departure_datetime', 'arrival_datetime')
         }),
         ('Pricing & Capacity', {
-            'fields': ('price', 'total_seats', 'available_seats')
+            'fields': ('price', 'base_price', 'currency', 'total_seats', 'available_seats')
         }),
         ('Additional Information', {
             'fields': ('description', 'amenities', 'is_active')
@@ -32,4 +42,23 @@ class TravelOptionAdmin(admin.ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         if obj:  # editing an existing object
             return self.readonly_fields + ('travel_id',)
-        return self.readonly_fields
\ No newline at end of file
+        return self.readonly_fields
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'rate', 'updated_at')
+    search_fields = ('currency',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(PriceAlert)
+class PriceAlertAdmin(admin.ModelAdmin):
+    list_display = ('user', 'source', 'destination', 'type', 'departure_from', 'departure_to', 'max_price', 'currency', 'is_active')
+    list_filter = ('is_active', 'type', 'currency')
+    search_fields = ('user__username', 'source', 'destination')
+    raw_id_fields = ('user',)
+
+@admin.register(PriceAlertNotification)
+class PriceAlertNotificationAdmin(admin.ModelAdmin):
+    list_display = ('alert', 'travel_option', 'price', 'currency', 'created_at', 'sent_at')
+    list_filter = ('sent_at',)
+    raw_id_fields = ('alert', 'travel_option')
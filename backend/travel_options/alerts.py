@@ -0,0 +1,119 @@
+"""
+Batch matching of changed travel options against price alerts.
+
+Changed options are processed in chunks with a single join per chunk. The
+join is driven by the chunk's option ids and probes ``price_alert`` through
+its (source, destination, is_active, departure_from) index, so only alerts
+on the changed routes are ever read. Prices are compared in the base
+currency using the cached rate table. Matches are queued as
+PriceAlertNotification rows, one per alert and option, and re-queued only
+when the price drops below the last one notified. With sharding each shard
+holds the alerts and options of its routes, so options are matched on
+their own shard.
+"""
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from travel_booking.db.sharding import shard_for_pk, use_shard
+
+from .currency import CENT, get_rate_table
+from .models import PriceAlert, PriceAlertNotification, TravelOption
+
+
+def _to_base_case(column, rates):
+    """SQL CASE turning an amount's currency column into a factor to the base currency"""
+    whens = ' '.join('WHEN %s THEN %s' for _ in rates)
+    params = []
+    for currency, rate in rates.items():
+        params.extend([currency, 1 / rate])
+    return f'CASE {column} {whens} END', params
+
+
+class PriceAlertMatcher:
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.options = 0
+        self.matched = 0
+        self.queued = 0
+
+    def match(self, option_ids):
+        by_shard = {}
+        for pk in option_ids:
+            by_shard.setdefault(shard_for_pk(pk), []).append(pk)
+        for alias, shard_ids in by_shard.items():
+            with use_shard(alias):
+                for start in range(0, len(shard_ids), self.chunk_size):
+                    self.match_chunk(shard_ids[start:start + self.chunk_size])
+        return self
+
+    def match_chunk(self, option_ids):
+        self.options += len(option_ids)
+        matches = self.find_matches(option_ids)
+        self.matched += len(matches)
+        if matches:
+            self.queue(matches)
+
+    def find_matches(self, option_ids):
+        """``(alert_id, option_id, price, currency)`` for alerts the options now satisfy"""
+        connection = connections[router.db_for_read(PriceAlert)]
+        quote = connection.ops.quote_name
+        rates = get_rate_table().rates
+        option_factor, option_params = _to_base_case('o.currency', rates)
+        alert_factor, alert_params = _to_base_case('a.currency', rates)
+
+        sql = f"""
+            SELECT a.id, o.id, o.price, o.currency
+            FROM {quote(TravelOption._meta.db_table)} o
+            JOIN {quote(PriceAlert._meta.db_table)} a
+              ON a.source = LOWER(o.source)
+             AND a.destination = LOWER(o.destination)
+             AND a.is_active = %s
+             AND a.departure_from <= o.departure_datetime
+             AND a.departure_to >= o.departure_datetime
+            WHERE o.id IN ({', '.join(['%s'] * len(option_ids))})
+              AND o.is_active = %s
+              AND o.departure_datetime > %s
+              AND (a.type = '' OR a.type = o.type)
+              AND o.price * {option_factor} <= a.max_price * {alert_factor}
+        """
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        params = [True, *option_ids, True, now, *option_params, *alert_params]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [
+                (alert_id, option_id, Decimal(str(price)).quantize(CENT), currency)
+                for alert_id, option_id, price, currency in cursor.fetchall()
+            ]
+
+    def queue(self, matches):
+        option_ids = {option_id for _, option_id, _, _ in matches}
+        existing = {
+            (notification.alert_id, notification.travel_option_id): notification
+            for notification in PriceAlertNotification.objects.filter(
+                travel_option_id__in=option_ids
+            ).only('id', 'alert_id', 'travel_option_id', 'price', 'currency')
+        }
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for alert_id, option_id, price, currency in matches:
+            notification = existing.get((alert_id, option_id))
+            if notification is None:
+                to_create.append(PriceAlertNotification(
+                    alert_id=alert_id, travel_option_id=option_id, price=price, currency=currency
+                ))
+            elif price < notification.price or currency != notification.currency:
+                notification.price = price
+                notification.currency = currency
+                notification.sent_at = None
+                notification.updated_at = now
+                to_update.append(notification)
+
+        with transaction.atomic(using=router.db_for_write(PriceAlertNotification)):
+            PriceAlertNotification.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+            PriceAlertNotification.objects.bulk_update(
+                to_update, ['price', 'currency', 'sent_at', 'updated_at'], batch_size=500
+            )
+        self.queued += len(to_create) + len(to_update)
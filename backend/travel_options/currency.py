@@ -0,0 +1,124 @@
+"""
+Currency conversion from the locally stored ExchangeRate table.
+
+The table is loaded once per process and reused until its version (latest
+``updated_at`` and row count) changes; the version is checked at most every
+``RATE_CHECK_INTERVAL`` seconds, and saving a rate in this process drops the
+cache immediately. Converted amounts are rounded half-up to the cent, so a
+displayed unit price times the seat count is exactly what a booking charges.
+"""
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+
+from travel_booking import metrics
+
+BASE_CURRENCY = 'USD'
+RATE_CHECK_INTERVAL = 30
+CENT = Decimal('0.01')
+
+_lock = threading.Lock()
+_cache = {'table': None, 'checked_at': 0.0}
+
+
+class RateTable:
+    def __init__(self, rates, version):
+        self.rates = {BASE_CURRENCY: Decimal(1), **rates}
+        self.version = version
+
+    def __contains__(self, currency):
+        return currency in self.rates
+
+    def factor(self, from_currency, to_currency):
+        try:
+            return self.rates[to_currency] / self.rates[from_currency]
+        except KeyError as e:
+            raise ValueError(f"No exchange rate for {e.args[0]}")
+
+    def converter(self, target):
+        return Converter(self, target)
+
+
+class Converter:
+    """
+    Converts amounts into ``target`` for one response. Factors are looked up
+    once per source currency and results are memoised, so a page of options
+    sharing a handful of prices costs a handful of Decimal operations.
+    """
+
+    def __init__(self, table, target):
+        if target not in table:
+            raise ValueError(f"No exchange rate for {target}")
+        self.table = table
+        self.target = target
+        self._factors = {}
+        self._converted = {}
+
+    def convert(self, amount, currency):
+        if amount is None or currency == self.target:
+            return amount
+        key = (amount, currency)
+        if key not in self._converted:
+            if currency not in self._factors:
+                self._factors[currency] = self.table.factor(currency, self.target)
+            self._converted[key] = (Decimal(amount) * self._factors[currency]).quantize(
+                CENT, rounding=ROUND_HALF_UP
+            )
+        return self._converted[key]
+
+
+def _current_version():
+    from .models import ExchangeRate
+
+    stats = ExchangeRate.objects.aggregate(updated=Max('updated_at'), count=Count('id'))
+    return stats['updated'], stats['count']
+
+
+def get_rate_table():
+    """The cached rate table, reloaded when the stored rates have changed"""
+    from .models import ExchangeRate
+
+    with _lock:
+        table = _cache['table']
+        now = time.monotonic()
+        if table is not None and now - _cache['checked_at'] < RATE_CHECK_INTERVAL:
+            metrics.CACHE_REQUESTS.inc(cache='exchange_rates', result='hit')
+            return table
+
+        version = _current_version()
+        if table is None or table.version != version:
+            metrics.CACHE_REQUESTS.inc(cache='exchange_rates', result='miss')
+            table = RateTable(dict(ExchangeRate.objects.values_list('currency', 'rate')), version)
+            _cache['table'] = table
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='exchange_rates', result='hit')
+        _cache['checked_at'] = now
+        return table
+
+
+def invalidate_rates():
+    with _lock:
+        _cache['table'] = None
+
+
+class CurrencyMixin:
+    """Puts the converter for ``?currency=`` into a generic view's serializer context"""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['converter'] = get_converter(self.request)
+        return context
+
+
+def get_converter(request):
+    """Converter for the ``currency`` query parameter, or None when absent"""
+    currency = request.query_params.get('currency')
+    if not currency:
+        return None
+    try:
+        return get_rate_table().converter(currency.strip().upper())
+    except ValueError as e:
+        raise ValidationError({'currency': [str(e)]})
@@ -0,0 +1,55 @@
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge the request profiles in PROFILE_DIR into one folded-stack file "
+        "for a flame graph, and list the functions with the most samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILE_DIR, help='Directory of .folded profiles')
+        parser.add_argument('--view', help='Only profiles of views whose name contains this')
+        parser.add_argument('--output', help='Write the merged folded stacks to this file')
+        parser.add_argument('--top', type=int, default=15, help='Functions to list')
+
+    def handle(self, *args, **options):
+        files = sorted(Path(options['dir']).glob('*.folded'))
+        if options['view']:
+            # Profiles are named <milliseconds>-<pid>-<view>.folded
+            files = [file for file in files if options['view'] in file.stem.split('-', 2)[-1]]
+        if not files:
+            raise CommandError(f"No profiles in {options['dir']}")
+
+        stacks = Counter()
+        for file in files:
+            with open(file) as lines:
+                for line in lines:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        stacks[stack] += int(count)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+        # Own samples: the function was running; total: it was anywhere on the stack
+        own, total = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        samples = sum(stacks.values())
+
+        self.stdout.write(f"{samples} sample(s) from {len(files)} profile(s)")
+        self.stdout.write(f"{'own':>7} {'total':>7}  function")
+        for frame, count in own.most_common(options['top']):
+            self.stdout.write(f"{count / samples:>7.1%} {total[frame] / samples:>7.1%}  {frame}")
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(stacks)} stack(s) to {options['output']}"))
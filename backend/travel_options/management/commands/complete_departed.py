@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings.models import Booking
+from travel_options.models import TravelOption
+from travel_booking.db.sharding import each_shard, sharded
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark CONFIRMED bookings on arrived trips as COMPLETED and deactivate "
+        "departed travel options. Rows are updated in small chunks, each in its "
+        "own short transaction, so it can run alongside live traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would change')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        # Both walks are driven by indexes whose leading column is the state
+        # being changed, so updated rows drop out and are never revisited.
+        bookings = Booking.objects.filter(
+            status='CONFIRMED', travel_option__arrival_datetime__lte=now
+        )
+        travel_options = TravelOption.objects.filter(
+            is_active=True, departure_datetime__lte=now
+        ).order_by('departure_datetime')
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would complete {sharded(bookings).count()} booking(s) and deactivate "
+                f"{sharded(travel_options).count()} travel option(s)"
+            )
+            return
+
+        self.run_in_chunks(
+            'Completed bookings',
+            bookings.order_by('pk'),
+            # Re-check the status so a concurrent cancellation is never overwritten
+            lambda ids: Booking.objects.filter(pk__in=ids, status='CONFIRMED').update(
+                status='COMPLETED', updated_at=timezone.now()
+            ),
+            options,
+        )
+        self.run_in_chunks(
+            'Deactivated travel options',
+            travel_options,
+            lambda ids: TravelOption.objects.filter(pk__in=ids, is_active=True).update(
+                is_active=False, updated_at=timezone.now()
+            ),
+            options,
+        )
+
+    def run_in_chunks(self, label, queryset, update, options):
+        started = time.perf_counter()
+        total = 0
+        for _ in each_shard():
+            while True:
+                ids = list(queryset.values_list('pk', flat=True)[:options['chunk_size']])
+                if not ids:
+                    break
+                total += update(ids)
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {total} row(s) in {elapsed:.2f}s ({rate:.0f} rows/sec)"
+        ))
@@ -0,0 +1,62 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from travel_options.alerts import PriceAlertMatcher
+from travel_options.timetable import TimetableImporter, TimetableSync, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an operator timetable (CSV or JSON Lines) into travel options, "
+        "upserting by travel_id. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Timetable file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--show-errors', type=int, default=50, help='Row errors to print')
+        parser.add_argument(
+            '--sync', action='store_true',
+            help="Treat the file as a full snapshot: only write changed rows and deactivate "
+                 "future options of the feed's operators that are missing from it",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        started = time.perf_counter()
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        with stream:
+            importer = self.get_importer(options).run(read_rows(stream, fmt))
+
+        for error in importer.errors[:options['show_errors']]:
+            self.stderr.write(str(error))
+        if len(importer.errors) > options['show_errors']:
+            self.stderr.write(f"... and {len(importer.errors) - options['show_errors']} more")
+
+        elapsed = time.perf_counter() - started
+        processed = importer.created + importer.updated + len(importer.errors)
+        summary = f"{importer.created} created, {importer.updated} updated, "
+        if options['sync']:
+            processed += importer.unchanged
+            summary += f"{importer.unchanged} unchanged, {importer.deactivated} deactivated, "
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary}{len(importer.errors)} rejected "
+            f"in {elapsed:.2f}s ({processed / elapsed if elapsed else 0:.0f} rows/sec)"
+        ))
+
+        if importer.price_drops:
+            matcher = PriceAlertMatcher().match(importer.price_drops)
+            self.stdout.write(f"Queued {matcher.queued} price alert notification(s)")
+
+    def get_importer(self, options):
+        importer_class = TimetableSync if options['sync'] else TimetableImporter
+        return importer_class(chunk_size=options['chunk_size'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from travel_booking.db.sharding import id_range, shard_aliases, start_id_sequences
+
+
+class Command(BaseCommand):
+    help = (
+        "Start each shard's id sequences in its own range, so the id of a travel "
+        "option or booking names its shard. Run once per shard after migrating "
+        "it (migrate --database shard_N); running it again changes nothing."
+    )
+
+    def handle(self, *args, **options):
+        shards = shard_aliases()
+        if not shards:
+            raise CommandError("No shards configured; set DATABASE_SHARD_URLS")
+
+        for alias in shards:
+            first, last = id_range(alias)
+            moved = start_id_sequences(alias)
+            self.stdout.write(f"{alias}: ids {first}-{last}, {len(moved)} sequence(s) moved")
+        self.stdout.write(self.style.SUCCESS(f"Initialised {len(shards)} shard(s)"))
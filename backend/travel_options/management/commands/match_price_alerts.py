@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from travel_options.alerts import PriceAlertMatcher
+from travel_options.models import TravelOption
+from travel_booking.db.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Match recently changed travel options against price alerts and queue "
+        "notifications. reprice_travel_options and import_timetable already do "
+        "this for the prices they change; run it after edits made elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since-minutes', type=int, default=60, help='Match options updated in this window')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        option_ids = []
+        for _ in each_shard():
+            option_ids.extend(TravelOption.objects.filter(
+                is_active=True,
+                departure_datetime__gt=now,
+                updated_at__gte=now - timedelta(minutes=options['since_minutes']),
+            ).values_list('pk', flat=True))
+
+        started = time.perf_counter()
+        matcher = PriceAlertMatcher(chunk_size=options['chunk_size']).match(option_ids)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Matched {matcher.options} travel option(s): {matcher.matched} alert match(es), "
+            f"{matcher.queued} notification(s) queued in {elapsed:.2f}s"
+        ))
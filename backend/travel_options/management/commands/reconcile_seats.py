@@ -0,0 +1,198 @@
+import time
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from bookings.models import Booking
+from travel_options.models import FareClass, TravelOption
+from travel_options.segments import SegmentTree
+from travel_booking.db.sharding import each_shard, use_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute available seats from seat-holding bookings, report travel "
+        "options and fare classes whose stored counts have drifted, and "
+        "optionally repair them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-date', help='Only options departing on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--to-date', help='Only options departing on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--repair', action='store_true', help='Write the expected counts back')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--show', type=int, default=20, help='Mismatches to list in the report')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        travel_options = TravelOption.objects.all()
+        if options['from_date']:
+            travel_options = travel_options.filter(departure_datetime__date__gte=options['from_date'])
+        if options['to_date']:
+            travel_options = travel_options.filter(departure_datetime__date__lte=options['to_date'])
+
+        # Checked shard by shard; ids are unique across shards, so the
+        # results merge into one report
+        checked = []
+        option_mismatches, segment_states, class_mismatches, unclassed = {}, {}, {}, {}
+        for alias in each_shard():
+            shard_options, shard_states = self.check_options(travel_options)
+            shard_classes = self.check_fare_classes(travel_options)
+            checked.append((alias, shard_options, shard_states, shard_classes))
+            option_mismatches.update(shard_options)
+            segment_states.update(shard_states)
+            class_mismatches.update(shard_classes)
+            unclassed.update(self.check_unclassed(travel_options))
+
+        oversold = sum(1 for _, _, expected in option_mismatches.values() if expected < 0)
+        self.stdout.write(
+            f"Checked in {time.perf_counter() - started:.2f}s: "
+            f"{len(option_mismatches)} travel option(s) and {len(class_mismatches)} fare class(es) drifted, "
+            f"{oversold} oversold"
+        )
+        for pk, (travel_id, stored, expected) in list(option_mismatches.items())[:options['show']]:
+            line = f"  {travel_id}: stored {stored}, expected {expected}"
+            if pk in segment_states:
+                stored_state, expected_state = segment_states[pk]
+                line += (
+                    f" (segments stored {SegmentTree.from_state(stored_state).values()}, "
+                    f"expected {SegmentTree.from_state(expected_state).values()})"
+                )
+            self.stdout.write(line)
+
+        # Not repaired: which bucket those seats belong to is a judgement call
+        if unclassed:
+            self.stdout.write(f"{len(unclassed)} travel option(s) hold seats outside their fare classes")
+            for travel_id, seats in list(unclassed.values())[:options['show']]:
+                self.stdout.write(f"  {travel_id}: {seats} seat(s) booked without a fare class")
+
+        if not options['repair']:
+            return
+
+        repaired = 0
+        for alias, shard_options, shard_states, shard_classes in checked:
+            with use_shard(alias):
+                repaired += self.repair(TravelOption, shard_options, options['batch_size'], shard_states)
+                repaired += self.repair(FareClass, shard_classes, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {repaired} row(s) in {time.perf_counter() - started:.2f}s"
+        ))
+
+    def check_options(self, travel_options):
+        """
+        Return ``{pk: (travel_id, stored, expected)}`` for drifted options,
+        and ``{pk: (stored state, expected state)}`` for those with segments
+        """
+        holding = Q(bookings__status__in=Booking.SEAT_HOLDING_STATUSES)
+        rows = travel_options.annotate(
+            booked=Coalesce(Sum('bookings__number_of_seats', filter=holding), 0),
+        ).order_by().values_list('pk', 'travel_id', 'total_seats', 'available_seats', 'booked', 'segment_seats')
+
+        mismatches = {}
+        segmented = {}
+        for pk, travel_id, total_seats, available_seats, booked, segment_seats in rows.iterator(chunk_size=5000):
+            if segment_seats:
+                segmented[pk] = (travel_id, total_seats, available_seats, segment_seats)
+                continue
+            expected = total_seats - booked
+            if expected != available_seats:
+                mismatches[pk] = (travel_id, available_seats, expected)
+
+        # Segment bookings only consume part of the route, so rebuild the
+        # tree for the (few) multi-stop options from their bookings.
+        segment_states = {}
+        booked_ranges = defaultdict(list)
+        for option_id, seats, from_stop, to_stop in Booking.objects.filter(
+            travel_option_id__in=segmented, status__in=Booking.SEAT_HOLDING_STATUSES
+        ).values_list('travel_option_id', 'number_of_seats', 'from_stop', 'to_stop').iterator():
+            booked_ranges[option_id].append((seats, from_stop, to_stop))
+
+        for pk, (travel_id, total_seats, available_seats, segment_seats) in segmented.items():
+            size = segment_seats['size']
+            tree = SegmentTree([total_seats] * size)
+            for seats, from_stop, to_stop in booked_ranges[pk]:
+                tree.add(from_stop or 0, size if to_stop is None else to_stop, -seats)
+            # A segment can drift without moving the route's minimum, so
+            # every segment is compared
+            expected = tree.min(0, size)
+            if expected != available_seats or tree.values() != SegmentTree.from_state(segment_seats).values():
+                mismatches[pk] = (travel_id, available_seats, expected)
+                segment_states[pk] = (segment_seats, tree.to_state())
+
+        return mismatches, segment_states
+
+    def check_fare_classes(self, travel_options):
+        """Return ``{pk: (label, stored, expected)}`` for drifted fare classes"""
+        holding = Q(bookings__status__in=Booking.SEAT_HOLDING_STATUSES)
+        rows = FareClass.objects.filter(travel_option__in=travel_options).annotate(
+            booked=Coalesce(Sum('bookings__number_of_seats', filter=holding), 0),
+        ).order_by().values_list('pk', 'travel_option__travel_id', 'code', 'total_seats', 'available_seats', 'booked')
+
+        mismatches = {}
+        for pk, travel_id, code, total_seats, available_seats, booked in rows.iterator(chunk_size=5000):
+            expected = total_seats - booked
+            if expected != available_seats:
+                mismatches[pk] = (f"{travel_id} {code}", available_seats, expected)
+        return mismatches
+
+    def check_unclassed(self, travel_options):
+        """
+        Return ``{pk: (travel_id, seats)}`` for options sold in fare classes
+        whose seat-holding bookings include some without a class. Those seats
+        are counted against the option but not against any bucket.
+        """
+        rows = Booking.objects.filter(
+            travel_option__in=travel_options.filter(fare_classes__isnull=False),
+            fare_class__isnull=True,
+            status__in=Booking.SEAT_HOLDING_STATUSES,
+        ).order_by().values('travel_option_id', 'travel_option__travel_id').annotate(seats=Sum('number_of_seats'))
+        return {row['travel_option_id']: (row['travel_option__travel_id'], row['seats']) for row in rows}
+
+    def repair(self, model, mismatches, batch_size, segment_states=None):
+        """
+        Write expected counts in batched CASE updates. A row only takes the
+        new count if its stored count (or segment tree) is still the one we
+        read, so seats that moved under live traffic since the check are
+        left for the next run.
+        """
+        segment_states = segment_states or {}
+
+        def unchanged(pk, stored):
+            if pk in segment_states:
+                return Q(pk=pk, segment_seats=segment_states[pk][0])
+            return Q(pk=pk, available_seats=stored)
+
+        items = list(mismatches.items())
+        repaired = 0
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            updates = {
+                'available_seats': Case(
+                    *[
+                        When(unchanged(pk, stored), then=Value(max(expected, 0)))
+                        for pk, (_, stored, expected) in batch
+                    ],
+                    default=F('available_seats'),
+                    output_field=IntegerField(),
+                ),
+            }
+            segmented = [pk for pk, _ in batch if pk in segment_states]
+            if segmented:
+                state_field = model._meta.get_field('segment_seats')
+                updates['segment_seats'] = Case(
+                    *[
+                        When(unchanged(pk, None), then=Value(segment_states[pk][1], output_field=state_field))
+                        for pk in segmented
+                    ],
+                    default=F('segment_seats'),
+                )
+
+            # Only rows still as read are updated, so the count is what changed
+            still_drifted = reduce(or_, [unchanged(pk, stored) for pk, (_, stored, _) in batch])
+            repaired += model.objects.filter(still_drifted).update(**updates)
+        return repaired
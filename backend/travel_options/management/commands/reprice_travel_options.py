@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from travel_options.alerts import PriceAlertMatcher
+from travel_options.models import TravelOption
+from travel_options.pricing import Repricer
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute prices of active future travel options and their fare classes "
+        "from load factor and time to departure. Only prices that change are written; existing "
+        "bookings keep their total price."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--type', choices=[code for code, _ in TravelOption.TRAVEL_TYPES])
+        parser.add_argument('--dry-run', action='store_true', help='Only count the prices that would change')
+
+    def handle(self, *args, **options):
+        queryset = TravelOption.objects.all()
+        if options['type']:
+            queryset = queryset.filter(type=options['type'])
+
+        started = time.perf_counter()
+        repricer = Repricer(chunk_size=options['chunk_size'], dry_run=options['dry_run']).run(queryset)
+        elapsed = time.perf_counter() - started
+
+        verb = 'Would reprice' if options['dry_run'] else 'Repriced'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {repricer.changed} of {repricer.scanned} travel option(s) and "
+            f"{repricer.fare_classes_changed} fare class(es) in {elapsed:.2f}s "
+            f"({repricer.scanned / elapsed if elapsed else 0:.0f} options/sec)"
+        ))
+
+        if repricer.dropped and not options['dry_run']:
+            matcher = PriceAlertMatcher().match(repricer.dropped)
+            self.stdout.write(f"Queued {matcher.queued} price alert notification(s)")
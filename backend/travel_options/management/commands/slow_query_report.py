@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank the queries in the slow-query log (SLOW_QUERY_LOG and its rotated "
+        "files) by total time, with their count, mean and worst time, the views "
+        "running them and their latest EXPLAIN plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG, help='Log file; rotated files next to it are read too')
+        parser.add_argument('--since', help='Only lines logged on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--top', type=int, default=10, help='Queries to list')
+        parser.add_argument('--no-plans', action='store_true', help='Leave out the EXPLAIN plans')
+
+    def handle(self, *args, **options):
+        path = Path(options['log'])
+        # Rotated files are name.1 (newest) to name.N; read the oldest first
+        rotated = [file for file in path.parent.glob(f'{path.name}.*') if file.suffix[1:].isdigit()]
+        files = sorted(rotated, key=lambda file: int(file.suffix[1:]), reverse=True)
+        if path.exists():
+            files.append(path)
+        if not files:
+            raise CommandError(f"No slow-query log at {path}")
+
+        since = None
+        if options['since']:
+            since = timezone.make_aware(datetime.fromisoformat(options['since']))
+
+        queries = {}
+        for file in files:
+            with open(file) as lines:
+                for line in lines:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since and datetime.fromisoformat(entry['time']) < since:
+                        continue
+                    query = queries.setdefault(entry['fingerprint'], {
+                        'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'plan': None,
+                    })
+                    query['count'] += entry['count']
+                    query['total_ms'] += entry['total_ms']
+                    query['max_ms'] = max(query['max_ms'], entry['max_ms'])
+                    query['views'].add(entry['view'] or entry['caller'] or 'unknown')
+                    # Files are read oldest first, so the last plan is the latest
+                    query['plan'] = entry['plan'] or query['plan']
+
+        ranked = sorted(queries.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        self.stdout.write(f"{len(queries)} slow quer{'y' if len(queries) == 1 else 'ies'} in {len(files)} file(s)")
+        for rank, (key, query) in enumerate(ranked[:options['top']], 1):
+            self.stdout.write(
+                f"\n{rank}. [{key}] total {query['total_ms']:.0f} ms, {query['count']} call(s), "
+                f"mean {query['total_ms'] / query['count']:.1f} ms, max {query['max_ms']:.1f} ms"
+            )
+            self.stdout.write(f"   {query['sql']}")
+            self.stdout.write(f"   from {', '.join(sorted(query['views']))}")
+            if query['plan'] and not options['no_plans']:
+                for line in query['plan']:
+                    self.stdout.write(f"     {line}")
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-19 02:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='traveloption',
+            name='segment_seats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='RouteStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('arrival_datetime', models.DateTimeField(blank=True, null=True)),
+                ('departure_datetime', models.DateTimeField(blank=True, null=True)),
+                ('travel_option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='travel_options.traveloption')),
+            ],
+            options={
+                'db_table': 'route_stop',
+                'ordering': ['travel_option', 'sequence'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='routestop',
+            index=models.Index(fields=['name', 'travel_option', 'sequence'], name='route_stop_name_ee25e3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='routestop',
+            constraint=models.UniqueConstraint(fields=('travel_option', 'sequence'), name='unique_stop_sequence'),
+        ),
+    ]
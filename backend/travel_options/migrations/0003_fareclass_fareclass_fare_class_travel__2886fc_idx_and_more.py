@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 02:04
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0002_traveloption_segment_seats_routestop_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareClass',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(choices=[('ECONOMY', 'Economy'), ('PREMIUM', 'Premium Economy'), ('BUSINESS', 'Business'), ('FIRST', 'First'), ('SLEEPER', 'Sleeper')], max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('total_seats', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('available_seats', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(0)])),
+                ('travel_option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fare_classes', to='travel_options.traveloption')),
+            ],
+            options={
+                'db_table': 'fare_class',
+                'ordering': ['travel_option', 'price'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='fareclass',
+            index=models.Index(fields=['travel_option', 'available_seats', 'price'], name='fare_class_travel__2886fc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='fareclass',
+            constraint=models.UniqueConstraint(fields=('travel_option', 'code'), name='unique_fare_class_code'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0003_fareclass_fareclass_fare_class_travel__2886fc_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['is_active', 'departure_datetime'], name='travel_opti_is_acti_a8c5bd_idx'),
+        ),
+    ]
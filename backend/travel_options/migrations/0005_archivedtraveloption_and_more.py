@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0004_traveloption_travel_opti_is_acti_a8c5bd_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTravelOption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('travel_id', models.CharField(max_length=20)),
+                ('departure_datetime', models.DateTimeField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'archived_travel_option',
+                'ordering': ['departure_datetime'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedtraveloption',
+            index=models.Index(fields=['travel_id'], name='archived_tr_travel__02449f_idx'),
+        ),
+    ]
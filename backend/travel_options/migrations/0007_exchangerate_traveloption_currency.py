@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 02:36
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel_options', '0006_traveloption_base_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, unique=True)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18, validators=[django.core.validators.MinValueValidator(0)])),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'exchange_rate',
+                'ordering': ['currency'],
+            },
+        ),
+        migrations.AddField(
+            model_name='traveloption',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-19 02:47
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('travel_options', '0007_exchangerate_traveloption_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('type', models.CharField(blank=True, choices=[('FLIGHT', 'Flight'), ('TRAIN', 'Train'), ('BUS', 'Bus')], max_length=10)),
+                ('departure_from', models.DateTimeField()),
+                ('departure_to', models.DateTimeField()),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'price_alert',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceAlertNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(max_length=3)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='travel_options.pricealert')),
+                ('travel_option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_notifications', to='travel_options.traveloption')),
+            ],
+            options={
+                'db_table': 'price_alert_notification',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pricealertnotification',
+            index=models.Index(fields=['sent_at', 'id'], name='price_alert_sent_at_3e6709_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pricealertnotification',
+            constraint=models.UniqueConstraint(fields=('alert', 'travel_option'), name='unique_alert_notification'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['source', 'destination', 'is_active', 'departure_from', 'departure_to', 'type', 'currency', 'max_price'], name='price_alert_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['user', 'is_active'], name='price_alert_user_id_b59eda_idx'),
+        ),
+    ]
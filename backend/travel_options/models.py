@@ -1,6 +1,12 @@
-from django.db import models
+import json
+import zlib
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import F, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from travel_booking.db.sharding import use_shard
+from .segments import SegmentTree
 
 class TravelOption(models.Model):
     TRAVEL_TYPES = [
@@ -16,11 +22,15 @@ class TravelOption(models.Model):
     departure_datetime = models.DateTimeField()
     arrival_datetime = models.DateTimeField()
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    # Published fare dynamic pricing works from; null means ``price`` is the base
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default='USD')  # ISO 4217 code of price and fare class prices
     total_seats = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     available_seats = models.PositiveIntegerField(validators=[MinValueValidator(0)])
     operator_name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     amenities = models.JSONField(default=list, blank=True)  # List of amenities
+    segment_seats = models.JSONField(default=dict, blank=True)  # Serialised SegmentTree for multi-stop routes
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -32,6 +42,7 @@ class TravelOption(models.Model):
             models.Index(fields=['type', 'source', 'destination']),
             models.Index(fields=['departure_datetime']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['is_active', 'departure_datetime']),
         ]
 
     def __str__(self):
@@ -72,8 +83,11 @@ class TravelOption(models.Model):
             self.departure_datetime > timezone.now()
         )
 
-    def book_seats(self, num_seats):
-        """Book specified number of seats"""
+    def book_seats(self, num_seats, from_stop=None, to_stop=None):
+        """Book specified number of seats, optionally between two stops"""
+        if from_stop is not None or to_stop is not None or self.segment_seats:
+            return self._update_segment_seats(-num_seats, from_stop, to_stop)
+
         if num_seats > self.available_seats:
             raise ValueError(f"Only {self.available_seats} seats available")
         
@@ -81,11 +95,319 @@ class TravelOption(models.Model):
         self.save(update_fields=['available_seats'])
         return True
 
-    def cancel_seats(self, num_seats):
-        """Cancel specified number of seats"""
+    def cancel_seats(self, num_seats, from_stop=None, to_stop=None):
+        """Cancel specified number of seats, optionally between two stops"""
+        if from_stop is not None or to_stop is not None or self.segment_seats:
+            return self._update_segment_seats(num_seats, from_stop, to_stop)
+
         if self.available_seats + num_seats > self.total_seats:
             raise ValueError("Cannot cancel more seats than total capacity")
         
         self.available_seats += num_seats
         self.save(update_fields=['available_seats'])
-        return True
\ No newline at end of file
+        return True
+
+    def segment_tree(self):
+        """
+        Load the per-segment seat tree. Until the first segment booking every
+        segment has the same availability, so the tree is built lazily from
+        ``available_seats`` and the number of stops.
+        """
+        if self.segment_seats:
+            return SegmentTree.from_state(self.segment_seats)
+
+        num_stops = self.stops.count()
+        if num_stops < 2:
+            raise ValueError("This travel option has no route stops")
+        return SegmentTree([self.available_seats] * (num_stops - 1))
+
+    def seats_available_between(self, from_stop=None, to_stop=None):
+        """Seats free on every segment from stop ``from_stop`` to ``to_stop``"""
+        if from_stop is None and to_stop is None and not self.segment_seats:
+            return self.available_seats
+
+        tree = self.segment_tree()
+        start, end = self._segment_range(tree, from_stop, to_stop)
+        return tree.min(start, end)
+
+    def _segment_range(self, tree, from_stop, to_stop):
+        start = 0 if from_stop is None else from_stop
+        end = tree.size if to_stop is None else to_stop
+        if not 0 <= start < end <= tree.size:
+            raise ValueError("Invalid stops for this route")
+        return start, end
+
+    def _update_segment_seats(self, delta, from_stop, to_stop):
+        """Atomically apply a seat delta to a range of segments"""
+        db = router.db_for_write(TravelOption, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            option = TravelOption.objects.select_for_update().get(pk=self.pk)
+            tree = option.segment_tree()
+            start, end = self._segment_range(tree, from_stop, to_stop)
+
+            if delta < 0 and -delta > tree.min(start, end):
+                raise ValueError(f"Only {tree.min(start, end)} seats available")
+            if delta > 0 and tree.max(start, end) + delta > option.total_seats:
+                raise ValueError("Cannot cancel more seats than total capacity")
+
+            tree.add(start, end, delta)
+            option.segment_seats = tree.to_state()
+            option.available_seats = tree.min(0, tree.size)
+            option.save(update_fields=['segment_seats', 'available_seats'])
+
+        self.segment_seats = option.segment_seats
+        self.available_seats = option.available_seats
+        return True
+
+
+class RouteStop(models.Model):
+    """Ordered stop on a multi-stop route; sequence 0 is the origin"""
+    travel_option = models.ForeignKey(TravelOption, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    arrival_datetime = models.DateTimeField(null=True, blank=True)
+    departure_datetime = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'route_stop'
+        ordering = ['travel_option', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['travel_option', 'sequence'], name='unique_stop_sequence'),
+        ]
+        indexes = [
+            models.Index(fields=['name', 'travel_option', 'sequence']),
+        ]
+
+    def __str__(self):
+        return f"{self.travel_option.travel_id} #{self.sequence} {self.name}"
+
+
+class FareClass(models.Model):
+    """Priced seat bucket within a travel option (economy, business, ...)"""
+    FARE_CLASSES = [
+        ('ECONOMY', 'Economy'),
+        ('PREMIUM', 'Premium Economy'),
+        ('BUSINESS', 'Business'),
+        ('FIRST', 'First'),
+        ('SLEEPER', 'Sleeper'),
+    ]
+
+    travel_option = models.ForeignKey(TravelOption, on_delete=models.CASCADE, related_name='fare_classes')
+    code = models.CharField(max_length=10, choices=FARE_CLASSES)
+    price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    # Published fare of the class dynamic pricing works from; null means ``price`` is the base
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
+    total_seats = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    available_seats = models.PositiveIntegerField(validators=[MinValueValidator(0)])
+
+    class Meta:
+        db_table = 'fare_class'
+        ordering = ['travel_option', 'price']
+        constraints = [
+            models.UniqueConstraint(fields=['travel_option', 'code'], name='unique_fare_class_code'),
+        ]
+        indexes = [
+            models.Index(fields=['travel_option', 'available_seats', 'price']),
+        ]
+
+    def __str__(self):
+        return f"{self.travel_option.travel_id} {self.code}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.available_seats > self.total_seats:
+            raise ValidationError('Available seats cannot exceed total seats.')
+
+        if self.travel_option_id:
+            other_seats = FareClass.objects.filter(travel_option_id=self.travel_option_id).exclude(
+                pk=self.pk
+            ).aggregate(total=Sum('total_seats'))['total'] or 0
+            if other_seats + self.total_seats > self.travel_option.total_seats:
+                raise ValidationError('Fare class seats cannot exceed the travel option\'s total seats.')
+
+    def book_seats(self, num_seats, from_stop=None, to_stop=None):
+        """
+        Book seats from this class bucket. The conditional UPDATE only
+        succeeds when enough seats remain, so concurrent bookings can't
+        oversell; the option's overall count moves in the same transaction.
+        Class buckets count whole-route seats, so stops are rejected.
+        """
+        if from_stop is not None or to_stop is not None:
+            raise ValueError("Fare class seats are sold for the whole route only")
+
+        db = router.db_for_write(FareClass, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            # Lock the option first, in the same order as cancellations
+            option = TravelOption.objects.select_for_update().get(pk=self.travel_option_id)
+            updated = FareClass.objects.filter(
+                pk=self.pk, available_seats__gte=num_seats
+            ).update(available_seats=F('available_seats') - num_seats)
+            if not updated:
+                self.refresh_from_db(fields=['available_seats'])
+                raise ValueError(f"Only {self.available_seats} {self.get_code_display()} seats available")
+            self._move_option_seats(option, -num_seats)
+
+        self.refresh_from_db(fields=['available_seats'])
+        return True
+
+    def cancel_seats(self, num_seats):
+        """Return seats to this class bucket"""
+        db = router.db_for_write(FareClass, instance=self)
+        with transaction.atomic(using=db), use_shard(db):
+            option = TravelOption.objects.select_for_update().get(pk=self.travel_option_id)
+            updated = FareClass.objects.filter(
+                pk=self.pk, available_seats__lte=F('total_seats') - num_seats
+            ).update(available_seats=F('available_seats') + num_seats)
+            if not updated:
+                raise ValueError("Cannot cancel more seats than total capacity")
+            self._move_option_seats(option, num_seats)
+
+        self.refresh_from_db(fields=['available_seats'])
+        return True
+
+    @staticmethod
+    def _move_option_seats(option, delta):
+        # An option that already has a segment tree (stops booked before its
+        # classes were added) keeps the tree in step with its overall count
+        if option.segment_seats:
+            option._update_segment_seats(delta, None, None)
+        else:
+            TravelOption.objects.filter(pk=option.pk).update(available_seats=F('available_seats') + delta)
+
+
+class ArchivedRecord(models.Model):
+    """Cold-storage row holding a serialised record as zlib-compressed JSON"""
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def compress(data):
+        return zlib.compress(json.dumps(data, default=str).encode())
+
+    @property
+    def data(self):
+        """The record as it was serialised when archived"""
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+
+class ArchivedTravelOption(ArchivedRecord):
+    """Cold-storage copy of a departed travel option, stored as compressed JSON"""
+    original_id = models.BigIntegerField(unique=True)
+    travel_id = models.CharField(max_length=20)
+    departure_datetime = models.DateTimeField()
+
+    class Meta:
+        db_table = 'archived_travel_option'
+        ordering = ['departure_datetime']
+        indexes = [
+            models.Index(fields=['travel_id']),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.travel_id}"
+
+
+class ExchangeRate(models.Model):
+    """Units of ``currency`` per one unit of the base currency (USD)"""
+    currency = models.CharField(max_length=3, unique=True)
+    rate = models.DecimalField(max_digits=18, decimal_places=8, validators=[MinValueValidator(0)])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'exchange_rate'
+        ordering = ['currency']
+
+    def __str__(self):
+        return f"{self.currency} {self.rate}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.rate <= 0:
+            raise ValidationError('Exchange rate must be positive.')
+
+    def save(self, *args, **kwargs):
+        from .currency import invalidate_rates
+
+        self.currency = self.currency.upper()
+        super().save(*args, **kwargs)
+        invalidate_rates()
+
+    def delete(self, *args, **kwargs):
+        from .currency import invalidate_rates
+
+        result = super().delete(*args, **kwargs)
+        invalidate_rates()
+        return result
+
+
+class PriceAlert(models.Model):
+    """A user's request to hear when a route drops to ``max_price`` or below"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='price_alerts')
+    # Stored lower-cased so the matcher can look alerts up by exact route
+    source = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    type = models.CharField(max_length=10, choices=TravelOption.TRAVEL_TYPES, blank=True)
+    departure_from = models.DateTimeField()
+    departure_to = models.DateTimeField()
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default='USD')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'price_alert'
+        ordering = ['-created_at']
+        indexes = [
+            # The matcher probes alerts by route and departure window; the
+            # trailing columns make the probe index-only
+            models.Index(
+                fields=['source', 'destination', 'is_active', 'departure_from', 'departure_to',
+                        'type', 'currency', 'max_price'],
+                name='price_alert_route_idx',
+            ),
+            models.Index(fields=['user', 'is_active']),
+        ]
+
+    def __str__(self):
+        return f"Alert {self.pk} - {self.source} to {self.destination} under {self.max_price} {self.currency}"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.departure_from >= self.departure_to:
+            raise ValidationError('Departure window must end after it starts.')
+
+    def save(self, *args, **kwargs):
+        self.source = self.source.strip().lower()
+        self.destination = self.destination.strip().lower()
+        self.currency = self.currency.upper()
+        super().save(*args, **kwargs)
+
+
+class PriceAlertNotification(models.Model):
+    """Queued notice that a travel option matched an alert; one per alert and option"""
+    alert = models.ForeignKey(PriceAlert, on_delete=models.CASCADE, related_name='notifications')
+    travel_option = models.ForeignKey(TravelOption, on_delete=models.CASCADE, related_name='alert_notifications')
+    price = models.DecimalField(max_digits=10, decimal_places=2)  # Matched price in the option's currency
+    currency = models.CharField(max_length=3)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'price_alert_notification'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['alert', 'travel_option'], name='unique_alert_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['sent_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.alert_id} matched {self.travel_option.travel_id} at {self.price} {self.currency}"
@@ -0,0 +1,160 @@
+"""
+Batch dynamic pricing for TravelOption.
+
+Fares are derived from the published ``base_price`` (or ``price`` when no
+base has been recorded yet) by two piecewise-linear curves: one over the
+load factor (share of seats sold) and one over days to departure. The
+combined multiplier is clamped to a floor and a cap of the base fare. An
+option's fare classes move by the same multiplier, each from its own base.
+
+Options are read a chunk at a time as plain columns, every rule is applied
+to whole columns, and only rows whose price actually moves are written
+back, shard by shard. Bookings keep the ``total_price`` they were created with.
+"""
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from travel_booking.db.sharding import each_shard
+
+from .models import FareClass, TravelOption
+from .timetable import update_rows
+
+DEFAULT_RULES = {
+    # (load factor, multiplier) breakpoints; load factor is the share of seats sold
+    'load_factor_curve': [(0.0, 0.9), (0.5, 1.0), (0.8, 1.2), (1.0, 1.5)],
+    # (days to departure, multiplier) breakpoints
+    'days_curve': [(0, 1.25), (3, 1.1), (14, 1.0), (60, 0.95)],
+    # Bounds of the combined multiplier, relative to the base fare
+    'floor': 0.7,
+    'cap': 2.0,
+}
+CENT = Decimal('0.01')
+
+
+class Curve:
+    """Piecewise-linear curve through ``(x, y)`` points, flat beyond the ends"""
+
+    def __init__(self, points):
+        points = sorted((float(x), float(y)) for x, y in points)
+        if not points:
+            raise ValueError('A pricing curve needs at least one point')
+        self.xs = [x for x, _ in points]
+        self.ys = [y for _, y in points]
+
+    def __call__(self, x):
+        index = bisect_right(self.xs, x)
+        if index == 0:
+            return self.ys[0]
+        if index == len(self.xs):
+            return self.ys[-1]
+        x0, x1 = self.xs[index - 1], self.xs[index]
+        y0, y1 = self.ys[index - 1], self.ys[index]
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def map(self, column):
+        return [self(x) for x in column]
+
+
+class PricingRules:
+    def __init__(self, load_factor_curve, days_curve, floor, cap):
+        if not 0 < floor <= cap:
+            raise ValueError('Pricing floor must be positive and not above the cap')
+        self.load_factor_curve = Curve(load_factor_curve)
+        self.days_curve = Curve(days_curve)
+        self.floor = floor
+        self.cap = cap
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        """Rules from ``DEFAULT_RULES`` updated with ``settings.DYNAMIC_PRICING``"""
+        rules = {**DEFAULT_RULES, **getattr(settings, 'DYNAMIC_PRICING', {}), **overrides}
+        return cls(**rules)
+
+    def multipliers(self, load_factors, days):
+        by_load = self.load_factor_curve.map(load_factors)
+        by_days = self.days_curve.map(days)
+        return [
+            min(max(load * time, self.floor), self.cap)
+            for load, time in zip(by_load, by_days)
+        ]
+
+    def prices(self, bases, load_factors, days):
+        return self.apply(bases, self.multipliers(load_factors, days))
+
+    @staticmethod
+    def apply(bases, multipliers):
+        return [
+            (base * Decimal(f'{multiplier:.4f}')).quantize(CENT, rounding=ROUND_HALF_UP)
+            for base, multiplier in zip(bases, multipliers)
+        ]
+
+
+class Repricer:
+    """Reprice active future options in primary-key order, one chunk at a time"""
+
+    COLUMNS = ['pk', 'price', 'base_price', 'total_seats', 'available_seats', 'departure_datetime']
+
+    def __init__(self, rules=None, chunk_size=5000, dry_run=False):
+        self.rules = rules or PricingRules.from_settings()
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.scanned = 0
+        self.changed = 0
+        self.fare_classes_changed = 0
+        self.dropped = []  # Options whose price went down, for the price alert matcher
+
+    def run(self, queryset=None):
+        now = timezone.now()
+        if queryset is None:
+            queryset = TravelOption.objects.all()
+        queryset = queryset.filter(is_active=True, departure_datetime__gt=now).order_by('pk')
+
+        for _ in each_shard():
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk).values_list(*self.COLUMNS)[:self.chunk_size])
+                if not rows:
+                    break
+                self.reprice_chunk(rows, now)
+                last_pk = rows[-1][0]
+        return self
+
+    def reprice_chunk(self, rows, now):
+        pks, prices, bases, totals, availables, departures = zip(*rows)
+        bases = [price if base is None else base for price, base in zip(prices, bases)]
+        load_factors = [(total - available) / total for total, available in zip(totals, availables)]
+        days = [(departure - now).total_seconds() / 86400 for departure in departures]
+
+        multipliers = self.rules.multipliers(load_factors, days)
+        new_prices = self.rules.apply(bases, multipliers)
+        changed = [
+            TravelOption(pk=pk, price=new, base_price=base, updated_at=now)
+            for pk, old, new, base in zip(pks, prices, new_prices, bases)
+            if new != old
+        ]
+        changed_classes = self.reprice_fare_classes(dict(zip(pks, multipliers)))
+        self.scanned += len(rows)
+        self.changed += len(changed)
+        self.fare_classes_changed += len(changed_classes)
+        self.dropped.extend(pk for pk, old, new in zip(pks, prices, new_prices) if new < old)
+        if not self.dry_run:
+            with transaction.atomic(using=router.db_for_write(TravelOption)):
+                update_rows(changed, ['price', 'base_price', 'updated_at'])
+                update_rows(changed_classes, ['price', 'base_price'])
+
+    def reprice_fare_classes(self, multipliers):
+        """Fare classes of the ``{option pk: multiplier}`` options whose price moves"""
+        rows = FareClass.objects.filter(travel_option_id__in=list(multipliers)).values_list(
+            'pk', 'travel_option_id', 'price', 'base_price'
+        )
+        changed = []
+        for pk, option_id, price, base in rows:
+            base = price if base is None else base
+            (new,) = self.rules.apply([base], [multipliers[option_id]])
+            if new != price:
+                changed.append(FareClass(pk=pk, price=new, base_price=base))
+        return changed
@@ -0,0 +1,92 @@
+class SegmentTree:
+    """
+    Array-backed range-min/max tree with lazy range add, used to track free
+    seats per route segment. Segment ``i`` is the leg between stop ``i`` and
+    stop ``i + 1``; ranges are half-open ``[start, end)`` over segments.
+
+    The whole tree is serialisable so it can be stored on the travel option
+    row and queried without a rebuild.
+    """
+
+    def __init__(self, values):
+        self.size = len(values)
+        nodes = 4 * max(self.size, 1)
+        self.mins = [0] * nodes
+        self.maxs = [0] * nodes
+        self.lazy = [0] * nodes
+        if self.size:
+            self._build(1, 0, self.size, values)
+
+    @classmethod
+    def from_state(cls, state):
+        tree = cls.__new__(cls)
+        tree.size = state['size']
+        tree.mins = list(state['mins'])
+        tree.maxs = list(state['maxs'])
+        tree.lazy = list(state['lazy'])
+        return tree
+
+    def to_state(self):
+        return {'size': self.size, 'mins': self.mins, 'maxs': self.maxs, 'lazy': self.lazy}
+
+    def _build(self, node, lo, hi, values):
+        if hi - lo == 1:
+            self.mins[node] = self.maxs[node] = values[lo]
+            return
+        mid = (lo + hi) // 2
+        self._build(2 * node, lo, mid, values)
+        self._build(2 * node + 1, mid, hi, values)
+        self._pull(node)
+
+    def _pull(self, node):
+        left, right = 2 * node, 2 * node + 1
+        self.mins[node] = min(self.mins[left], self.mins[right]) + self.lazy[node]
+        self.maxs[node] = max(self.maxs[left], self.maxs[right]) + self.lazy[node]
+
+    def _check_range(self, start, end):
+        if not 0 <= start < end <= self.size:
+            raise ValueError(f"Invalid segment range {start}-{end}")
+
+    def min(self, start, end):
+        """Minimum value over segments ``[start, end)`` in O(log n)"""
+        self._check_range(start, end)
+        return self._query(self.mins, min, 1, 0, self.size, start, end)
+
+    def max(self, start, end):
+        """Maximum value over segments ``[start, end)`` in O(log n)"""
+        self._check_range(start, end)
+        return self._query(self.maxs, max, 1, 0, self.size, start, end)
+
+    def _query(self, nodes, combine, node, lo, hi, start, end):
+        if start <= lo and hi <= end:
+            return nodes[node]
+        mid = (lo + hi) // 2
+        result = None
+        if start < mid:
+            result = self._query(nodes, combine, 2 * node, lo, mid, start, end)
+        if end > mid:
+            right = self._query(nodes, combine, 2 * node + 1, mid, hi, start, end)
+            result = right if result is None else combine(result, right)
+        return result + self.lazy[node]
+
+    def add(self, start, end, delta):
+        """Add ``delta`` to every segment in ``[start, end)`` in O(log n)"""
+        self._check_range(start, end)
+        self._add(1, 0, self.size, start, end, delta)
+
+    def _add(self, node, lo, hi, start, end, delta):
+        if start <= lo and hi <= end:
+            self.mins[node] += delta
+            self.maxs[node] += delta
+            self.lazy[node] += delta
+            return
+        mid = (lo + hi) // 2
+        if start < mid:
+            self._add(2 * node, lo, mid, start, end, delta)
+        if end > mid:
+            self._add(2 * node + 1, mid, hi, start, end, delta)
+        self._pull(node)
+
+    def values(self):
+        """Per-segment values, mainly for display and debugging"""
+        return [self.min(i, i + 1) for i in range(self.size)]
@@ -1,25 +1,57 @@
 from rest_framework import serializers
-from .models import TravelOption
+from .currency import get_rate_table
+from .models import TravelOption, RouteStop, FareClass, PriceAlert
+from travel_booking.timing import TimedSerializerMixin
 
-class TravelOptionSerializer(serializers.ModelSerializer):
+class RouteStopSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RouteStop
+        fields = ['sequence', 'name', 'arrival_datetime', 'departure_datetime']
+
+class FareClassSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FareClass
+        fields = ['code', 'price', 'total_seats', 'available_seats']
+
+class TravelOptionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     duration_hours = serializers.ReadOnlyField()
     is_available = serializers.ReadOnlyField()
+    stops = RouteStopSerializer(many=True, read_only=True)
+    fare_classes = FareClassSerializer(many=True, read_only=True)
+    # Only present on search results, where it is annotated by the query
+    cheapest_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = TravelOption
         fields = [
             'id', 'travel_id', 'type', 'source', 'destination',
-            'departure_datetime', 'arrival_datetime', 'price',
+            'departure_datetime', 'arrival_datetime', 'price', 'currency',
             'total_seats', 'available_seats', 'operator_name',
-            'description', 'amenities', 'duration_hours', 'is_available'
+            'description', 'amenities', 'duration_hours', 'is_available', 'stops',
+            'fare_classes', 'cheapest_price'
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Requested with ?currency=: one converter is shared by the whole response
+        converter = self.context.get('converter')
+        if converter is not None:
+            try:
+                for item in [data, *data.get('fare_classes', [])]:
+                    for field in ('price', 'cheapest_price'):
+                        if item.get(field) is not None:
+                            item[field] = str(converter.convert(item[field], instance.currency))
+            except ValueError as e:
+                raise serializers.ValidationError({'currency': [str(e)]})
+            data['currency'] = converter.target
+        return data
+
 class TravelOptionCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = TravelOption
         fields = [
             'travel_id', 'type', 'source', 'destination',
-            'departure_datetime', 'arrival_datetime', 'price',
+            'departure_datetime', 'arrival_datetime', 'price', 'currency',
             'total_seats', 'available_seats', 'operator_name',
             'description', 'amenities'
         ]
@@ -49,4 +81,26 @@ class TravelOptionSearchSerializer(serializers.Serializer):
         if min_price and max_price and min_price > max_price:
             raise serializers.ValidationError("Minimum price cannot be greater than maximum price.")
         
-        return attrs
\ No newline at end of file
+        return attrs
+
+class PriceAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceAlert
+        fields = [
+            'id', 'source', 'destination', 'type', 'departure_from', 'departure_to',
+            'max_price', 'currency', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_at']
+
+    def validate_currency(self, value):
+        value = value.upper()
+        if value not in get_rate_table():
+            raise serializers.ValidationError(f"No exchange rate for {value}")
+        return value
+
+    def validate(self, attrs):
+        departure_from = attrs.get('departure_from', getattr(self.instance, 'departure_from', None))
+        departure_to = attrs.get('departure_to', getattr(self.instance, 'departure_to', None))
+        if departure_from and departure_to and departure_from >= departure_to:
+            raise serializers.ValidationError("Departure window must end after it starts.")
+        return attrs
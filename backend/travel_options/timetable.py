@@ -0,0 +1,448 @@
+"""
+Streaming import of operator timetables (CSV or JSON Lines) into TravelOption.
+
+Rows are read lazily, validated a chunk at a time and upserted by
+``travel_id`` with ``bulk_create`` and a batched UPDATE, one transaction per
+chunk. Invalid rows are reported and skipped without aborting the chunk.
+``TimetableSync`` applies a full snapshot as a diff against the stored rows.
+With sharding, an existing option is updated on the shard that holds it and
+a new one is created on its route's shard.
+"""
+import csv
+import hashlib
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from travel_booking.db.sharding import each_shard, shard_aliases, shard_for_route, use_shard
+
+from .models import TravelOption
+
+REQUIRED_FIELDS = [
+    'travel_id', 'type', 'source', 'destination', 'departure_datetime',
+    'arrival_datetime', 'price', 'total_seats', 'operator_name',
+]
+# Columns written on update; available_seats is derived so sold seats are kept
+# and base_price is reset because the feed price is the new published fare
+UPDATE_FIELDS = [
+    'type', 'source', 'destination', 'departure_datetime', 'arrival_datetime',
+    'price', 'base_price', 'currency', 'total_seats', 'available_seats', 'operator_name', 'description',
+    'amenities', 'is_active', 'updated_at',
+]
+TRAVEL_TYPES = {code for code, _ in TravelOption.TRAVEL_TYPES}
+
+
+class RowError:
+    def __init__(self, line, travel_id, message):
+        self.line = line
+        self.travel_id = travel_id
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line} ({self.travel_id or '?'}): {self.message}"
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, dict)`` pairs from a CSV or JSON Lines stream"""
+    if fmt == 'csv':
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            amenities = row.get('amenities') or ''
+            row['amenities'] = [a.strip() for a in amenities.split('|') if a.strip()]
+            yield line, row
+    elif fmt == 'jsonl':
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError:
+                    yield line, {'_error': 'Invalid JSON'}
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}")
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    if not isinstance(value, datetime):
+        if not isinstance(value, str):
+            raise TypeError(f"expected an ISO 8601 string, not {type(value).__name__}")
+        value = parse_datetime(value.strip())
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _parse_decimal(value):
+    """Finite Decimal, or None for anything else"""
+    try:
+        value = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return value if value.is_finite() else None
+
+
+def _parse_int(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _parse_text(value):
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise TypeError(f"expected text, not {type(value).__name__}")
+    return value.strip()
+
+
+def _parse_list(value):
+    if not value:
+        return []
+    if not isinstance(value, list):
+        raise TypeError(f"expected a list, not {type(value).__name__}")
+    return value
+
+
+# How each column is parsed; parsers raise for values of the wrong type or
+# form and return None for values the checks below report
+COLUMNS = [
+    ('travel_id', lambda value: str(value).strip()),
+    ('type', _parse_text),
+    ('source', _parse_text),
+    ('destination', _parse_text),
+    ('departure_datetime', _parse_datetime),
+    ('arrival_datetime', _parse_datetime),
+    ('price', _parse_decimal),
+    ('currency', lambda value: str(value or 'USD').strip().upper()),
+    ('total_seats', _parse_int),
+    ('available_seats', _parse_int),
+    ('operator_name', _parse_text),
+    ('description', _parse_text),
+    ('amenities', _parse_list),
+]
+PRICE_FIELD = TravelOption._meta.get_field('price')
+CENT = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+# Prices must fit the column once rounded to its decimal places
+MAX_PRICE = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+
+
+def _price_fits(value):
+    return 0 <= value < MAX_PRICE and value.quantize(CENT) < MAX_PRICE
+
+
+def clean_row(row):
+    """Parse a row's columns; raises ValueError naming the first bad column"""
+    cleaned = {}
+    for field, parse in COLUMNS:
+        try:
+            cleaned[field] = parse(row.get(field))
+        except (ValueError, TypeError, AttributeError, InvalidOperation) as e:
+            raise ValueError(f"Invalid {field}: {e}") from e
+    if row.get('available_seats') in (None, ''):
+        cleaned['available_seats'] = cleaned['total_seats']
+    return cleaned
+
+
+def _travel_id(row):
+    return row.get('travel_id') if isinstance(row, dict) else None
+
+
+def validate_chunk(rows, now=None):
+    """
+    Parse a chunk row by row, then check it column by column, and return
+    ``(valid, errors)``. ``valid`` holds ``(line, cleaned_dict)`` pairs
+    ready for upsert; a row that can't be parsed only fails itself.
+    """
+    now = now or timezone.now()
+    errors = {}
+    cleaned = {}
+
+    def fail(index, message):
+        errors.setdefault(index, message)
+
+    for index, (_, row) in enumerate(rows):
+        if not isinstance(row, dict):
+            fail(index, 'Row is not an object')
+            continue
+        if '_error' in row:
+            fail(index, row['_error'])
+            continue
+        missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            fail(index, f"Missing {', '.join(missing)}")
+            continue
+        try:
+            cleaned[index] = clean_row(row)
+        except (ValueError, TypeError, AttributeError, InvalidOperation) as e:
+            fail(index, str(e))
+
+    checks = [
+        (lambda row: len(row['travel_id']) <= 20, 'travel_id longer than 20 characters'),
+        (lambda row: row['type'] in TRAVEL_TYPES, 'Unknown travel type'),
+        (lambda row: row['departure_datetime'] is not None and row['arrival_datetime'] is not None, 'Invalid datetime'),
+        (lambda row: row['price'] is not None and _price_fits(row['price']), 'Invalid price'),
+        (lambda row: len(row['currency']) == 3 and row['currency'].isalpha(), 'Invalid currency'),
+        (lambda row: row['total_seats'] is not None and row['total_seats'] >= 1, 'Invalid total_seats'),
+        (lambda row: row['available_seats'] is not None and row['available_seats'] >= 0, 'Invalid available_seats'),
+        (lambda row: row['departure_datetime'] < row['arrival_datetime'], 'Departure time must be before arrival time.'),
+        (lambda row: row['departure_datetime'] > now, 'Departure time must be in the future.'),
+        (lambda row: row['available_seats'] <= row['total_seats'], 'Available seats cannot exceed total seats.'),
+    ]
+    pending = list(cleaned)
+    for check, message in checks:
+        still_valid = []
+        for i in pending:
+            if check(cleaned[i]):
+                still_valid.append(i)
+            else:
+                fail(i, message)
+        pending = still_valid
+
+    valid = [(rows[i][0], cleaned[i]) for i in pending]
+    row_errors = [
+        RowError(rows[i][0], _travel_id(rows[i][1]), message)
+        for i, message in sorted(errors.items())
+    ]
+    return valid, row_errors
+
+
+def update_rows(objs, fields):
+    """
+    Write ``fields`` of already-loaded model instances (all of one model)
+    with a single parameterised UPDATE run through ``executemany``.
+    ``bulk_update`` builds a CASE expression per field and row in Python,
+    which dominates the import time at feed scale.
+    """
+    if not objs:
+        return
+    meta = objs[0]._meta
+    connection = connections[router.db_for_write(meta.model)]
+    quote = connection.ops.quote_name
+    model_fields = [meta.get_field(name) for name in fields]
+
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in model_fields),
+        quote(meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields] + [obj.pk]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class TimetableImporter:
+    """Upsert validated rows by travel_id, one transaction per chunk"""
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.seen = set()
+        self.price_drops = []  # New options and cheaper fares, for the price alert matcher
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        return self
+
+    def import_chunk(self, chunk):
+        self.write(self.validate(chunk))
+
+    def validate(self, chunk):
+        """Validated rows of the chunk, minus travel_ids already seen in the feed"""
+        valid, errors = validate_chunk(chunk)
+        self.errors.extend(errors)
+
+        unique = []
+        for line, data in valid:
+            if data['travel_id'] in self.seen:
+                self.errors.append(RowError(line, data['travel_id'], 'Duplicate travel_id in feed'))
+                continue
+            self.seen.add(data['travel_id'])
+            unique.append((line, data))
+        return unique
+
+    def write(self, rows):
+        for alias, shard_rows in self.by_shard(rows).items():
+            self.write_shard(alias, shard_rows)
+
+    def by_shard(self, rows):
+        """``{alias: rows}``: the shard already holding each travel_id, else its route's"""
+        if not rows:
+            return {}
+        if not shard_aliases():
+            return {None: rows}
+        stored = {}
+        for alias in each_shard():
+            stored.update(dict.fromkeys(TravelOption.objects.filter(
+                travel_id__in=[data['travel_id'] for _, data in rows]
+            ).values_list('travel_id', flat=True), alias))
+        by_shard = {}
+        for line, data in rows:
+            alias = stored.get(data['travel_id']) or shard_for_route(data['source'], data['destination'])
+            by_shard.setdefault(alias, []).append((line, data))
+        return by_shard
+
+    def write_shard(self, alias, rows):
+        with transaction.atomic(using=alias), use_shard(alias):
+            existing = TravelOption.objects.select_for_update().in_bulk(
+                [data['travel_id'] for _, data in rows], field_name='travel_id'
+            )
+            to_create, to_update = self.plan(rows, existing)
+            TravelOption.objects.bulk_create(to_create, batch_size=1000)
+            update_rows(to_update, UPDATE_FIELDS)
+        self.price_drops.extend(option.pk for option in to_create if option.pk is not None)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+    def plan(self, rows, existing):
+        """Split rows into new and changed TravelOption instances"""
+        now = timezone.now()
+        to_create, to_update = [], []
+        for line, data in rows:
+            option = existing.get(data['travel_id'])
+            if option is None:
+                to_create.append(TravelOption(**data))
+                continue
+
+            if option.segment_seats and data['total_seats'] != option.total_seats:
+                self.errors.append(RowError(
+                    line, data['travel_id'], "Capacity of a multi-stop route can't change by import"
+                ))
+                continue
+
+            # Keep seats already sold: only the capacity change is applied
+            sold = option.total_seats - option.available_seats
+            available = data['total_seats'] - sold
+            if available < 0:
+                self.errors.append(RowError(
+                    line, data['travel_id'], f"total_seats below the {sold} seats already sold"
+                ))
+                continue
+
+            if data['price'] < option.price or data['currency'] != option.currency:
+                self.price_drops.append(option.pk)
+            for field, value in data.items():
+                setattr(option, field, value)
+            option.available_seats = available
+            option.base_price = None
+            option.is_active = True
+            option.updated_at = now
+            to_update.append(option)
+        return to_create, to_update
+
+
+# Columns that make up a row's fingerprint; available_seats is derived from
+# bookings on update, so it is deliberately left out.
+FINGERPRINT_FIELDS = [
+    'type', 'source', 'destination', 'departure_datetime', 'arrival_datetime',
+    'price', 'currency', 'total_seats', 'operator_name', 'description', 'amenities', 'is_active',
+]
+
+
+def fingerprint(values):
+    """Stable hash of a row's FINGERPRINT_FIELDS values, feed or database side"""
+    parts = []
+    for field, value in zip(FINGERPRINT_FIELDS, values):
+        if field in ('departure_datetime', 'arrival_datetime'):
+            value = value.astimezone(dt_timezone.utc).isoformat()
+        elif field == 'price':
+            value = str(Decimal(value).quantize(Decimal('0.01')))
+        elif field == 'amenities':
+            value = json.dumps(value, sort_keys=True)
+        parts.append(str(value))
+    return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).digest()
+
+
+class TimetableSync(TimetableImporter):
+    """
+    Apply a full operator snapshot as a diff. Incoming rows are fingerprinted
+    and compared with the stored rows chunk by chunk; only new and changed
+    rows are written. Future options of the snapshot's operators that are
+    missing from it are deactivated.
+    """
+
+    def __init__(self, chunk_size=2000):
+        super().__init__(chunk_size)
+        self.unchanged = 0
+        self.deactivated = 0
+        self.operators = set()
+        self.mentioned = set()
+
+    def run(self, rows):
+        super().run(rows)
+        self.deactivate_missing()
+        return self
+
+    def import_chunk(self, chunk):
+        # Rejected rows still count as present so they are not deactivated
+        for _, row in chunk:
+            if _travel_id(row) not in (None, ''):
+                self.mentioned.add(str(row['travel_id']).strip())
+
+        rows = self.validate(chunk)
+        stored = {}
+        for _ in each_shard():
+            stored.update(
+                (values[0], fingerprint(values[1:]))
+                for values in TravelOption.objects.filter(
+                    travel_id__in=[data['travel_id'] for _, data in rows]
+                ).values_list('travel_id', *self.stored_fields())
+            )
+
+        changed = []
+        for line, data in rows:
+            self.operators.add(data['operator_name'])
+            incoming = fingerprint([data.get(field, True) for field in FINGERPRINT_FIELDS])
+            if stored.get(data['travel_id']) == incoming:
+                self.unchanged += 1
+            else:
+                changed.append((line, data))
+        self.write(changed)
+
+    @staticmethod
+    def stored_fields():
+        # Compare the feed with the published fare, not a dynamically repriced one
+        return [
+            Coalesce('base_price', 'price') if field == 'price' else field
+            for field in FINGERPRINT_FIELDS
+        ]
+
+    def deactivate_missing(self):
+        if not self.operators:
+            return
+        for _ in each_shard():
+            missing = [
+                pk for pk, travel_id in TravelOption.objects.filter(
+                    operator_name__in=self.operators,
+                    is_active=True,
+                    departure_datetime__gt=timezone.now(),
+                ).values_list('pk', 'travel_id').iterator(chunk_size=self.chunk_size)
+                if travel_id not in self.mentioned
+            ]
+            for start in range(0, len(missing), self.chunk_size):
+                self.deactivated += TravelOption.objects.filter(
+                    pk__in=missing[start:start + self.chunk_size], is_active=True
+                ).update(is_active=False, updated_at=timezone.now())
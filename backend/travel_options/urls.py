@@ -8,6 +8,8 @@ urlpatterns = [
     path('', views.TravelOptionListAPIView.as_view(), name='api_list'),
     path('<int:pk>/', views.TravelOptionDetailAPIView.as_view(), name='api_detail'),
     path('search/', views.search_travel_options, name='api_search'),
+    path('alerts/', views.PriceAlertListCreateAPIView.as_view(), name='api_alerts'),
+    path('alerts/<int:pk>/', views.PriceAlertDetailAPIView.as_view(), name='api_alert_detail'),
     
     # Template views
     path('list/', views.travel_options_list, name='list'),
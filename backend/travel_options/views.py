@@ -1,20 +1,31 @@
+import heapq
+from collections import Counter
+from functools import partial
+
 from rest_framework import generics, filters, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
-from .models import TravelOption
+from django.utils.dateparse import parse_datetime
+from django.db.models import Case, Count, Exists, F, Min, OuterRef, Q, Subquery, When
+from .models import TravelOption, RouteStop, PriceAlert
 from .serializers import (
     TravelOptionSerializer, 
     TravelOptionSearchSerializer,
-    TravelOptionCreateSerializer
+    TravelOptionCreateSerializer,
+    PriceAlertSerializer
 )
 from .filters import TravelOptionFilter
+from .currency import CurrencyMixin, get_converter
+from accounts.throttling import SearchIPThrottle, SearchUserThrottle
+from travel_booking.async_api import AsyncAPIView, run_concurrently, run_query
+from travel_booking.db.routers import replica_reads
+from travel_booking.db.sharding import add_shard_user, shard_aliases, shard_for_pk, shard_for_route, sharded, use_shard
 
 # API Views
-class TravelOptionListAPIView(generics.ListAPIView):
+class TravelOptionListAPIView(CurrencyMixin, AsyncAPIView, generics.ListAPIView):
     serializer_class = TravelOptionSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -22,49 +33,216 @@ class TravelOptionListAPIView(generics.ListAPIView):
     search_fields = ['source', 'destination', 'operator_name', 'type']
     ordering_fields = ['departure_datetime', 'price', 'duration_hours']
     ordering = ['departure_datetime']
+    replica_reads = True
 
     def get_queryset(self):
-        return TravelOption.objects.filter(
+        queryset = TravelOption.objects.filter(
             is_active=True,
             departure_datetime__gt=timezone.now()
-        )
+        ).prefetch_related('stops', 'fare_classes')
+        converter = get_converter(self.request)
+        if converter is not None:
+            queryset = queryset.filter(currency__in=converter.table.rates)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        return sharded(super().filter_queryset(queryset))
 
+    async def get(self, request, *args, **kwargs):
+        return await run_query(partial(self.list, request, *args, **kwargs))
 
-class TravelOptionDetailAPIView(generics.RetrieveAPIView):
-    queryset = TravelOption.objects.filter(is_active=True)
+
+class TravelOptionDetailAPIView(CurrencyMixin, AsyncAPIView, generics.RetrieveAPIView):
     serializer_class = TravelOptionSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        return TravelOption.objects.using(shard_for_pk(self.kwargs['pk'])).filter(
+            is_active=True
+        ).prefetch_related('stops', 'fare_classes')
+
+    async def get(self, request, *args, **kwargs):
+        return await run_query(partial(self.retrieve, request, *args, **kwargs))
+
+
+def segment_matches(travel_options, data, seats):
+    """
+    Pks of multi-stop options among ``travel_options`` that have ``seats``
+    free on every segment between the searched stops, though fewer on the
+    whole route. Stops are matched as the search query does.
+    """
+    source = (data.get('source') or '').lower()
+    destination = (data.get('destination') or '').lower()
+    # Until a segment is booked every segment has available_seats free
+    candidates = travel_options.filter(available_seats__lt=seats).exclude(segment_seats={}).prefetch_related('stops')
+    matches = []
+    for option in candidates:
+        stops = list(option.stops.all())
+        start = next((stop.sequence for stop in stops if source and source in stop.name.lower()), None)
+        end = None
+        if start is not None or not source:
+            end = next(
+                (stop.sequence for stop in stops
+                 if destination and destination in stop.name.lower() and stop.sequence > (start or 0)),
+                None,
+            )
+        try:
+            if option.seats_available_between(start, end) >= seats:
+                matches.append(option.pk)
+        except ValueError:
+            continue
+    return matches
+
+
+def search_queryset(data, converter, alias=None):
+    """
+    Active future options on database ``alias`` matching validated search
+    ``data``, annotated with their cheapest fare
+    """
+    filters = Q(is_active=True, departure_datetime__gt=timezone.now())
+    if converter is not None:
+        filters &= Q(currency__in=converter.table.rates)
+    travel_options = TravelOption.objects.using(alias)
+
+    # Source and destination also match intermediate stops, as long as
+    # the boarding stop comes before the alighting stop on the route.
+    stops = RouteStop.objects.filter(travel_option=OuterRef('pk'))
+    if data.get('source'):
+        source_stops = stops.filter(name__icontains=data['source'])
+        travel_options = travel_options.annotate(
+            boarding_sequence=Subquery(source_stops.order_by('sequence').values('sequence')[:1])
+        )
+        filters &= Q(source__icontains=data['source']) | Q(Exists(source_stops))
+    if data.get('destination'):
+        destination_stops = stops.filter(name__icontains=data['destination'])
+        if data.get('source'):
+            destination_stops = destination_stops.filter(sequence__gt=OuterRef('boarding_sequence'))
+        filters &= Q(destination__icontains=data['destination']) | Q(Exists(destination_stops))
+    if data.get('type'):
+        filters &= Q(type=data['type'])
+    if data.get('departure_date'):
+        filters &= Q(departure_datetime__date=data['departure_date'])
+    if data.get('available_seats_min'):
+        seat_filter = Q(available_seats__gte=data['available_seats_min'])
+        if data.get('source') or data.get('destination'):
+            # available_seats is the route's fullest segment; a trip between
+            # two stops only needs its own segments to have room
+            seat_filter |= Q(pk__in=segment_matches(
+                travel_options.filter(filters), data, data['available_seats_min']
+            ))
+        filters &= seat_filter
+
+    # Cheapest fare class with enough free seats, computed in the same
+    # grouped query; options without fare classes use their base price.
+    seats_needed = data.get('available_seats_min') or 1
+    travel_options = travel_options.filter(filters).annotate(
+        fare_class_count=Count('fare_classes'),
+        cheapest_price=Case(
+            When(fare_class_count=0, then=F('price')),
+            default=Min('fare_classes__price', filter=Q(fare_classes__available_seats__gte=seats_needed)),
+        ),
+    ).filter(cheapest_price__isnull=False)  # Every fare class is sold out
+
+    if data.get('min_price'):
+        travel_options = travel_options.filter(price_bound('gte', data['min_price'], converter))
+    if data.get('max_price'):
+        travel_options = travel_options.filter(price_bound('lte', data['max_price'], converter))
+    return travel_options
+
+
+def serialize_search_results(data, converter, alias=None):
+    travel_options = search_queryset(data, converter, alias).prefetch_related(
+        'stops', 'fare_classes'
+    ).order_by('departure_datetime')
+    return TravelOptionSerializer(travel_options, many=True, context={'converter': converter}).data
 
-@api_view(['POST'])
-@permission_classes([permissions.AllowAny])
-def search_travel_options(request):
+
+def type_facets(data, converter, alias=None):
+    """Number of options matching ``data`` per travel type"""
+    travel_options = search_queryset(data, converter, alias)
+    counts = TravelOption.objects.using(travel_options.db).filter(pk__in=travel_options.values('pk')).values('type').annotate(
+        count=Count('pk')
+    ).order_by()
+    return {row['type']: row['count'] for row in counts}
+
+
+class SearchTravelOptionsAPIView(AsyncAPIView):
     """Advanced search endpoint for travel options"""
-    serializer = TravelOptionSearchSerializer(data=request.data)
-    if serializer.is_valid():
-        filters = Q(is_active=True, departure_datetime__gt=timezone.now())
-
-        if serializer.validated_data.get('source'):
-            filters &= Q(source__icontains=serializer.validated_data['source'])
-        if serializer.validated_data.get('destination'):
-            filters &= Q(destination__icontains=serializer.validated_data['destination'])
-        if serializer.validated_data.get('type'):
-            filters &= Q(type=serializer.validated_data['type'])
-        if serializer.validated_data.get('departure_date'):
-            date = serializer.validated_data['departure_date']
-            filters &= Q(departure_datetime__date=date)
-        if serializer.validated_data.get('min_price'):
-            filters &= Q(price__gte=serializer.validated_data['min_price'])
-        if serializer.validated_data.get('max_price'):
-            filters &= Q(price__lte=serializer.validated_data['max_price'])
-        if serializer.validated_data.get('available_seats_min'):
-            filters &= Q(available_seats__gte=serializer.validated_data['available_seats_min'])
-
-        travel_options = TravelOption.objects.filter(filters).order_by('departure_datetime')
-        result_serializer = TravelOptionSerializer(travel_options, many=True)
-        return Response({'count': travel_options.count(), 'results': result_serializer.data})
-
-    return Response(serializer.errors, status=400)
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [SearchIPThrottle, SearchUserThrottle]
+    replica_reads = True
+
+    async def post(self, request):
+        serializer = TravelOptionSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        converter = await run_query(get_converter, request)
+        data = serializer.validated_data
+        # Every shard is searched at once; facets ignore the type filter so
+        # clients can show every type's count
+        shards = shard_aliases() or [None]
+        outcomes = await run_concurrently(
+            *((serialize_search_results, data, converter, alias) for alias in shards),
+            *((type_facets, {**data, 'type': None}, converter, alias) for alias in shards),
+        )
+        results = list(heapq.merge(
+            *outcomes[:len(shards)], key=lambda option: parse_datetime(option['departure_datetime'])
+        ))
+        facets = sum((Counter(counts) for counts in outcomes[len(shards):]), Counter())
+        return Response({'count': len(results), 'results': results, 'facets': {'type': dict(facets)}})
+
+
+search_travel_options = SearchTravelOptionsAPIView.as_view()
+
+
+class PriceAlertListCreateAPIView(generics.ListCreateAPIView):
+    serializer_class = PriceAlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return PriceAlert.objects.filter(user=self.request.user)
+
+    def filter_queryset(self, queryset):
+        return sharded(super().filter_queryset(queryset))
+
+    def perform_create(self, serializer):
+        # The alert is stored on its route's shard, with the options it watches
+        data = serializer.validated_data
+        shard = shard_for_route(data['source'], data['destination'])
+        with use_shard(shard):
+            add_shard_user(self.request.user, shard)
+            serializer.save(user=self.request.user)
+
+
+class PriceAlertDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = PriceAlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return PriceAlert.objects.using(shard_for_pk(self.kwargs['pk'])).filter(user=self.request.user)
+
+    def perform_update(self, serializer):
+        alert = serializer.instance
+        data = serializer.validated_data
+        route = (data.get('source', alert.source), data.get('destination', alert.destination))
+        if shard_for_route(*route) != shard_for_route(alert.source, alert.destination):
+            raise ValidationError({'destination': ["This route is stored on another shard; create a new alert for it."]})
+        serializer.save()
+
+
+def price_bound(lookup, amount, converter):
+    """
+    Filter on cheapest_price for a bound given in the requested currency,
+    translated into each option currency so the database does the matching.
+    """
+    if converter is None:
+        return Q(**{f'cheapest_price__{lookup}': amount})
+    bound = Q(pk__in=[])
+    for currency in converter.table.rates:
+        local_amount = amount * converter.table.factor(converter.target, currency)
+        bound |= Q(currency=currency, **{f'cheapest_price__{lookup}': local_amount})
+    return bound
 
 
 # Template Views
@@ -90,7 +268,7 @@ def travel_options_list(request):
         travel_options = travel_options.filter(departure_datetime__date=departure_date)
 
     context = {
-        'travel_options': travel_options,
+        'travel_options': sharded(travel_options),
         'travel_types': TravelOption.TRAVEL_TYPES,
         'search_params': {
             'source': source or '',
@@ -104,20 +282,26 @@ def travel_options_list(request):
 
 def travel_option_detail(request, pk):
     """Template view for travel option details"""
-    travel_option = get_object_or_404(TravelOption, pk=pk, is_active=True)
+    travel_option = get_object_or_404(TravelOption.objects.using(shard_for_pk(pk)), pk=pk, is_active=True)
     context = {'travel_option': travel_option}
     return render(request, 'travel_options/detail.html', context)
 
 
-def home_view(request):
-    """Home page with search form"""
+def render_home(request):
     featured_options = TravelOption.objects.filter(
         is_active=True,
         departure_datetime__gt=timezone.now()
-    ).order_by('departure_datetime')[:6]
+    ).order_by('departure_datetime')
 
     context = {
-        'featured_options': featured_options,
+        'featured_options': sharded(featured_options)[:6],
         'travel_types': TravelOption.TRAVEL_TYPES,
     }
     return render(request, 'travel_options/home.html', context)
+
+
+@replica_reads
+async def home_view(request):
+    """Home page with search form"""
+    # Rendering evaluates the queryset and the session user, so it runs on the database pool
+    return await run_query(render_home, request)